@@ -0,0 +1,70 @@
+import secrets
+from typing import Final, Optional
+
+from fastapi import Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from starlette import status
+
+from apixy.config import SETTINGS
+from apixy.entities.loop import LoopReport
+from apixy.loop_monitor import LOOP_MONITOR
+
+from .shared import ApixyRouter
+
+PREFIX: Final[str] = "/admin"
+# max duration (in seconds) of a profiler run
+PROFILER_MAX_DURATION: Final[float] = 300.0
+
+
+async def check_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    :raises HTTPException: 404 if admin endpoints are disabled,
+                           403 on a missing or wrong token
+    """
+    if not SETTINGS.ADMIN_TOKEN:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+    if x_admin_token is None or not secrets.compare_digest(
+        x_admin_token, SETTINGS.ADMIN_TOKEN
+    ):
+        raise HTTPException(status.HTTP_403_FORBIDDEN)
+
+
+router = ApixyRouter(tags=["Admin"], dependencies=[Depends(check_admin_token)])
+
+
+@router.get(PREFIX + "/loop", response_model=LoopReport)
+async def loop_report() -> LoopReport:
+    """
+    Event loop statistics and the latest callbacks that blocked the loop
+    of the worker that handles the request.
+    """
+    return LOOP_MONITOR.report()
+
+
+@router.post(PREFIX + "/loop/profiler")
+async def start_profiler(
+    duration: float = Query(30.0, gt=0, le=PROFILER_MAX_DURATION)
+) -> None:
+    """
+    Start sampling the event loop's stack for `duration` seconds
+    in the worker that handles the request, a previous profile is dropped.
+    """
+    if not LOOP_MONITOR.running:
+        raise HTTPException(
+            status.HTTP_409_CONFLICT, "The event loop monitor isn't running."
+        )
+    LOOP_MONITOR.start_profiler(duration)
+
+
+@router.delete(PREFIX + "/loop/profiler")
+async def stop_profiler() -> None:
+    LOOP_MONITOR.stop_profiler()
+
+
+@router.get(PREFIX + "/loop/profiler", response_class=PlainTextResponse)
+async def profile() -> str:
+    """
+    Collected stacks in the folded format with the number of their samples,
+    for e.g. for flamegraph.pl or speedscope.
+    """
+    return LOOP_MONITOR.folded_profile()
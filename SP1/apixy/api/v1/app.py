@@ -3,7 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from apixy.config import SETTINGS
 
-from . import datasources, fetch, projects
+from . import admin, datasources, fetch, health, projects
 
 app = FastAPI(title=SETTINGS.APP_NAME)
 app.add_middleware(
@@ -16,3 +16,5 @@ app.add_middleware(
 app.include_router(projects.router)
 app.include_router(datasources.router)
 app.include_router(fetch.router)
+app.include_router(health.router)
+app.include_router(admin.router)
@@ -1,10 +1,11 @@
 import asyncio
 import logging
-from typing import Dict, Final, List, Optional, Union
+from typing import Any, Dict, Final, List, Optional, Tuple, Union
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Query
 from fastapi.responses import JSONResponse
 from fastapi_utils.cbv import cbv
+from pydantic import ValidationError
 from starlette import status
 from starlette.responses import Response
 from tortoise.exceptions import DoesNotExist, FieldError, IntegrityError
@@ -12,19 +13,31 @@ from tortoise.query_utils import Q
 from tortoise.queryset import QuerySet
 from tortoise.transactions import in_transaction
 
+from apixy.entities.bulk_response import BulkItemResult, BulkResponse
 from apixy.entities.datasource import (
     DataSource,
-    DataSourceFetchError,
     DataSourceInput,
     DataSourceUnion,
+    FileDataSource,
     HTTPDataSource,
     MongoDBDataSource,
+    S3DataSource,
     SQLDataSource,
 )
 from apixy.entities.fetch_logger import DataSourceFetchLogSummary
+from apixy.entities.shared import DataSourceFetchError
+from apixy.invalidation import invalidate_datasource
 from apixy.models import DataSourceModel
 
-from .shared import ApixyRouter, DBFetchLogger, pagination_params
+from .shared import (
+    ApixyRouter,
+    DBFetchLogger,
+    check_bulk_size,
+    cursor_params,
+    pagination_params,
+    reserve_ids,
+    set_next_cursor,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +57,39 @@ async def get_datasource_by_id(datasource_id: int) -> DataSourceModel:
         ) from exception
 
 
+class DataSourceListFilters:
+    """
+    Query parameters of the data source listing, besides the pagination.
+
+    :param after_id: id of the last data source on the previous page (`cursor`)
+    :param datasource_type: list only data sources of this type
+    :param name_prefix: list only data sources whose name starts with this
+    """
+
+    def __init__(
+        self,
+        after_id: Optional[int] = Depends(cursor_params),
+        datasource_type: Optional[str] = Query(None, alias="type", max_length=32),
+        name_prefix: Optional[str] = Query(None, max_length=64),
+    ) -> None:
+        self.after_id = after_id
+        self.datasource_type = datasource_type
+        self.name_prefix = name_prefix
+
+
+async def check_destination(datasource: DataSource) -> None:
+    """
+    Run the expensive part of data source validation (create/update only).
+
+    :param datasource: A DataSource entity
+    :raise HTTPException: with status code 422
+    """
+    try:
+        await datasource.validate_destination()
+    except ValueError as err:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, str(err)) from err
+
+
 @cbv(router)
 class DataSourcesView:
     """Provides CRUD for data sources."""
@@ -73,27 +119,101 @@ class DataSourcesView:
         response_model=List[DataSourceUnion],
     )
     async def get_list(
-        self, pagination: Dict[str, int] = Depends(pagination_params)
+        self,
+        response: Response,
+        pagination: Dict[str, int] = Depends(pagination_params),
+        filters: DataSourceListFilters = Depends(),
     ) -> List[DataSourceUnion]:
-        """Endpoint for GET"""
-        return [
-            DataSourceUnion.parse_obj(p.to_pydantic())
-            for p in await DataSourcesDB.get_paginated_datasources(
-                pagination["limit"], pagination["offset"]
-            )
-        ]
+        """
+        Endpoint for GET.
+        Pass the `X-Next-Cursor` response header as `cursor` to get the next page.
+        """
+        page = await DataSourcesDB.get_paginated_datasources(
+            pagination["limit"],
+            pagination["offset"],
+            filters.after_id,
+            filters.datasource_type,
+            filters.name_prefix,
+        )
+        set_next_cursor(response, page, pagination["limit"])
+        return [DataSourceUnion.parse_obj(p.to_pydantic()) for p in page]
 
     @router.post(PREFIX)
     async def create(self, datasource_in: DataSourceInput, response: Response) -> None:
         """Creating a new data source"""
+        await check_destination(datasource_in)
         datasource = await DataSourcesDB.save_datasource(datasource_in)
         response.headers.update({"Location": self.get_datasource_url(datasource)})
 
+    @router.post(
+        PREFIX + "/bulk",
+        status_code=status.HTTP_200_OK,
+        response_class=JSONResponse,
+        response_model=BulkResponse,
+    )
+    async def create_bulk(self, datasources_in: List[Dict[str, Any]]) -> BulkResponse:
+        """
+        Creating many data sources at once.
+        Valid items are inserted in a single transaction, invalid ones are reported.
+        """
+        check_bulk_size(datasources_in)
+        results: List[BulkItemResult] = []
+        valid: List[Tuple[int, DataSource]] = []
+        for index, raw in enumerate(datasources_in):
+            try:
+                valid.append((index, DataSourceUnion.parse_obj(raw).__root__))
+            except ValidationError as err:
+                results.append(
+                    BulkItemResult(
+                        index=index,
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail=err.errors(),
+                    )
+                )
+
+        destination_errors = await asyncio.gather(
+            *(ds.validate_destination() for _, ds in valid), return_exceptions=True
+        )
+        accepted: List[Tuple[int, DataSource]] = []
+        for (index, datasource), error in zip(valid, destination_errors):
+            if isinstance(error, ValueError):
+                results.append(
+                    BulkItemResult(
+                        index=index,
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail=str(error),
+                    )
+                )
+            elif isinstance(error, BaseException):
+                raise error
+            else:
+                accepted.append((index, datasource))
+
+        ids = await DataSourcesDB.bulk_save_datasources([ds for _, ds in accepted])
+        results.extend(
+            BulkItemResult(
+                index=index,
+                status=status.HTTP_201_CREATED,
+                location=self.get_datasource_url(datasource_id),
+            )
+            for (index, _), datasource_id in zip(accepted, ids)
+        )
+        return BulkResponse.from_items(results)
+
     @router.put(PREFIX + "/{datasource_id}")
     async def update(
         self, datasource_id: int, datasource_in: DataSourceInput
-    ) -> Optional[Union[HTTPDataSource, SQLDataSource, MongoDBDataSource]]:
+    ) -> Optional[
+        Union[
+            HTTPDataSource,
+            SQLDataSource,
+            MongoDBDataSource,
+            FileDataSource,
+            S3DataSource,
+        ]
+    ]:
         """Updating an existing DataSource"""
+        await check_destination(datasource_in)
         async with in_transaction():
             model = await DataSourcesDB.datasource_for_update(datasource_id).first()
             if model is None:
@@ -107,6 +227,7 @@ class DataSourcesView:
                 )
             model.apply_update(datasource_in)
             await model.save()
+        await invalidate_datasource(datasource_id)
         return None
 
     @router.delete(PREFIX + "/{datasource_id}")
@@ -116,6 +237,7 @@ class DataSourcesView:
         if not await queryset.exists():
             raise HTTPException(status.HTTP_404_NOT_FOUND)
         await queryset.delete()
+        await invalidate_datasource(datasource_id)
         return None
 
     @router.get(
@@ -155,16 +277,31 @@ class DataSourcesDB:
 
     @staticmethod
     async def get_paginated_datasources(
-        limit: int, offset: int
+        limit: int,
+        offset: int,
+        after_id: Optional[int] = None,
+        datasource_type: Optional[str] = None,
+        name_prefix: Optional[str] = None,
     ) -> List[DataSourceModel]:
         """
-        Fetch all data sources and apply limit-offset pagination.
+        Fetch data sources ordered by id and apply pagination.
+        Keyset pagination is used if `after_id` is passed, limit-offset otherwise.
 
         :param limit: how many to fetch
-        :param offset: how many to skip
+        :param offset: how many to skip (ignored when `after_id` is passed)
+        :param after_id: id of the last data source on the previous page
+        :param datasource_type: only fetch data sources of this type
+        :param name_prefix: only fetch data sources whose name starts with this
         :return: awaited queryset, so a list
         """
-        return await DataSourceModel.all().limit(limit).offset(offset)
+        queryset = DataSourceModel.all().order_by("id").limit(limit)
+        if datasource_type is not None:
+            queryset = queryset.filter(type=datasource_type)
+        if name_prefix:
+            queryset = queryset.filter(name__startswith=name_prefix)
+        if after_id is not None:
+            return await queryset.filter(id__gt=after_id)
+        return await queryset.offset(offset)
 
     @staticmethod
     async def save_datasource(datasource: DataSource) -> int:
@@ -183,6 +320,32 @@ class DataSourcesDB:
             logger.exception("DataSource save error.", extra={"exception": err})
             raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY) from err
 
+    @staticmethod
+    async def bulk_save_datasources(datasources: List[DataSource]) -> List[int]:
+        """
+        Save many data sources to the DB in a single transaction.
+
+        :param datasources: DataSource entities
+        :raise HTTPException: with status code 422
+        :return: ids of the records, in the same order as the passed entities
+        """
+        if not datasources:
+            return []
+        try:
+            async with in_transaction() as connection:
+                ids = await reserve_ids(DataSourceModel, len(datasources), connection)
+                await DataSourceModel.bulk_create(
+                    [
+                        DataSourceModel.from_pydantic(ds, id=datasource_id)
+                        for ds, datasource_id in zip(datasources, ids)
+                    ],
+                    using_db=connection,
+                )
+        except (FieldError, IntegrityError) as err:
+            logger.exception("DataSource bulk save error.", extra={"exception": err})
+            raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY) from err
+        return ids
+
     @staticmethod
     def datasource_for_update(datasource_id: int) -> QuerySet[DataSourceModel]:
         """
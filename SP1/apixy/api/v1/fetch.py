@@ -2,13 +2,21 @@ from typing import Final, Optional
 
 from fastapi import Depends, HTTPException, Query
 from starlette import status
+from starlette.requests import Request
+from starlette.responses import Response
 from tortoise.exceptions import DoesNotExist
 
 from apixy.entities.proxy_response import ProxyResponse
-from apixy.models import ProjectModel
 
 from ...entities.project import FetchLogger
-from .shared import ApixyRouter, get_fetch_logger
+from ...entities.result_slice import ResultSlice
+from .shared import (
+    ApixyRouter,
+    fetch_project_slice,
+    get_fetch_logger,
+    get_project_with_datasources,
+    result_slice_params,
+)
 
 PREFIX_USER: Final[str] = "/collect"  # TODO: discuss possible prefixes
 
@@ -17,15 +25,20 @@ router = ApixyRouter(tags=["FetchRouter"])
 
 @router.get(PREFIX_USER + "/{project_slug}", response_model=ProxyResponse)
 async def fetch(
+    request: Request,
     project_slug: Optional[str] = Query(
         None, max_length=64, regex="^[A-Za-z0-9]+(-[A-Za-z0-9]+)*$"
     ),
     fetch_logger: FetchLogger = Depends(get_fetch_logger),
-) -> ProxyResponse:
-    """Fetches and aggregates all data sources tied to project slug."""
+    result_slice: ResultSlice = Depends(result_slice_params),
+) -> Response:
+    """
+    Fetches and aggregates all data sources tied to project slug.
+    The merged data can be filtered, paged and projected with query parameters.
+    Supports gzip/br/zstd compression and conditional requests (ETag).
+    """
     try:
-        model = await ProjectModel.get(slug=project_slug)
-        project = await model.to_pydantic_with_datasources()
-        return await project.fetch_data(fetch_logger)
+        project = await get_project_with_datasources(slug=project_slug)
     except DoesNotExist as err:
         raise HTTPException(status.HTTP_404_NOT_FOUND) from err
+    return await fetch_project_slice(project, fetch_logger, result_slice, request)
@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from typing import Final
+
+import aioredis
+from fastapi.responses import JSONResponse
+from starlette import status
+from tortoise import Tortoise
+from tortoise.exceptions import BaseORMException
+
+from apixy import cache
+from apixy.cache_warmer import CACHE_WARMER
+from apixy.entities.health import WorkerHealth
+from apixy.invalidation import INVALIDATION_LISTENER
+from apixy.loop_monitor import LOOP_MONITOR
+from apixy.project_cache import PROJECT_PLANS
+from apixy.workers import uptime, worker_id, worker_index
+
+from .shared import ApixyRouter
+
+logger = logging.getLogger(__name__)
+
+PREFIX: Final[str] = "/health"
+CHECK_TIMEOUT: Final[float] = 2.0  # seconds
+
+router = ApixyRouter(tags=["Health"])
+
+
+async def check_database() -> bool:
+    try:
+        await asyncio.wait_for(
+            Tortoise.get_connection("default").execute_query("SELECT 1"),
+            CHECK_TIMEOUT,
+        )
+    except (BaseORMException, KeyError, OSError, asyncio.TimeoutError) as error:
+        logger.error("DB health check failed: %r", error)
+        return False
+    return True
+
+
+async def check_redis() -> bool:
+    if cache.REDIS is None:
+        return False
+    try:
+        await asyncio.wait_for(cache.REDIS.ping(), CHECK_TIMEOUT)
+    except (aioredis.RedisError, OSError, asyncio.TimeoutError) as error:
+        logger.error("Redis health check failed: %r", error)
+        return False
+    return True
+
+
+@router.get(
+    PREFIX,
+    response_model=WorkerHealth,
+    responses={status.HTTP_503_SERVICE_UNAVAILABLE: {"model": WorkerHealth}},
+)
+async def health() -> JSONResponse:
+    """
+    Health of the worker that handles the request, 503 if it cannot serve fetches.
+    """
+    database, redis = await asyncio.gather(check_database(), check_redis())
+    worker_health = WorkerHealth(
+        worker=worker_id(),
+        index=worker_index(),
+        uptime=uptime(),
+        database=database,
+        redis=redis,
+        invalidation_listener=INVALIDATION_LISTENER.running,
+        cache_warmer=CACHE_WARMER.running,
+        cached_projects=len(PROJECT_PLANS),
+        loop=LOOP_MONITOR.stats() if LOOP_MONITOR.running else None,
+    )
+    return JSONResponse(
+        worker_health.dict(),
+        status_code=status.HTTP_200_OK
+        if worker_health.healthy
+        else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
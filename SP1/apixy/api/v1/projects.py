@@ -1,20 +1,39 @@
 import logging
-from typing import Dict, Final, List, Optional, Union
+from collections import Counter
+from typing import Any, Dict, Final, Iterable, List, Optional, Set, Tuple, Union
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 from fastapi_utils.cbv import cbv
+from pydantic import ValidationError
 from starlette import status
+from starlette.requests import Request
 from starlette.responses import Response
 from tortoise.exceptions import DoesNotExist, FieldError, IntegrityError
 from tortoise.query_utils import Q
 from tortoise.queryset import QuerySet
+from tortoise.transactions import in_transaction
 
+from apixy.entities.bulk_response import BulkItemResult, BulkResponse
 from apixy.entities.project import FetchLogger, Project, ProjectInput
+from apixy.invalidation import invalidate_project
 from apixy.models import DataSourceModel, ProjectModel
 
 from ...entities.proxy_response import ProxyResponse
+from ...entities.result_slice import ResultSlice
 from .datasources import DataSourceUnion
-from .shared import ApixyRouter, get_fetch_logger, pagination_params
+from .shared import (
+    ApixyRouter,
+    check_bulk_size,
+    cursor_params,
+    fetch_project_slice,
+    get_fetch_logger,
+    get_project_with_datasources,
+    pagination_params,
+    reserve_ids,
+    result_slice_params,
+    set_next_cursor,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -58,15 +77,21 @@ class ProjectsView:
 
     @router.get(PREFIX + "/", response_model=List[Project])
     async def get_list(
-        self, pagination: Dict[str, int] = Depends(pagination_params)
+        self,
+        response: Response,
+        pagination: Dict[str, int] = Depends(pagination_params),
+        after_id: Optional[int] = Depends(cursor_params),
+        name_prefix: Optional[str] = Query(None, max_length=64),
     ) -> List[Project]:
-        """Endpoint for GET"""
-        return [
-            p.to_pydantic()
-            for p in await ProjectsDB.get_paginated_projects(
-                pagination["limit"], pagination["offset"]
-            )
-        ]
+        """
+        Endpoint for GET.
+        Pass the `X-Next-Cursor` response header as `cursor` to get the next page.
+        """
+        page = await ProjectsDB.get_paginated_projects(
+            pagination["limit"], pagination["offset"], after_id, name_prefix
+        )
+        set_next_cursor(response, page, pagination["limit"])
+        return [p.to_pydantic() for p in page]
 
     @router.post(PREFIX + "/")
     async def create(self, project_in: ProjectInput, response: Response) -> None:
@@ -78,6 +103,58 @@ class ProjectsView:
         project_id = await ProjectsDB.save_project(project_in)
         response.headers.update({"Location": self.get_project_link(project_id)})
 
+    @router.post(
+        PREFIX + "/bulk",
+        status_code=status.HTTP_200_OK,
+        response_class=JSONResponse,
+        response_model=BulkResponse,
+    )
+    async def create_bulk(self, projects_in: List[Dict[str, Any]]) -> BulkResponse:
+        """
+        Creating many Projects at once.
+        Valid items are inserted in a single transaction, invalid ones are reported.
+        """
+        check_bulk_size(projects_in)
+        results: List[BulkItemResult] = []
+        valid: List[Tuple[int, ProjectInput]] = []
+        for index, raw in enumerate(projects_in):
+            try:
+                valid.append((index, ProjectInput.parse_obj(raw)))
+            except ValidationError as err:
+                results.append(
+                    BulkItemResult(
+                        index=index,
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        detail=err.errors(),
+                    )
+                )
+
+        slug_counts = Counter(project.slug for _, project in valid)
+        taken = await ProjectsDB.existing_slugs(slug_counts.keys())
+        unique: List[Tuple[int, ProjectInput]] = []
+        for index, project in valid:
+            if project.slug in taken or slug_counts[project.slug] > 1:
+                results.append(
+                    BulkItemResult(
+                        index=index,
+                        status=status.HTTP_409_CONFLICT,
+                        detail="Project with this slug already exists.",
+                    )
+                )
+            else:
+                unique.append((index, project))
+
+        ids = await ProjectsDB.bulk_save_projects([p for _, p in unique])
+        results.extend(
+            BulkItemResult(
+                index=index,
+                status=status.HTTP_201_CREATED,
+                location=self.get_project_link(project_id),
+            )
+            for (index, _), project_id in zip(unique, ids)
+        )
+        return BulkResponse.from_items(results)
+
     @router.put(PREFIX + "/{project_id}")
     async def update(
         self, project_id: int, project_in: ProjectInput
@@ -93,6 +170,7 @@ class ProjectsView:
                 status.HTTP_404_NOT_FOUND, "Project with this ID does not exist."
             )
         await model.update(**project_in.dict(exclude={"id"}))
+        await invalidate_project(project_id)
         return None
 
     @router.delete(PREFIX + "/{project_id}")
@@ -102,19 +180,27 @@ class ProjectsView:
         if not await queryset.exists():
             raise HTTPException(status.HTTP_404_NOT_FOUND)
         await queryset.delete()
+        await invalidate_project(project_id)
         return None
 
     @router.get(PREFIX + "/{project_id}/fetch", response_model=ProxyResponse)
     async def fetch(
-        self, project_id: int, fetch_logger: FetchLogger = Depends(get_fetch_logger)
-    ) -> ProxyResponse:
-        """Fetches and aggregates all data sources tied to project id."""
+        self,
+        request: Request,
+        project_id: int,
+        fetch_logger: FetchLogger = Depends(get_fetch_logger),
+        result_slice: ResultSlice = Depends(result_slice_params),
+    ) -> Response:
+        """
+        Fetches and aggregates all data sources tied to project id.
+        The merged data can be filtered, paged and projected with query parameters.
+        Supports gzip/br/zstd compression and conditional requests (ETag).
+        """
         try:
-            model = await ProjectModel.get(id=project_id)
-            project = await model.to_pydantic_with_datasources()
-            return await project.fetch_data(fetch_logger)
+            project = await get_project_with_datasources(project_id=project_id)
         except DoesNotExist as err:
             raise HTTPException(status.HTTP_404_NOT_FOUND) from err
+        return await fetch_project_slice(project, fetch_logger, result_slice, request)
 
 
 @cbv(router)
@@ -134,6 +220,44 @@ class ProjectsDataSourcesView:
                 "Datasource already exists in this project",
             )
         await self.project.sources.add(data_source)
+        await invalidate_project(self.project.id)
+
+    @router.post(
+        PROJECT_DATASOURCES_PREFIX + "/bulk",
+        status_code=status.HTTP_200_OK,
+        response_class=JSONResponse,
+        response_model=BulkResponse,
+    )
+    async def add_bulk(self, datasource_ids: List[int]) -> BulkResponse:
+        """Adding many existing datasources to a project at once."""
+        check_bulk_size(datasource_ids)
+        datasources: Dict[int, DataSourceModel] = {
+            ds.id: ds for ds in await DataSourceModel.filter(id__in=datasource_ids)
+        }
+        linked = await ProjectsDB.linked_datasource_ids(self.project, datasources)
+
+        results: List[BulkItemResult] = []
+        to_add: List[DataSourceModel] = []
+        for index, datasource_id in enumerate(datasource_ids):
+            detail: Optional[str] = None
+            if datasource_id not in datasources:
+                item_status, detail = status.HTTP_404_NOT_FOUND, "No such datasource"
+            elif datasource_id in linked:
+                item_status = status.HTTP_409_CONFLICT
+                detail = "Datasource already exists in this project"
+            else:
+                item_status = status.HTTP_204_NO_CONTENT
+                to_add.append(datasources[datasource_id])
+                linked.add(datasource_id)
+            results.append(
+                BulkItemResult(index=index, status=item_status, detail=detail)
+            )
+
+        if to_add:
+            async with in_transaction() as connection:
+                await self.project.sources.add(*to_add, using_db=connection)
+            await invalidate_project(self.project.id)
+        return BulkResponse.from_items(results)
 
     @router.get(PROJECT_DATASOURCES_PREFIX, response_model=List[DataSourceUnion])
     async def list(
@@ -154,6 +278,7 @@ class ProjectsDataSourcesView:
                 status.HTTP_404_NOT_FOUND, "No such datasource in this project"
             )
         await self.project.sources.remove(datasource[0])
+        await invalidate_project(self.project.id)
 
 
 class ProjectsDB:
@@ -168,15 +293,59 @@ class ProjectsDB:
         return await ProjectModel.filter(Q(slug=slug) & ~Q(id=exclude_id)).exists()
 
     @staticmethod
-    async def get_paginated_projects(limit: int, offset: int) -> List[ProjectModel]:
+    async def existing_slugs(slugs: Iterable[str]) -> Set[str]:
+        """
+        Find which of the passed slugs are already taken, in a single query.
+
+        :param slugs: slugs to look for
+        :return: the subset of slugs that exist in the DB
+        """
+        return set(
+            await ProjectModel.filter(slug__in=list(slugs)).values_list(
+                "slug", flat=True
+            )
+        )
+
+    @staticmethod
+    async def linked_datasource_ids(
+        project: ProjectModel, datasource_ids: Iterable[int]
+    ) -> Set[int]:
         """
-        Fetch all projects and apply limit-offset pagination.
+        Find which of the passed data sources are already tied to a project.
+
+        :param project: the project to look in
+        :param datasource_ids: ids to look for
+        :return: the subset of ids tied to the project
+        """
+        return set(
+            await project.sources.filter(id__in=list(datasource_ids)).values_list(
+                "id", flat=True
+            )
+        )
+
+    @staticmethod
+    async def get_paginated_projects(
+        limit: int,
+        offset: int,
+        after_id: Optional[int] = None,
+        name_prefix: Optional[str] = None,
+    ) -> List[ProjectModel]:
+        """
+        Fetch projects ordered by id and apply pagination.
+        Keyset pagination is used if `after_id` is passed, limit-offset otherwise.
 
         :param limit: how many to fetch
-        :param offset: how many to skip
+        :param offset: how many to skip (ignored when `after_id` is passed)
+        :param after_id: id of the last project on the previous page
+        :param name_prefix: only fetch projects whose name starts with this
         :return: awaited queryset, so a list
         """
-        return await ProjectModel.all().limit(limit).offset(offset)
+        queryset = ProjectModel.all().order_by("id").limit(limit)
+        if name_prefix:
+            queryset = queryset.filter(name__startswith=name_prefix)
+        if after_id is not None:
+            return await queryset.filter(id__gt=after_id)
+        return await queryset.offset(offset)
 
     @staticmethod
     async def save_project(project: Project) -> int:
@@ -195,6 +364,32 @@ class ProjectsDB:
             logger.exception("Project save error.", extra={"exception": err})
             raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY) from err
 
+    @staticmethod
+    async def bulk_save_projects(projects: List[Project]) -> List[int]:
+        """
+        Save many Projects to the DB in a single transaction.
+
+        :param projects: Project entities
+        :raise HTTPException: with status code 422
+        :return: ids of the records, in the same order as the passed entities
+        """
+        if not projects:
+            return []
+        try:
+            async with in_transaction() as connection:
+                ids = await reserve_ids(ProjectModel, len(projects), connection)
+                await ProjectModel.bulk_create(
+                    [
+                        ProjectModel(id=project_id, **project.dict(exclude={"id"}))
+                        for project, project_id in zip(projects, ids)
+                    ],
+                    using_db=connection,
+                )
+        except (FieldError, IntegrityError) as err:
+            logger.exception("Project bulk save error.", extra={"exception": err})
+            raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY) from err
+        return ids
+
     @staticmethod
     def project_for_update(project_id: int) -> QuerySet[ProjectModel]:
         """
@@ -0,0 +1,152 @@
+"""Module for compressed, conditional (ETag) JSON responses"""
+import gzip
+import hashlib
+import json
+from typing import Callable, Dict, Final, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from starlette import status
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+
+from apixy.config import SETTINGS
+
+Compressor = Callable[[bytes], bytes]
+
+# ordered by server preference, optional compressors are added if installed
+COMPRESSORS: Final[Dict[str, Compressor]] = {}
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    pass
+else:
+
+    def zstd_compress(body: bytes) -> bytes:
+        # compressor objects aren't thread-safe, so a new one is created for each body
+        compressed: bytes = zstandard.ZstdCompressor().compress(body)
+        return compressed
+
+    COMPRESSORS["zstd"] = zstd_compress
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    pass
+else:
+
+    def brotli_compress(body: bytes) -> bytes:
+        compressed: bytes = brotli.compress(body)
+        return compressed
+
+    COMPRESSORS["br"] = brotli_compress
+
+
+def gzip_compress(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=6)
+
+
+COMPRESSORS["gzip"] = gzip_compress
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """
+    Parse the Accept-Encoding header.
+
+    :param header: for e.g. "gzip;q=0.8, br"
+    :return: mapping of encodings to their quality values
+    """
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(header: Optional[str]) -> Optional[str]:
+    """
+    Pick the best supported content encoding the client accepts.
+
+    :param header: the Accept-Encoding header
+    :return: encoding name, `None` for identity
+    """
+    if not header:
+        return None
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    candidates: List[Tuple[float, int, str]] = [
+        (accepted.get(encoding, wildcard), -preference, encoding)
+        for preference, encoding in enumerate(COMPRESSORS)
+    ]
+    quality, _, encoding = max(candidates)
+    return encoding if quality > 0 else None
+
+
+def etag_matches(header: Optional[str], digest: str) -> bool:
+    """
+    Check the If-None-Match header against the digest of the current body.
+    Uses weak comparison and ignores the content encoding suffix,
+    as any encoding of the same body is fine for a client that has it cached.
+    """
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        tag = tag[2:] if tag.startswith("W/") else tag
+        if tag.strip('"').split("-", 1)[0] == digest:
+            return True
+    return False
+
+
+async def json_response(request: Request, content: BaseModel) -> Response:
+    """
+    Render a model as JSON with an ETag, compressed if the client accepts it.
+
+    Responds with 304 Not Modified if the client already has the same body.
+    Bodies smaller than `SETTINGS.COMPRESSION_MIN_SIZE` are sent as is,
+    bodies larger than `SETTINGS.COMPRESSION_THREAD_MIN_SIZE` are compressed
+    in a thread, so the event loop isn't blocked.
+
+    :param request: the incoming request
+    :param content: the model to render
+    """
+    body = json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+    headers = {"Vary": "Accept-Encoding"}
+
+    encoding = None
+    if len(body) >= SETTINGS.COMPRESSION_MIN_SIZE:
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+    headers["ETag"] = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+    if etag_matches(request.headers.get("if-none-match"), digest):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if encoding is not None:
+        compress = COMPRESSORS[encoding]
+        if len(body) >= SETTINGS.COMPRESSION_THREAD_MIN_SIZE:
+            body = await run_in_threadpool(compress, body)
+        else:
+            body = compress(body)
+        headers["Content-Encoding"] = encoding
+
+    return Response(body, media_type="application/json", headers=headers)
@@ -1,14 +1,26 @@
-from typing import Any, Callable, Dict, List, Optional
+import base64
+import binascii
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Sized, Type
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query
 from fastapi.types import DecoratedCallable
+from pydantic import ValidationError
 from starlette import status
+from starlette.requests import Request
 from starlette.responses import Response
+from tortoise.backends.base.client import BaseDBAsyncClient
 from tortoise.functions import Avg
+from tortoise.models import Model
 
 from apixy.config import SETTINGS
 from apixy.entities.fetch_logger import DataSourceFetchLogSummary, FetchLogger
-from apixy.models import DataSourceModel, FetchLogModel
+from apixy.entities.project import ProjectWithDataSources
+from apixy.entities.result_slice import ResultSlice
+from apixy.models import DataSourceModel, FetchLogModel, ProjectModel
+from apixy.project_cache import PROJECT_PLANS
+
+from .responses import json_response
 
 
 class ApixyRouter(APIRouter):
@@ -45,6 +57,86 @@ async def pagination_params(
     return {"limit": limit, "offset": offset}
 
 
+def encode_cursor(last_id: int) -> str:
+    """
+    Create an opaque keyset pagination cursor.
+
+    :param last_id: id of the last record on the current page
+    :return: url-safe cursor string
+    """
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode()
+
+
+async def cursor_params(cursor: Optional[str] = None) -> Optional[int]:
+    """
+    Decode an opaque keyset pagination cursor.
+
+    :param cursor: the cursor taken from the `X-Next-Cursor` header of a previous page
+    :raise HTTPException: with status code 422 on a malformed cursor
+    :return: id of the last record on the previous page, `None` if no cursor passed
+    """
+    if cursor is None:
+        return None
+    try:
+        last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))["id"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as err:
+        raise HTTPException(
+            status.HTTP_422_UNPROCESSABLE_ENTITY, "Invalid cursor."
+        ) from err
+    if not isinstance(last_id, int):
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, "Invalid cursor.")
+    return last_id
+
+
+def set_next_cursor(response: Response, page: Sequence[Model], limit: int) -> None:
+    """
+    Advertise the cursor of the next page, if there might be one.
+
+    :param response: the response to set the `X-Next-Cursor` header on
+    :param page: the records of the current page, ordered by id
+    :param limit: the requested page size
+    """
+    if len(page) > 0 and len(page) >= limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(page[-1].pk)
+
+
+def check_bulk_size(items: Sized) -> None:
+    """
+    Reject bulk requests that are empty or too large for a single transaction.
+
+    :param items: the bulk request body
+    :raise HTTPException: with status code 422
+    """
+    if not 0 < len(items) <= SETTINGS.BULK_MAX_SIZE:
+        raise HTTPException(
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            f"Bulk request must contain 1 to {SETTINGS.BULK_MAX_SIZE} items.",
+        )
+
+
+async def reserve_ids(
+    model: Type[Model], count: int, connection: BaseDBAsyncClient
+) -> List[int]:
+    """
+    Reserve primary keys from the table's serial sequence in a single query.
+
+    `Model.bulk_create` does not populate generated primary keys,
+    so bulk endpoints reserve them upfront to be able to report the created links.
+    Uses PostgreSQL sequences, other databases are not supported by bulk creates.
+
+    :param model: the model whose table sequence to use
+    :param count: how many ids to reserve
+    :param connection: the connection (transaction) to run the query in
+    :return: list of reserved ids
+    """
+    rows = await connection.execute_query_dict(
+        "SELECT nextval(pg_get_serial_sequence($1, 'id')) AS id "
+        "FROM generate_series(1, $2)",
+        [model._meta.db_table, count],  # pylint: disable=protected-access
+    )
+    return [row["id"] for row in rows]
+
+
 class DBFetchLogger(FetchLogger):
     async def save_log(
         self,
@@ -114,5 +206,78 @@ class DBFetchLogger(FetchLogger):
         return values[0] * 1e-6
 
 
+async def get_project_with_datasources(
+    project_id: Optional[int] = None, slug: Optional[str] = None
+) -> ProjectWithDataSources:
+    """
+    Load a validated project with its data sources by id or slug,
+    going to the DB only if it's not in the project cache.
+
+    :raises DoesNotExist: if there is no such project
+    """
+    if (plan := PROJECT_PLANS.get(project_id, slug)) is not None:
+        return plan
+    generation = PROJECT_PLANS.generation
+    filters: Dict[str, Any] = (
+        {"id": project_id} if project_id is not None else {"slug": slug}
+    )
+    model = await ProjectModel.get(**filters)
+    plan = await model.to_pydantic_with_datasources()
+    PROJECT_PLANS.put(plan, generation)
+    return plan
+
+
+async def result_slice_params(
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[str] = Query(
+        None, description="comma separated keys to keep in objects"
+    ),
+    filter_expression: Optional[str] = Query(
+        None, alias="filter", description="JMESPath applied to the merged data"
+    ),
+) -> ResultSlice:
+    """
+    :raise HTTPException: with status code 422 on an invalid filter
+    """
+    try:
+        return ResultSlice(
+            filter=filter_expression,
+            offset=offset,
+            limit=limit,
+            fields=None
+            if fields is None
+            else frozenset(filter(None, map(str.strip, fields.split(",")))),
+        )
+    except ValidationError as err:
+        raise HTTPException(
+            status.HTTP_422_UNPROCESSABLE_ENTITY, "Invalid filter."
+        ) from err
+
+
+async def fetch_project_slice(
+    project: ProjectWithDataSources,
+    fetch_logger: FetchLogger,
+    result_slice: ResultSlice,
+    request: Request,
+) -> Response:
+    """
+    Fetch a project's merged data and respond with the selected part of it.
+    The number of items matching the filter is sent in the `X-Total-Count` header.
+
+    :raise HTTPException: with status code 422 if the filter cannot be evaluated
+    """
+    result = await project.fetch_data(fetch_logger)
+    if result_slice.is_noop:
+        return await json_response(request, result)
+    try:
+        result, total = result_slice.apply(result)
+    except ValueError as err:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, str(err)) from err
+    response = await json_response(request, result)
+    response.headers["X-Total-Count"] = str(total)
+    return response
+
+
 async def get_fetch_logger() -> DBFetchLogger:
     return DBFetchLogger()
@@ -7,11 +7,20 @@ from tortoise.contrib.fastapi import register_tortoise
 
 from apixy import cache
 from apixy.api.v1.app import app as v1_app
+from apixy.backends import preload_backends
+from apixy.cache_warmer import CACHE_WARMER
 from apixy.config import SETTINGS, TORTOISE_CONFIG
+from apixy.invalidation import INVALIDATION_LISTENER
+from apixy.loop_monitor import LOOP_MONITOR
+from apixy.workers import is_primary_worker, stagger_startup
+
+preload_backends(SETTINGS.PRELOAD_BACKENDS)
 
 app = FastAPI(title=SETTINGS.APP_NAME)
 app.mount(SETTINGS.API_PREFIX + "/v1", v1_app)
 
+# registered first, so it runs before register_tortoise creates the DB pool
+app.add_event_handler("startup", stagger_startup)
 register_tortoise(app, config=TORTOISE_CONFIG)
 
 
@@ -20,17 +29,32 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("startup")
 async def startup() -> None:
+    if SETTINGS.LOOP_MONITOR_ENABLED:
+        LOOP_MONITOR.start()
     try:
-        cache.REDIS = await aioredis.create_redis_pool(SETTINGS.REDIS_URI)
+        cache.REDIS = await aioredis.create_redis_pool(
+            SETTINGS.REDIS_URI,
+            minsize=SETTINGS.REDIS_POOL_MINSIZE,
+            maxsize=SETTINGS.REDIS_POOL_MAXSIZE,
+        )
     # AssertionError handles bad scheme (for e.g. http://)
     # OSError is superclass of socket.gaierror, so it handles connection errors
     except (OSError, AssertionError) as error:
         logger.exception(error)
         logger.error("Redis connection initializing failed!")
+        return
+
+    await INVALIDATION_LISTENER.start()
+    # every worker would refresh the same data sources
+    if SETTINGS.CACHE_WARMER_ENABLED and is_primary_worker():
+        CACHE_WARMER.start()
 
 
 @app.on_event("shutdown")
 async def shutdown() -> None:
+    await CACHE_WARMER.stop()
+    await INVALIDATION_LISTENER.stop()
+    await LOOP_MONITOR.stop()
     if cache.REDIS is not None:
         cache.REDIS.close()
         await cache.REDIS.wait_closed()
@@ -0,0 +1,39 @@
+"""
+Registry of datasource backends, modules with the driver-specific code
+of the datasource types in `apixy.entities.datasource.DATA_SOURCES`.
+
+A backend is imported the first time a datasource of its type is used,
+so the app doesn't import drivers a deployment may never need at startup.
+"""
+import importlib
+from functools import lru_cache
+from typing import Any, Dict, Final, Iterable
+
+BACKENDS: Final[Dict[str, str]] = {
+    "http": "apixy.backends.http",
+    "mongo": "apixy.backends.mongo",
+    "sql": "apixy.backends.sql",
+    "file": "apixy.backends.files",
+    "s3": "apixy.backends.files",
+}
+
+
+@lru_cache(maxsize=None)
+def load_backend(datasource_type: str) -> Any:
+    """
+    :raises KeyError: on an unknown datasource type
+    :return: the backend module, imported on the first call
+             (typed as `Any`, as its functions depend on the datasource type)
+    """
+    return importlib.import_module(BACKENDS[datasource_type])
+
+
+def preload_backends(datasource_types: Iterable[str]) -> None:
+    """
+    Import backends ahead of their first use, for e.g. in the master process
+    before forking workers, so the workers share the imported modules.
+
+    :raises KeyError: on an unknown datasource type
+    """
+    for datasource_type in datasource_types:
+        load_backend(datasource_type)
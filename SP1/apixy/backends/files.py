@@ -0,0 +1,117 @@
+"""Backend of file and S3 datasources, reads CSV, Parquet and NDJSON with pyarrow"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import operator
+from typing import Any, Callable, Dict, Final, List, Optional, Tuple
+
+import async_timeout
+import pyarrow
+import pyarrow.dataset
+import pyarrow.fs
+import pyarrow.json
+
+from apixy.entities.datasource import (
+    ColumnarDataSource,
+    FileDataSource,
+    RowFilter,
+    S3DataSource,
+)
+from apixy.entities.shared import DataSourceFetchError
+
+logger = logging.getLogger(__name__)
+
+OPERATORS: Final[Dict[str, Callable[[Any, Any], Any]]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def filter_expression(
+    filters: Optional[List[RowFilter]],
+) -> Optional[pyarrow.dataset.Expression]:
+    """:return: the filters as a pyarrow expression, `None` if there are none"""
+    expression = None
+    for column, operator_name, value in filters or ():
+        field = pyarrow.dataset.field(column)
+        condition = (
+            field.isin(value)
+            if operator_name == "in"
+            else OPERATORS[operator_name](field, value)
+        )
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def open_filesystem(
+    datasource: ColumnarDataSource,
+) -> Tuple[pyarrow.fs.FileSystem, str]:
+    """
+    :raises ValueError: on a local file outside of the allowed directory
+    :return: filesystem with the datasource's file and the path within it
+    """
+    if isinstance(datasource, S3DataSource):
+        endpoint, endpoint_override = datasource.endpoint, None
+        if endpoint is not None:
+            endpoint_override = (
+                f"{endpoint.host}:{endpoint.port}" if endpoint.port else endpoint.host
+            )
+        filesystem = pyarrow.fs.S3FileSystem(
+            access_key=datasource.access_key,
+            secret_key=(
+                datasource.secret_key.get_secret_value()
+                if datasource.secret_key is not None
+                else None
+            ),
+            region=datasource.region,
+            scheme=endpoint.scheme if endpoint else "https",
+            endpoint_override=endpoint_override,
+        )
+        return filesystem, f"{datasource.url.host}{datasource.url.path or ''}"
+    if isinstance(datasource, FileDataSource):
+        # memory mapped, so only the needed parts of a Parquet file are read
+        path = datasource.local_path()
+        return pyarrow.fs.LocalFileSystem(use_mmap=True), path
+    raise TypeError(f"Unsupported datasource type: {datasource.type}")
+
+
+def open_dataset(datasource: ColumnarDataSource) -> pyarrow.dataset.Dataset:
+    filesystem, path = open_filesystem(datasource)
+    if datasource.format == "ndjson":
+        # pyarrow has no NDJSON dataset, the whole file is read into memory
+        with filesystem.open_input_stream(path) as stream:
+            return pyarrow.dataset.dataset(pyarrow.json.read_json(stream))
+    return pyarrow.dataset.dataset(
+        path, format=datasource.format, filesystem=filesystem
+    )
+
+
+def read_rows(datasource: ColumnarDataSource) -> List[Dict[str, Any]]:
+    """Blocking, reads only the selected columns of rows matching the filters."""
+    table = open_dataset(datasource).to_table(
+        columns=datasource.columns, filter=filter_expression(datasource.filters)
+    )
+    columns = table.to_pydict()
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+async def fetch_rows(datasource: ColumnarDataSource) -> List[Dict[str, Any]]:
+    """
+    Reads the rows in the loop's executor, decoding large files would block it.
+    On timeout, the read still finishes in the background.
+
+    :raises asyncio.exceptions.TimeoutError: on timeout
+    :raises DataSourceFetchError: on a missing or unreadable file
+    """
+    loop = asyncio.get_running_loop()
+    async with async_timeout.timeout(datasource.timeout):
+        try:
+            return await loop.run_in_executor(None, read_rows, datasource)
+        except (pyarrow.ArrowException, OSError, ValueError) as error:
+            logger.exception(error)
+            raise DataSourceFetchError(str(error)) from error
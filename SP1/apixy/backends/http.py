@@ -0,0 +1,35 @@
+"""Backend of HTTP datasources"""
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any
+
+import aiohttp
+import async_timeout
+
+from apixy.entities.shared import DataSourceFetchError
+
+if TYPE_CHECKING:
+    from apixy.entities.datasource import HTTPDataSource
+
+logger = logging.getLogger(__name__)
+
+
+async def fetch_json(datasource: HTTPDataSource) -> Any:
+    """
+    :raises asyncio.exceptions.TimeoutError: on timeout
+    :raises DataSourceFetchError: on a failed request
+    :return: decoded JSON response body
+    """
+    async with async_timeout.timeout(datasource.timeout):
+        try:
+            async with aiohttp.request(
+                method=datasource.method,
+                url=datasource.url,
+                json=datasource.body,
+                headers=datasource.headers,
+            ) as response:
+                return await response.json()
+        except aiohttp.ClientError as error:
+            logger.exception(error)
+            raise DataSourceFetchError from error
@@ -0,0 +1,46 @@
+"""Backend of MongoDB datasources"""
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+import async_timeout
+import motor.motor_asyncio
+import pymongo.errors
+
+from apixy.entities.shared import DataSourceFetchError
+
+if TYPE_CHECKING:
+    from apixy.entities.datasource import MongoDBDataSource
+
+logger = logging.getLogger(__name__)
+
+
+async def fetch_documents(
+    datasource: MongoDBDataSource, after: Optional[Any]
+) -> List[Dict[str, Any]]:
+    """
+    :param after: fetch only documents with the watermark greater than this
+    :raises asyncio.exceptions.TimeoutError: on timeout
+    :raises DataSourceFetchError: on a failed query
+    """
+    query, sort = datasource.query, None
+    if datasource.watermark is not None:
+        if after is not None:
+            query = {"$and": [datasource.query, {datasource.watermark: {"$gt": after}}]}
+        sort = [(datasource.watermark, pymongo.ASCENDING)]
+
+    client = motor.motor_asyncio.AsyncIOMotorClient(datasource.url)
+    async with async_timeout.timeout(datasource.timeout):
+        cursor = client[datasource.database][datasource.collection].find(
+            query, {"_id": False}, sort=sort
+        )
+        try:
+            documents: List[Dict[str, Any]] = await cursor.to_list(None)
+        except pymongo.errors.PyMongoError as error:
+            logger.exception(error)
+            raise DataSourceFetchError from error
+        finally:
+            await cursor.close()
+
+    return documents
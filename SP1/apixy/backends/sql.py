@@ -0,0 +1,60 @@
+"""Backend of SQL datasources"""
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+
+import aiomysql
+import aiosqlite
+import async_timeout
+import asyncpg
+import databases
+import sqlalchemy
+from sqlalchemy.sql.elements import TextClause
+
+from apixy.entities.shared import DataSourceFetchError
+
+if TYPE_CHECKING:
+    from apixy.entities.datasource import SQLDataSource
+
+logger = logging.getLogger(__name__)
+
+
+async def fetch_rows(
+    datasource: SQLDataSource, after: Optional[Any]
+) -> List[Dict[str, Any]]:
+    """
+    :param after: fetch only rows with the watermark greater than this
+    :raises asyncio.exceptions.TimeoutError: on timeout
+    :raises DataSourceFetchError: on a failed query or an unsupported database
+    """
+    query: Union[str, TextClause] = datasource.query
+    if datasource.watermark is not None:
+        # the watermark is validated as an identifier
+        delta_query = "SELECT * FROM ({}) AS apixy_delta".format(  # nosec
+            datasource.query.strip().rstrip(";")
+        )
+        if after is not None:
+            delta_query += f" WHERE {datasource.watermark} > :watermark"
+        query = sqlalchemy.text(delta_query + f" ORDER BY {datasource.watermark}")
+        if after is not None:
+            query = query.bindparams(watermark=after)
+
+    async with async_timeout.timeout(datasource.timeout):
+        try:
+            async with databases.Database(datasource.url) as database:
+                rows = await database.fetch_all(query=query)
+        except KeyError as error:
+            logger.exception(error)
+            raise DataSourceFetchError(
+                f"Unsupported backend: {datasource.url}"
+            ) from error
+        except (
+            asyncpg.exceptions.PostgresError,
+            aiomysql.MySQLError,
+            aiosqlite.Error,
+        ) as error:
+            logger.exception(error)
+            raise DataSourceFetchError from error
+
+    return [dict(row) for row in rows]
@@ -1,53 +1,222 @@
 """Module for RedisJSON cache helper functions"""
+import asyncio
 import json
 import logging
 from functools import wraps
-from typing import Any, Final, Optional
+from typing import Any, Dict, Final, Iterable, List, Optional, Tuple
 
 import aioredis
 
+from apixy.config import SETTINGS
+from apixy.entities.shared import DataSourceFetchError
+
 logger = logging.getLogger(__name__)
 REDIS: Optional[aioredis.Redis] = None
 
 REDIS_DATASOURCE_CACHE_KEY: Final[str] = "datasource:{self.id}"
+# failed fetches are cached separately, so any JSON can be cached as data
+REDIS_DATASOURCE_ERROR_KEY: Final[str] = "datasource:{self.id}:error"
+
+
+def _negative_caching_enabled(datasource: Any) -> bool:
+    """
+    Datasources without an id (not saved ones) would share the same error key,
+    so their failures are not cached.
+    """
+    return datasource.id is not None and bool(
+        SETTINGS.NEGATIVE_CACHE_ERROR_TTL or SETTINGS.NEGATIVE_CACHE_TIMEOUT_TTL
+    )
+
+
+def _caching_enabled(datasource: Any) -> bool:
+    """Data is cached only for datasources with a valid `cache_expire`."""
+    cache_expire = datasource.cache_expire
+    return isinstance(cache_expire, int) and cache_expire >= 0
+
+
+def _cache_keys(datasource: Any) -> List[str]:
+    """:return: keys the datasource's data and errors can be cached under"""
+    keys = []
+    if _caching_enabled(datasource):
+        keys.append(REDIS_DATASOURCE_CACHE_KEY.format(self=datasource))
+    if _negative_caching_enabled(datasource):
+        keys.append(REDIS_DATASOURCE_ERROR_KEY.format(self=datasource))
+    return keys
+
+
+class CacheBatch:
+    """
+    Cache round-trips of datasources fetched together, for e.g. in a project.
+    Their cached data and errors are read by a single MGET before fetching
+    and the fetched data and errors are stored by a single pipeline after.
+    """
+
+    def __init__(self) -> None:
+        self._cached: Dict[str, Optional[bytes]] = {}
+        # key, value, expiration
+        self._pending: List[Tuple[str, str, int]] = []
+        self._deleted: List[str] = []
+
+    async def load(self, datasources: Iterable[Any]) -> None:
+        """On a redis failure, the datasources are fetched as if nothing was cached."""
+        keys = [key for datasource in datasources for key in _cache_keys(datasource)]
+        if REDIS is None or not keys:
+            return
+        try:
+            self._cached = dict(zip(keys, await REDIS.mget(*keys)))
+        except (aioredis.RedisError, OSError) as error:
+            logger.exception(error)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """:return: the value loaded by `load()`, `None` on a miss"""
+        return self._cached.get(key)
+
+    def set(self, key: str, value: str, expire: int) -> None:
+        """Store the value on `flush()`, doesn't expire if `expire` is 0."""
+        self._pending.append((key, value, expire))
+
+    def delete(self, key: str) -> None:
+        """Delete the key on `flush()`."""
+        self._deleted.append(key)
+
+    async def flush(self) -> None:
+        """On a redis failure, nothing is stored, the fetched data is still used."""
+        pending, self._pending = self._pending, []
+        deleted, self._deleted = self._deleted, []
+        if REDIS is None or not (pending or deleted):
+            return
+        pipeline = REDIS.pipeline()
+        if deleted:
+            pipeline.delete(*deleted)
+        for key, value, expire in pending:
+            pipeline.set(key, value, expire=expire)
+        try:
+            await pipeline.execute()
+        except (aioredis.RedisError, OSError) as error:
+            logger.exception(error)
+
+
+def _cache_error(batch: CacheBatch, key: str, detail: str, timeout: bool) -> None:
+    """
+    Store a fetch failure, so it's not retried until it expires.
+
+    :param batch: the batch to store the failure by
+    :param key: the datasource's error key
+    :param detail: error message to raise again with
+    :param timeout: whether the fetch timed out
+    """
+    expire = (
+        SETTINGS.NEGATIVE_CACHE_TIMEOUT_TTL
+        if timeout
+        else SETTINGS.NEGATIVE_CACHE_ERROR_TTL
+    )
+    if expire > 0:
+        batch.set(key, json.dumps({"timeout": timeout, "detail": detail}), expire)
+
+
+def _raise_cached_error(datasource: Any, batch: CacheBatch) -> None:
+    """
+    :param batch: the batch that loaded the datasource's cache entries
+    :raises asyncio.TimeoutError: if the datasource's cached fetch timed out
+    :raises DataSourceFetchError: if the datasource's cached fetch failed
+    """
+    if not _negative_caching_enabled(datasource):
+        return
+    cached = batch.get(REDIS_DATASOURCE_ERROR_KEY.format(self=datasource))
+    if not cached:
+        return
+    entry = json.loads(cached)
+    if entry["timeout"]:
+        raise asyncio.TimeoutError()
+    raise DataSourceFetchError(entry["detail"])
+
+
+async def _fetch(coroutine_method: Any, datasource: Any, batch: CacheBatch) -> Any:
+    """Fetch the data, failures are stored by the batch to be raised again."""
+    negative_caching = _negative_caching_enabled(datasource)
+    error_key = REDIS_DATASOURCE_ERROR_KEY.format(self=datasource)
+    try:
+        return await coroutine_method(datasource)
+    except asyncio.TimeoutError:
+        if negative_caching:
+            _cache_error(batch, error_key, "", timeout=True)
+        raise
+    except DataSourceFetchError as error:
+        if negative_caching:
+            _cache_error(batch, error_key, str(error), timeout=False)
+        raise
+
+
+def _store(datasource: Any, batch: CacheBatch, data: Any, refresh: bool) -> None:
+    """Store the fetched data by the batch, a refresh also forgets a cached failure."""
+    if refresh and _negative_caching_enabled(datasource):
+        batch.delete(REDIS_DATASOURCE_ERROR_KEY.format(self=datasource))
+
+    if _caching_enabled(datasource) and data is not None:
+        try:
+            batch.set(
+                REDIS_DATASOURCE_CACHE_KEY.format(self=datasource),
+                json.dumps(data),
+                datasource.cache_expire,
+            )
+        except TypeError as error:
+            logger.error("Cannot json.dumps() some data")
+            logger.exception(error)
 
 
 def redis_cache(coroutine_method: Any) -> Any:
     """
     A decorator to enforce DRY on caching for datasources.
+
+    Fetched data is cached for `cache_expire` seconds, if set.
+    Timeouts and fetch errors of all datasources are cached
+    for `SETTINGS.NEGATIVE_CACHE_TIMEOUT_TTL` and `SETTINGS.NEGATIVE_CACHE_ERROR_TTL`
+    seconds and raised again without fetching in the meantime.
     """
 
     @wraps(coroutine_method)
-    async def wrapper(self: Any) -> Any:
+    async def wrapper(
+        self: Any, refresh: bool = False, batch: Optional[CacheBatch] = None
+    ) -> Any:
         """
         Caching routines.
+
+        :param refresh: skip the cached data and errors, fetch and store new data
+        :param batch: a batch that loaded the datasource's cache entries,
+                      stores the fetched data when flushed by the caller
         """
         if REDIS is None:
             logger.error("Redis is not initialized")
             return await coroutine_method(self)
 
-        key = REDIS_DATASOURCE_CACHE_KEY.format(self=self)
+        own_batch = batch is None
+        if batch is None:
+            batch = CacheBatch()
+            if not refresh:
+                await batch.load([self])
 
-        if (
-            self.cache_expire is not None
-            and self.cache_expire >= 0
-            and (cached := await REDIS.get(key))
-        ):
-            return json.loads(cached)
+        try:
+            if not refresh:
+                cached = batch.get(REDIS_DATASOURCE_CACHE_KEY.format(self=self))
+                if cached:
+                    return json.loads(cached)
+                _raise_cached_error(self, batch)
 
-        data = await coroutine_method(self)
+            data = await _fetch(coroutine_method, self, batch)
+            _store(self, batch, data, refresh)
+            return data
+        finally:
+            if own_batch:
+                await batch.flush()
 
-        if (
-            self.cache_expire is not None
-            and data is not None
-            and self.cache_expire >= 0
-        ):
-            try:
-                await REDIS.set(key, json.dumps(data), expire=self.cache_expire)
-            except TypeError as error:
-                logger.error("Cannot json.dumps() some data")
-                logger.exception(error)
+    return wrapper
 
-        return data
 
-    return wrapper
+async def refresh_cached(datasource: Any) -> Any:
+    """
+    Fetch a datasource's data bypassing the cache and store it in the cache.
+
+    :param datasource: a datasource with `fetch_data` decorated by `redis_cache`
+    :return: the fetched data
+    """
+    return await datasource.fetch_data(refresh=True)
@@ -0,0 +1,250 @@
+"""Module for the background pre-warming of cached datasources"""
+import asyncio
+import logging
+import math
+import random
+import time
+from typing import Dict, Final, List, Mapping, Optional
+
+from pydantic import ValidationError
+from tortoise.functions import Avg
+
+from apixy import cache
+from apixy.config import SETTINGS
+from apixy.entities.datasource import DataSource
+from apixy.entities.fetch_logger import FetchLogger
+from apixy.models import DataSourceModel, FetchLogModel
+
+logger = logging.getLogger(__name__)
+
+# a refresh starts this many observed fetch durations before the cache expires
+LEAD_FACTOR: Final[float] = 2.0
+# weight of the latest fetch duration in its moving average
+DURATION_SMOOTHING: Final[float] = 0.3
+# lower bound of the time between two refreshes of a datasource (in seconds)
+MIN_INTERVAL: Final[float] = 1.0
+# how long to wait after a failed refresh (in seconds)
+RETRY_INTERVAL: Final[float] = 30.0
+
+
+class WarmupEntry:
+    """
+    Refresh schedule of a single datasource.
+
+    :param datasource: the datasource to refresh
+    :param due: monotonic timestamp of the next refresh
+    :param duration: moving average of fetch durations (in seconds)
+    """
+
+    def __init__(
+        self, datasource: DataSource, due: float, duration: Optional[float] = None
+    ) -> None:
+        self.datasource = datasource
+        self.due = due
+        self.duration = duration
+        self.in_flight = False
+
+
+class CacheWarmer:
+    """
+    Keeps the redis cache of datasources with `cache_expire` set warm,
+    so the first fetch after a deploy or an expiry doesn't wait for the upstream.
+
+    Every datasource is refreshed shortly before its cached data expires,
+    the lead time grows with the observed fetch time and a random jitter
+    (a fraction of `cache_expire`) spreads the refreshes of datasources
+    with the same expiration. Datasources that never expire (`cache_expire=0`)
+    are only warmed when missing from the cache.
+    Datasources are reloaded from the DB every `reload_interval` seconds
+    and refreshed by at most `concurrency` workers at a time.
+    """
+
+    def __init__(self, concurrency: int, reload_interval: float, jitter: float) -> None:
+        self.concurrency = concurrency
+        self.reload_interval = reload_interval
+        self.jitter = jitter
+        self._entries: Dict[int, WarmupEntry] = {}
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._queue: Optional["asyncio.Queue[int]"] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """Start the scheduler and the workers in the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._schedule())] + [
+            asyncio.create_task(self._work()) for _ in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        """Cancel the scheduler and the workers and wait for them to finish."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._entries.clear()
+
+    def forget(self, datasource_id: int) -> None:
+        """
+        Stop refreshing a datasource until the next reload,
+        for e.g. after it has been updated or deleted.
+        """
+        self._entries.pop(datasource_id, None)
+
+    def lead(self, entry: WarmupEntry) -> float:
+        """
+        :return: how long before the cached data expires to refresh it (in seconds)
+        """
+        expire = entry.datasource.cache_expire or 0
+        return (entry.duration or 0.0) * LEAD_FACTOR + random.uniform(  # nosec
+            0, expire * self.jitter
+        )
+
+    def next_due(self, entry: WarmupEntry, now: float) -> float:
+        """
+        :return: monotonic timestamp of the next refresh, `inf` if it never expires
+        """
+        expire = entry.datasource.cache_expire
+        if not expire:
+            return math.inf
+        return now + max(MIN_INTERVAL, expire - self.lead(entry))
+
+    async def reload(self) -> None:
+        """Sync the schedules with the datasources in the DB."""
+        datasources: Dict[int, DataSource] = {}
+        for model in await DataSourceModel.filter(cache_expire__not_isnull=True):
+            try:
+                datasources[model.id] = model.to_pydantic()
+            except (KeyError, ValidationError) as error:
+                logger.exception(error)
+
+        for datasource_id in self._entries.keys() - datasources.keys():
+            self.forget(datasource_id)
+
+        new = []
+        for datasource_id, datasource in datasources.items():
+            entry = self._entries.get(datasource_id)
+            if entry is None:
+                new.append(datasource_id)
+            elif entry.datasource != datasource:
+                # updated elsewhere, takes effect from the next refresh
+                entry.datasource = datasource
+        if new:
+            await self._add(new, datasources)
+
+    @staticmethod
+    async def average_durations(ids: List[int]) -> Dict[int, float]:
+        """
+        :return: average durations (in seconds) of successful fetches by datasource id
+        """
+        rows = (
+            await FetchLogModel.filter(
+                datasource_id__in=ids, status=FetchLogger.FetchStatus.SUCCESS
+            )
+            .annotate(avg=Avg("nanoseconds"))
+            .group_by("datasource_id")
+            .values("datasource_id", "avg")
+        )
+        return {row["datasource_id"]: row["avg"] / 1e9 for row in rows}
+
+    async def _add(self, ids: List[int], datasources: Mapping[int, DataSource]) -> None:
+        """
+        Schedule new datasources, using what's left of their cached data's TTL
+        and their average fetch time from fetch logs.
+        """
+        if cache.REDIS is None:
+            return
+        redis = cache.REDIS
+        durations = await self.average_durations(ids)
+        ttls = await asyncio.gather(
+            *(
+                redis.ttl(cache.REDIS_DATASOURCE_CACHE_KEY.format(self=datasources[i]))
+                for i in ids
+            )
+        )
+        now = time.monotonic()
+        for datasource_id, ttl in zip(ids, ttls):
+            entry = WarmupEntry(
+                datasources[datasource_id], now, durations.get(datasource_id)
+            )
+            if ttl == -1:  # cached without expiration
+                entry.due = math.inf
+            elif ttl >= 0:  # -2 when not cached at all
+                entry.due = max(now, now + ttl - self.lead(entry))
+            self._entries[datasource_id] = entry
+
+    async def refresh(self, entry: WarmupEntry) -> None:
+        """Fetch a datasource's data, store it in the cache and reschedule it."""
+        start = time.monotonic()
+        try:
+            await cache.refresh_cached(entry.datasource)
+        except Exception as error:  # pylint: disable=broad-except
+            logger.warning(
+                "Cache warm-up of datasource %s failed: %r", entry.datasource.id, error
+            )
+            entry.due = time.monotonic() + RETRY_INTERVAL
+            return
+        finally:
+            entry.in_flight = False
+
+        duration = time.monotonic() - start
+        if entry.duration is not None:
+            duration = (
+                DURATION_SMOOTHING * duration
+                + (1 - DURATION_SMOOTHING) * entry.duration
+            )
+        entry.duration = duration
+        entry.due = self.next_due(entry, time.monotonic())
+
+    async def _schedule(self) -> None:
+        assert self._queue is not None and self._wakeup is not None  # nosec
+        next_reload = 0.0
+        while True:
+            now = time.monotonic()
+            if now >= next_reload:
+                try:
+                    await self.reload()
+                except Exception as error:  # pylint: disable=broad-except
+                    logger.exception(error)
+                now = time.monotonic()
+                next_reload = now + self.reload_interval
+
+            next_wakeup = next_reload
+            for datasource_id, entry in self._entries.items():
+                if entry.in_flight:
+                    continue
+                if entry.due <= now:
+                    entry.in_flight = True
+                    self._queue.put_nowait(datasource_id)
+                else:
+                    next_wakeup = min(next_wakeup, entry.due)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), max(0.0, next_wakeup - time.monotonic())
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def _work(self) -> None:
+        assert self._queue is not None and self._wakeup is not None  # nosec
+        while True:
+            datasource_id = await self._queue.get()
+            entry = self._entries.get(datasource_id)
+            if entry is not None:
+                await self.refresh(entry)
+                self._wakeup.set()
+
+
+CACHE_WARMER = CacheWarmer(
+    SETTINGS.CACHE_WARMER_CONCURRENCY,
+    SETTINGS.CACHE_WARMER_RELOAD_INTERVAL,
+    SETTINGS.CACHE_WARMER_JITTER,
+)
@@ -18,7 +18,60 @@ class Settings(BaseConfig):
     POSTGRES_USER: str = environ.get("POSTGRES_USER", "")
     POSTGRES_PASSWORD: str = environ.get("POSTGRES_PASSWORD", "")
     REDIS_URI: str = environ.get("REDIS_URI", "redis://localhost:6379")
+    # connection pools are per worker process, size them by the number of workers
+    DB_POOL_MINSIZE: int = int(environ.get("DB_POOL_MINSIZE", "1"))
+    DB_POOL_MAXSIZE: int = int(environ.get("DB_POOL_MAXSIZE", "5"))
+    REDIS_POOL_MINSIZE: int = int(environ.get("REDIS_POOL_MINSIZE", "1"))
+    REDIS_POOL_MAXSIZE: int = int(environ.get("REDIS_POOL_MAXSIZE", "10"))
+    # delay (in seconds) between startups of worker processes
+    WORKER_STARTUP_STAGGER: float = float(environ.get("WORKER_STARTUP_STAGGER", "0.5"))
+    # datasource types whose drivers are imported at startup instead of on first use,
+    # with preloading, workers share the modules imported before forking
+    PRELOAD_BACKENDS: List[str] = environ.get("PRELOAD_BACKENDS", "").split()
+    # file datasources can read only files within this directory, disabled if empty
+    FILE_DATASOURCE_ROOT: str = environ.get("FILE_DATASOURCE_ROOT", "")
+    # S3 datasources without credentials use the server's own (from the environment
+    # or instance metadata), disabled by default, datasources are created by users
+    S3_AMBIENT_CREDENTIALS: bool = environ.get("S3_AMBIENT_CREDENTIALS", "0") == "1"
     DEFAULT_PAGINATION_LIMIT: int = 30
+    BULK_MAX_SIZE: int = int(environ.get("BULK_MAX_SIZE", "1000"))
+    DNS_CACHE_TTL: int = int(environ.get("DNS_CACHE_TTL", "60"))
+    # how long validated projects are kept in memory, 0 disables the cache
+    PROJECT_CACHE_TTL: int = int(environ.get("PROJECT_CACHE_TTL", "300"))
+    # fetched data smaller than this (in bytes) is sent uncompressed
+    COMPRESSION_MIN_SIZE: int = int(environ.get("COMPRESSION_MIN_SIZE", "1024"))
+    # fetched data larger than this (in bytes) is compressed in a thread
+    COMPRESSION_THREAD_MIN_SIZE: int = int(
+        environ.get("COMPRESSION_THREAD_MIN_SIZE", "262144")
+    )
+    # how long (in seconds) failed fetches are cached, 0 disables caching failures
+    NEGATIVE_CACHE_ERROR_TTL: int = int(environ.get("NEGATIVE_CACHE_ERROR_TTL", "5"))
+    NEGATIVE_CACHE_TIMEOUT_TTL: int = int(
+        environ.get("NEGATIVE_CACHE_TIMEOUT_TTL", "10")
+    )
+    # how long (in seconds) rows of incrementally fetched datasources are kept,
+    # all rows are fetched again after that, so deleted rows disappear
+    DELTA_SNAPSHOT_TTL: int = int(environ.get("DELTA_SNAPSHOT_TTL", "86400"))
+    CACHE_WARMER_ENABLED: bool = environ.get("CACHE_WARMER_ENABLED", "1") == "1"
+    # max number of datasources refreshed at the same time
+    CACHE_WARMER_CONCURRENCY: int = int(environ.get("CACHE_WARMER_CONCURRENCY", "4"))
+    # how often (in seconds) the warmer loads datasources from the DB
+    CACHE_WARMER_RELOAD_INTERVAL: float = float(
+        environ.get("CACHE_WARMER_RELOAD_INTERVAL", "60")
+    )
+    # max fraction of cache_expire by which a refresh is moved ahead
+    CACHE_WARMER_JITTER: float = float(environ.get("CACHE_WARMER_JITTER", "0.1"))
+    LOOP_MONITOR_ENABLED: bool = environ.get("LOOP_MONITOR_ENABLED", "1") == "1"
+    # how often (in seconds) the event loop's lag is sampled
+    LOOP_MONITOR_INTERVAL: float = float(environ.get("LOOP_MONITOR_INTERVAL", "0.1"))
+    # callbacks blocking the event loop for longer (in seconds) are reported
+    LOOP_SLOW_CALLBACK_THRESHOLD: float = float(
+        environ.get("LOOP_SLOW_CALLBACK_THRESHOLD", "0.1")
+    )
+    # how often (in seconds) the profiler samples the event loop's stack
+    PROFILER_INTERVAL: float = float(environ.get("PROFILER_INTERVAL", "0.005"))
+    # required in the X-Admin-Token header by admin endpoints, disabled if empty
+    ADMIN_TOKEN: str = environ.get("ADMIN_TOKEN", "")
 
     ORIGINS: List[str] = list(
         map(str.strip, environ.get("CORS_ORIGINS", "*").split(" "))
@@ -43,6 +96,8 @@ TORTOISE_CONFIG: Final[Dict[str, Any]] = {
                 "password": SETTINGS.POSTGRES_PASSWORD,
                 "port": SETTINGS.POSTGRES_PORT,
                 "user": SETTINGS.POSTGRES_USER,
+                "minsize": SETTINGS.DB_POOL_MINSIZE,
+                "maxsize": SETTINGS.DB_POOL_MAXSIZE,
             },
         }
     },
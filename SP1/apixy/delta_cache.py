@@ -0,0 +1,190 @@
+"""Module for incremental (watermark based) fetching of datasource rows"""
+import datetime
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Final, List, Optional, Tuple
+
+import aioredis
+from pydantic import BaseModel
+from pydantic.json import pydantic_encoder
+
+from apixy import cache
+from apixy.config import SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# the fingerprint changes with the datasource's query, so a snapshot is never
+# merged with rows of a different query
+REDIS_DELTA_KEY: Final[str] = "datasource:{id}:delta:{fingerprint}:{part}"
+# attributes that don't affect which rows are fetched
+NOT_FINGERPRINTED: Final[Tuple[str, ...]] = (
+    "name",
+    "jsonpath",
+    "timeout",
+    "cache_expire",
+)
+
+Row = Dict[str, Any]
+FetchRows = Callable[[Optional[Any]], Awaitable[List[Row]]]
+
+
+def encode_watermark(value: Any) -> str:
+    """Encode a watermark, so dates and datetimes are decoded as such again."""
+    if isinstance(value, datetime.datetime):
+        return json.dumps({"datetime": value.isoformat()})
+    if isinstance(value, datetime.date):
+        return json.dumps({"date": value.isoformat()})
+    return json.dumps({"value": value}, default=pydantic_encoder)
+
+
+def decode_watermark(encoded: bytes) -> Any:
+    """
+    :param encoded: a watermark encoded by `encode_watermark()`
+    :return: the original value
+    """
+    decoded = json.loads(encoded)
+    if "datetime" in decoded:
+        return datetime.datetime.fromisoformat(decoded["datetime"])
+    if "date" in decoded:
+        return datetime.date.fromisoformat(decoded["date"])
+    return decoded["value"]
+
+
+def delta_keys(datasource: BaseModel) -> Tuple[str, str]:
+    """
+    :return: redis keys of the datasource's watermark and its stored rows
+    """
+    fields = datasource.dict(exclude=set(NOT_FINGERPRINTED))
+    fingerprint = hashlib.blake2b(
+        json.dumps(fields, sort_keys=True, default=pydantic_encoder).encode(),
+        digest_size=8,
+    ).hexdigest()
+    return (
+        REDIS_DELTA_KEY.format(
+            id=fields["id"], fingerprint=fingerprint, part="watermark"
+        ),
+        REDIS_DELTA_KEY.format(id=fields["id"], fingerprint=fingerprint, part="rows"),
+    )
+
+
+async def fetch_incremental(
+    datasource: BaseModel,
+    watermark: str,
+    primary_key: Optional[str],
+    fetch_rows: FetchRows,
+) -> List[Row]:
+    """
+    Fetch only the rows newer than the last stored watermark
+    and merge them into the rows stored in redis.
+
+    Without a primary key, new rows are appended (append-only sources),
+    with it, rows with the same key are replaced (sources with updated rows),
+    so their order isn't kept. The stored rows expire
+    `SETTINGS.DELTA_SNAPSHOT_TTL` seconds after the first full fetch,
+    which is when deleted rows disappear.
+
+    :param datasource: the datasource the rows belong to
+    :param watermark: name of a column or field that grows with new or updated rows
+    :param primary_key: name of a column or field that identifies a row
+    :param fetch_rows: fetches rows with the watermark greater than the passed one
+                       (all rows if `None`), ordered by the watermark
+    :return: all rows as decoded from JSON
+    """
+    if cache.REDIS is None:
+        return await fetch_rows(None)
+    redis = cache.REDIS
+    watermark_key, rows_key = delta_keys(datasource)
+
+    encoded_watermark, rows = await _load(redis, (watermark_key, rows_key), primary_key)
+    last = None if encoded_watermark is None else decode_watermark(encoded_watermark)
+
+    new_rows = await fetch_rows(last)
+    if not new_rows:
+        return rows
+    encoded_rows = [json.dumps(row, default=pydantic_encoder) for row in new_rows]
+    await _store(
+        redis,
+        (watermark_key, rows_key),
+        encoded_watermark,
+        encode_watermark(new_rows[-1][watermark]),
+        {str(row[primary_key]): encoded for row, encoded in zip(new_rows, encoded_rows)}
+        if primary_key is not None
+        else encoded_rows,
+    )
+
+    return _merge(rows, [json.loads(row) for row in encoded_rows], primary_key)
+
+
+async def _load(
+    redis: aioredis.Redis, keys: Tuple[str, str], primary_key: Optional[str]
+) -> Tuple[Optional[bytes], List[Row]]:
+    """
+    Read the stored watermark and rows in a single transaction.
+
+    :return: the encoded watermark (`None` if not stored) and the decoded rows
+    """
+    watermark_key, rows_key = keys
+    transaction = redis.multi_exec()
+    stored_watermark = transaction.get(watermark_key)
+    stored_rows = (
+        transaction.hvals(rows_key)
+        if primary_key is not None
+        else transaction.lrange(rows_key, 0, -1)
+    )
+    await transaction.execute()
+    encoded_watermark: Optional[bytes] = await stored_watermark
+    return encoded_watermark, [json.loads(row) for row in await stored_rows]
+
+
+def _merge(
+    rows: List[Row], new_rows: List[Row], primary_key: Optional[str]
+) -> List[Row]:
+    """
+    Append the new rows, or replace the rows with the same primary key by them.
+    """
+    if primary_key is None:
+        return rows + new_rows
+    merged = {str(row[primary_key]): row for row in rows}
+    merged.update((str(row[primary_key]), row) for row in new_rows)
+    return list(merged.values())
+
+
+async def _store(
+    redis: aioredis.Redis,
+    keys: Tuple[str, str],
+    previous_watermark: Optional[bytes],
+    new_watermark: str,
+    new_rows: Any,
+) -> None:
+    """
+    Store new rows with their watermark, unless another fetch already stored
+    rows since `previous_watermark` had been read (then they'd be stored twice).
+    """
+    watermark_key, rows_key = keys
+    with await redis as connection:
+        await connection.watch(watermark_key)
+        current_watermark: Optional[bytes] = await connection.get(watermark_key)
+        if current_watermark != previous_watermark:
+            await connection.unwatch()
+            return
+        if previous_watermark is None:
+            ttl = SETTINGS.DELTA_SNAPSHOT_TTL * 1000
+        else:
+            ttl = await connection.pttl(watermark_key)
+            if ttl <= 0:  # expired in the meantime
+                await connection.unwatch()
+                return
+
+        transaction = connection.multi_exec()
+        if previous_watermark is None:
+            transaction.delete(rows_key)
+        if isinstance(new_rows, dict):
+            transaction.hmset_dict(rows_key, new_rows)
+        else:
+            transaction.rpush(rows_key, *new_rows)
+        transaction.set(watermark_key, new_watermark, pexpire=ttl)
+        transaction.pexpire(rows_key, ttl)
+        results = await transaction.execute(return_exceptions=True)
+    if any(isinstance(result, Exception) for result in results):
+        logger.warning("Rows fetched after %s weren't stored", previous_watermark)
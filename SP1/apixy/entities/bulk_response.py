@@ -0,0 +1,41 @@
+from typing import Any, List, Optional
+
+from pydantic import Field
+
+from .shared import ForbidExtraModel
+
+
+class BulkItemResult(ForbidExtraModel):
+    """
+    Outcome of a single item of a bulk request.
+
+    :param index: position of the item in the request body
+    :param status: HTTP status code the item would get as a standalone request
+    :param location: API link of the created entity (only on success)
+    :param detail: reason of the failure (only on failure)
+    """
+
+    index: int = Field(ge=0)
+    status: int
+    location: Optional[str] = None
+    detail: Optional[Any] = None
+
+
+class BulkResponse(ForbidExtraModel):
+    """
+    Unified format of bulk request results.
+
+    :param created: how many items were created (or linked)
+    :param failed: how many items were rejected
+    :param items: per-item results, in the same order as in the request body
+    """
+
+    created: int = Field(0, ge=0)
+    failed: int = Field(0, ge=0)
+    items: List[BulkItemResult] = Field(default_factory=list)
+
+    @classmethod
+    def from_items(cls, items: List[BulkItemResult]) -> "BulkResponse":
+        items = sorted(items, key=lambda item: item.index)
+        created = sum(1 for item in items if item.status < 400)
+        return cls(created=created, failed=len(items) - created, items=items)
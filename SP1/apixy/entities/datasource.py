@@ -1,37 +1,80 @@
 from __future__ import annotations
 
-import logging
+import ipaddress
+import os
 import socket
 from abc import abstractmethod
-from typing import Annotated, Any, Dict, Final, Literal, Mapping, Optional, Type, Union
-from urllib.parse import urlparse
-
-import aiohttp
-import aiomysql
-import aiosqlite
-import async_timeout
-import asyncpg
-import databases
+from typing import (
+    Annotated,
+    Any,
+    Dict,
+    Final,
+    FrozenSet,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+from urllib.parse import unquote, urlparse
+
 import jmespath
-import motor.motor_asyncio
-import pymongo.errors
-import sqlparse
-from pydantic import AnyUrl, BaseModel, Field, HttpUrl, validator
+from pydantic import AnyHttpUrl, AnyUrl, BaseModel, Field, HttpUrl, SecretStr, validator
 
+from apixy.backends import BACKENDS, load_backend
 from apixy.cache import redis_cache
 from apixy.config import SETTINGS
+from apixy.delta_cache import fetch_incremental
 from apixy.entities.shared import ForbidExtraModel, OmitFieldsConfig
-
-from .validators import validate_nonzero_length
-
-logger = logging.getLogger(__name__)
+from apixy.resolver import resolve
+
+from .validators import (
+    validate_nonzero_length,
+    validate_primary_key,
+    validate_select_query,
+)
+
+SQL_IDENTIFIER: Final[str] = r"^[A-Za-z_][A-Za-z0-9_]*$"
+LOCAL_HOSTNAMES: Final[FrozenSet[str]] = frozenset(
+    ("localhost", "127.0.0.1", "0.0.0.0")  # nosec
+)
+FILE_FORMATS: Final[Mapping[str, str]] = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+}
+# (column, operator, value), the value of "in" is a list
+RowFilter = Tuple[str, Literal["==", "!=", "<", "<=", ">", ">=", "in"], Any]
 
 
-class DataSourceFetchError(Exception):
+async def validate_hostname(hostname: str, name: str) -> None:
     """
-    Unified exception for datasource fetch method to raise in case of fetching failure.
-    To be caught by Project.fetch_data()
+    Make sure the hostname doesn't resolve to a loopback or link-local
+    (for e.g. cloud instance metadata) address, the app's own host or its database.
+
+    :param hostname: hostname or IP address of the destination
+    :param name: name of the destination for error messages
+    :raises ValueError: on unresolvable or forbidden hostname
     """
+    try:
+        target_addresses = await resolve(hostname)
+    except socket.gaierror as socket_error:
+        raise ValueError("Invalid destination url") from socket_error
+
+    forbidden_addresses = await resolve(socket.gethostname())
+    if SETTINGS.POSTGRES_HOST not in LOCAL_HOSTNAMES | {""}:
+        forbidden_addresses |= await resolve(SETTINGS.POSTGRES_HOST)
+
+    # scoped IPv6 addresses (fe80::1%eth0) are link-local
+    ip_addresses = [ipaddress.ip_address(a.split("%")[0]) for a in target_addresses]
+    if target_addresses & forbidden_addresses or any(
+        address.is_loopback or address.is_link_local for address in ip_addresses
+    ):
+        raise ValueError(f"{name} cannot be localhost address")
 
 
 class DataSource(ForbidExtraModel):
@@ -67,6 +110,15 @@ class DataSource(ForbidExtraModel):
         except jmespath.exceptions.ParseError as exception:
             raise ValueError("Invalid JsonPath") from exception
 
+    async def validate_destination(self) -> None:
+        """
+        Validation that is too expensive to run on every model creation
+        (for e.g. DNS lookups). Meant to be run on create/update only,
+        data sources loaded from the DB are trusted.
+
+        :raises ValueError: on forbidden destination
+        """
+
     @abstractmethod
     async def fetch_data(self) -> Any:
         """
@@ -93,125 +145,274 @@ class HTTPDataSource(DataSource):
 
     @redis_cache
     async def fetch_data(self) -> Any:
-        async with async_timeout.timeout(self.timeout):
-            try:
-                async with aiohttp.request(
-                    method=self.method,
-                    url=self.url,
-                    json=self.body,
-                    headers=self.headers,
-                ) as response:
-                    data = await response.json()
-            except aiohttp.ClientError as error:
-                logger.exception(error)
-                raise DataSourceFetchError from error
-
+        data = await load_backend("http").fetch_json(self)
         return jmespath.search(self.jsonpath, data)
 
 
 class MongoDBDataSource(DataSource):
-    """A datasource that fetches data from a MongoDB collection."""
+    """
+    A datasource that fetches data from a MongoDB collection.
+
+    :param watermark: field that grows with new (or updated) documents,
+                      enables fetching only the new documents on a cache miss
+    :param primary_key: field identifying a document, enables replacing
+                        updated documents instead of appending them
+    """
 
     database: str
     collection: str
     query: Dict[str, Any] = {}
+    watermark: Optional[str] = Field(None, min_length=1, regex=r"^[^$]")
+    primary_key: Optional[str] = Field(None, min_length=1)
     type: Annotated[str, Field(regex=r"^mongo$")] = "mongo"
 
+    _primary_key_with_watermark = validator("primary_key", allow_reuse=True)(
+        validate_primary_key
+    )
+
     @redis_cache
     async def fetch_data(self) -> Any:
-        client = motor.motor_asyncio.AsyncIOMotorClient(self.url)
-        async with async_timeout.timeout(self.timeout):
-            cursor = client[self.database][self.collection].find(
-                self.query, {"_id": False}
+        if self.watermark is None:
+            documents = await self.fetch_documents(None)
+        else:
+            documents = await fetch_incremental(
+                self, self.watermark, self.primary_key, self.fetch_documents
             )
-            try:
-                data = await cursor.to_list(None)
-            except pymongo.errors.PyMongoError as error:
-                logger.exception(error)
-                raise DataSourceFetchError from error
-            finally:
-                await cursor.close()
+        return jmespath.search(self.jsonpath, documents)
 
-        return jmespath.search(self.jsonpath, data)
+    async def fetch_documents(self, after: Optional[Any]) -> List[Dict[str, Any]]:
+        """
+        :param after: fetch only documents with the watermark greater than this
+        """
+        documents: List[Dict[str, Any]] = await load_backend("mongo").fetch_documents(
+            self, after
+        )
+        return documents
 
 
 class SQLDataSource(DataSource):
-    """A datasource that fetches data from SQL database."""
+    """
+    A datasource that fetches data from SQL database.
+
+    :param watermark: column that grows with new (or updated) rows,
+                      enables fetching only the new rows on a cache miss
+    :param primary_key: column identifying a row, enables replacing
+                        updated rows instead of appending them
+    """
 
     query: str
+    # interpolated into the query, so only plain identifiers are allowed
+    watermark: Optional[str] = Field(None, regex=SQL_IDENTIFIER)
+    primary_key: Optional[str] = Field(None, regex=SQL_IDENTIFIER)
     type: Annotated[str, Field(regex=r"^sql$")] = "sql"
 
+    _primary_key_with_watermark = validator("primary_key", allow_reuse=True)(
+        validate_primary_key
+    )
+
     @validator("url")
     @classmethod
     def validate_url(cls, url: str) -> str:
-        """Validator for sql database url"""
-        parsed_url = urlparse(url)
-
-        if parsed_url.hostname in (
-            "localhost",
-            "127.0.0.1",
-            "0.0.0.0",  # nosec
-            SETTINGS.POSTGRES_HOST,
-        ):
+        """
+        Cheap validator for sql database url, runs on every model creation.
+        Resolving the url is left to `validate_destination()`.
+        """
+        if urlparse(url).hostname in LOCAL_HOSTNAMES | {SETTINGS.POSTGRES_HOST}:
             raise ValueError("SQL database url cannot be localhost address")
 
-        localhost = socket.gethostname()
-        forbidden_addresses = socket.getaddrinfo(localhost, SETTINGS.POSTGRES_PORT)
-        if SETTINGS.POSTGRES_HOST not in (
-            "",
-            "localhost",
-            "127.0.0.1",
-            "0.0.0.0",  # nosec
-        ):
-            forbidden_addresses.extend(
-                socket.getaddrinfo(SETTINGS.POSTGRES_HOST, SETTINGS.POSTGRES_PORT)
-            )
-
-        try:
-            target_address = socket.getaddrinfo(parsed_url.hostname, parsed_url.port)
-        except socket.gaierror as socket_error:
-            raise ValueError("Invalid destination url") from socket_error
-        for (_, _, _, _, socket_address) in forbidden_addresses:
-            for (_, _, _, _, r_socket_address) in target_address:
-                if r_socket_address[0] == socket_address[0]:
-                    raise ValueError("SQL database url cannot be localhost address")
-
         return url
 
+    async def validate_destination(self) -> None:
+        """
+        Make sure the url doesn't resolve to the app's own host or to its database.
+        """
+        hostname = urlparse(self.url).hostname
+        if hostname is None:
+            # for e.g. unix socket DSNs, there is nothing to resolve
+            raise ValueError("SQL database url must contain a hostname")
+        await validate_hostname(hostname, "SQL database url")
+
     @validator("query")
     @classmethod
     def validate_query(cls, query: str) -> str:
-        """Validator for query"""
-        statements = sqlparse.parse(query)
+        """Validator for query, doesn't load the SQL backend"""
+        return validate_select_query(query)
 
-        if len(statements) != 1:
-            raise ValueError("Query must contain only one statement")
+    @redis_cache
+    async def fetch_data(self) -> Any:
+        if self.watermark is None:
+            rows = await self.fetch_rows(None)
+        else:
+            rows = await fetch_incremental(
+                self, self.watermark, self.primary_key, self.fetch_rows
+            )
+        return jmespath.search(self.jsonpath, rows)
 
-        if statements[0].get_type() != "SELECT":
-            raise ValueError("Query can be only SELECT statement")
+    async def fetch_rows(self, after: Optional[Any]) -> List[Dict[str, Any]]:
+        """
+        :param after: fetch only rows with the watermark greater than this
+        """
+        rows: List[Dict[str, Any]] = await load_backend("sql").fetch_rows(self, after)
+        return rows
 
-        return query
+
+class ColumnarDataSource(DataSource):
+    """
+    A base for datasources reading CSV, Parquet or NDJSON files.
+    Rows are read by pyarrow and both the column selection and the filters
+    are pushed down to it, so Parquet files are read only partially.
+
+    :param format: file format, guessed from the file extension if not set
+    :param columns: columns to read, all if not set
+    :param filters: conditions the rows have to match (all of them),
+                    for e.g. `[["year", ">=", 2020], ["country", "in", ["CZ", "SK"]]]`
+    """
+
+    format: Optional[Literal["csv", "parquet", "ndjson"]] = None
+    columns: Optional[List[str]] = Field(None, min_items=1)
+    filters: Optional[List[RowFilter]] = Field(None, min_items=1)
+
+    @validator("format", always=True)
+    @classmethod
+    def validate_format(cls, value: Optional[str], values: Dict[str, Any]) -> Any:
+        """Guesses the format from the file extension"""
+        if value is None and values.get("url") is not None:
+            extension = os.path.splitext(urlparse(values["url"]).path)[1]
+            value = FILE_FORMATS.get(extension.lower())
+            if value is None:
+                raise ValueError("Unknown file extension, the format has to be set")
+        return value
+
+    @validator("filters", each_item=True)
+    @classmethod
+    def validate_filter(cls, value: RowFilter) -> RowFilter:
+        """Validator for the values of filters"""
+        if (value[1] == "in") != isinstance(value[2], list):
+            raise ValueError("Only the value of the 'in' operator can be a list")
+        return value
 
     @redis_cache
     async def fetch_data(self) -> Any:
-        async with async_timeout.timeout(self.timeout):
-            try:
-                async with databases.Database(self.url) as database:
-                    rows = await database.fetch_all(query=self.query)
-            except KeyError as error:
-                logger.exception(error)
-                raise DataSourceFetchError(
-                    f"Unsupported backend: {self.url}"
-                ) from error
-            except (
-                asyncpg.exceptions.PostgresError,
-                aiomysql.MySQLError,
-                aiosqlite.Error,
-            ) as error:
-                logger.exception(error)
-                raise DataSourceFetchError from error
-
-        return jmespath.search(self.jsonpath, [dict(row) for row in rows])
+        rows = await load_backend(self.type).fetch_rows(self)
+        return jmespath.search(self.jsonpath, rows)
+
+
+class FileUrl(AnyUrl):
+    """`file://` url, unlike other urls, its host is optional"""
+
+    allowed_schemes = {"file"}
+    host_required = False
+
+    @classmethod
+    def validate_host(
+        cls, parts: Dict[str, str]
+    ) -> Tuple[str, Optional[str], str, bool]:
+        # pydantic < 1.9 requires a host in every url
+        if not any(parts[host_type] for host_type in ("domain", "ipv4", "ipv6")):
+            return "", None, "", False
+        return super().validate_host(parts)
+
+
+class FileDataSource(ColumnarDataSource):
+    """
+    A datasource that reads a local (or mounted) file.
+    Only files within `SETTINGS.FILE_DATASOURCE_ROOT` can be read.
+    """
+
+    url: FileUrl
+    type: Annotated[str, Field(regex=r"^file$")] = "file"
+
+    @validator("url")
+    @classmethod
+    def validate_url(cls, url: FileUrl) -> FileUrl:
+        """
+        Cheap validator for the file url, runs on every model creation.
+        Symbolic links are resolved in `validate_destination()`.
+        """
+        if not SETTINGS.FILE_DATASOURCE_ROOT:
+            raise ValueError("File datasources are disabled")
+        root = os.path.normpath(SETTINGS.FILE_DATASOURCE_ROOT)
+        path = os.path.normpath(unquote(url.path or ""))
+        if os.path.commonpath((root, path)) != root:
+            raise ValueError("File has to be within the file datasource root")
+        return url
+
+    async def validate_destination(self) -> None:
+        self.local_path()
+
+    def local_path(self) -> str:
+        """
+        :raises ValueError: if the file (with resolved symbolic links)
+                            isn't within `SETTINGS.FILE_DATASOURCE_ROOT`
+        :return: real path of the file
+        """
+        if not SETTINGS.FILE_DATASOURCE_ROOT:
+            raise ValueError("File datasources are disabled")
+        root = os.path.realpath(SETTINGS.FILE_DATASOURCE_ROOT)
+        path = os.path.realpath(unquote(self.url.path or ""))
+        if os.path.commonpath((root, path)) != root:
+            raise ValueError("File has to be within the file datasource root")
+        return path
+
+
+class S3Url(AnyUrl):
+    allowed_schemes = {"s3"}
+
+
+class S3DataSource(ColumnarDataSource):
+    """
+    A datasource that reads an object from S3 or a S3 compatible storage.
+
+    :param url: `s3://bucket/key`
+    :param endpoint: url of a S3 compatible storage (for e.g. MinIO), AWS if not set
+    :param region: region of the bucket
+    :param access_key: required along with `secret_key`, unless
+                       `SETTINGS.S3_AMBIENT_CREDENTIALS` allows using the server's
+                       own credentials (`AWS_ACCESS_KEY_ID` etc.) instead
+    :param secret_key: never shown in responses
+    """
+
+    url: S3Url
+    endpoint: Optional[AnyHttpUrl] = None
+    region: Optional[str] = Field(None, min_length=1)
+    access_key: Optional[str] = Field(None, min_length=1)
+    secret_key: Optional[SecretStr] = None
+    type: Annotated[str, Field(regex=r"^s3$")] = "s3"
+
+    @validator("secret_key", always=True)
+    @classmethod
+    def validate_secret_key(
+        cls, value: Optional[SecretStr], values: Dict[str, Any]
+    ) -> Optional[SecretStr]:
+        """Credentials are set both or none, none only if the server's are allowed"""
+        if value is not None and not value.get_secret_value():
+            raise ValueError("Cannot be empty.")
+        if (value is None) != (values.get("access_key") is None):
+            raise ValueError("Has to be set along with access_key.")
+        if value is None and not SETTINGS.S3_AMBIENT_CREDENTIALS:
+            raise ValueError("Credentials are required.")
+        return value
+
+    @validator("endpoint")
+    @classmethod
+    def validate_endpoint(cls, endpoint: Optional[AnyHttpUrl]) -> Optional[AnyHttpUrl]:
+        """
+        Cheap validator for the endpoint, runs on every model creation.
+        Resolving it is left to `validate_destination()`.
+        """
+        if endpoint is not None and endpoint.host in LOCAL_HOSTNAMES | {
+            SETTINGS.POSTGRES_HOST
+        }:
+            raise ValueError("Endpoint cannot be localhost address")
+        return endpoint
+
+    async def validate_destination(self) -> None:
+        """
+        Make sure the endpoint doesn't resolve to the app's own host,
+        to its database or to the instance metadata.
+        """
+        if self.endpoint is not None:
+            await validate_hostname(self.endpoint.host, "Endpoint")
 
 
 class HTTPDataSourceInput(HTTPDataSource):
@@ -277,14 +478,87 @@ class SQLDataSourceInput(SQLDataSource):
             )
 
 
+class FileDataSourceInput(FileDataSource):
+    class Config(OmitFieldsConfig, DataSource.Config):
+        omit_fields = ("id",)
+
+        @classmethod
+        def schema_extra(cls, schema: Dict[str, Any], model: Type[BaseModel]) -> None:
+            super().schema_extra(schema, model)
+            schema.update(
+                {
+                    "example": {
+                        "name": "file",
+                        "url": "file:///data/sales.parquet",
+                        "type": "file",
+                        "jsonpath": "[*]",
+                        "columns": ["year", "country", "total"],
+                        "filters": [["year", ">=", 2020]],
+                    }
+                }
+            )
+
+
+class S3DataSourceInput(S3DataSource):
+    class Config(OmitFieldsConfig, DataSource.Config):
+        omit_fields = ("id",)
+
+        @classmethod
+        def schema_extra(cls, schema: Dict[str, Any], model: Type[BaseModel]) -> None:
+            super().schema_extra(schema, model)
+            schema.update(
+                {
+                    "example": {
+                        "name": "s3",
+                        "url": "s3://bucket/sales.csv",
+                        "type": "s3",
+                        "jsonpath": "[*]",
+                        "endpoint": "http://minio:9000",
+                        "access_key": "minioadmin",
+                        "secret_key": "minioadmin",
+                        "filters": [["country", "in", ["CZ", "SK"]]],
+                    }
+                }
+            )
+
+
 class DataSourceUnion(BaseModel):
-    __root__: Union[HTTPDataSource, MongoDBDataSource, SQLDataSource]
+    __root__: Union[
+        HTTPDataSource, MongoDBDataSource, SQLDataSource, FileDataSource, S3DataSource
+    ]
 
 
-DataSourceInput = Union[HTTPDataSourceInput, MongoDBDataSourceInput, SQLDataSourceInput]
+DataSourceInput = Union[
+    HTTPDataSourceInput,
+    MongoDBDataSourceInput,
+    SQLDataSourceInput,
+    FileDataSourceInput,
+    S3DataSourceInput,
+]
 
-DATA_SOURCES: Final[Mapping[str, Type[DataSource]]] = {
+DATA_SOURCES: Final[Dict[str, Type[DataSource]]] = {
     "http": HTTPDataSource,
     "mongo": MongoDBDataSource,
     "sql": SQLDataSource,
+    "file": FileDataSource,
+    "s3": S3DataSource,
 }
+
+
+def register_datasource(datasource_class: Type[DataSource], backend: str) -> None:
+    """
+    Plugs in a new datasource type. Its `fetch_data()` gets the backend module
+    by `load_backend()`, so the backend's dependencies are imported lazily.
+    Datasources of the type can be loaded from the DB and fetched in projects,
+    to create them through the API, add the class to `DataSourceUnion`
+    and its input class to `DataSourceInput`.
+
+    :param datasource_class: model with the default of its `type` field set
+    :param backend: name of the backend module
+    :raises ValueError: if the type is already registered
+    """
+    datasource_type = datasource_class.__fields__["type"].default
+    if datasource_type in DATA_SOURCES:
+        raise ValueError(f"Datasource type {datasource_type!r} already registered")
+    DATA_SOURCES[datasource_type] = datasource_class
+    BACKENDS[datasource_type] = backend
@@ -10,8 +10,7 @@ from typing import Any, Awaitable, Callable, Optional, Tuple
 
 from pydantic import Field
 
-from apixy.entities.datasource import DataSourceFetchError
-from apixy.entities.shared import ForbidExtraModel
+from apixy.entities.shared import DataSourceFetchError, ForbidExtraModel
 
 
 class FetchLogger:
@@ -0,0 +1,34 @@
+from typing import Optional
+
+from .loop import LoopStats
+from .shared import ForbidExtraModel
+
+
+class WorkerHealth(ForbidExtraModel):
+    """
+    Health of the worker process that handled the request.
+
+    :param worker: hostname and process id
+    :param index: worker slot under the multi-worker launcher
+    :param uptime: seconds since the worker's startup
+    :param database: whether the DB responds
+    :param redis: whether redis responds
+    :param invalidation_listener: whether invalidations from other workers apply
+    :param cache_warmer: whether this worker pre-warms data source caches
+    :param cached_projects: number of projects in the in-process cache
+    :param loop: event loop statistics, `None` if the loop monitor isn't running
+    """
+
+    worker: str
+    index: Optional[int]
+    uptime: float
+    database: bool
+    redis: bool
+    invalidation_listener: bool
+    cache_warmer: bool
+    cached_projects: int
+    loop: Optional[LoopStats]
+
+    @property
+    def healthy(self) -> bool:
+        return self.database and self.redis and self.invalidation_listener
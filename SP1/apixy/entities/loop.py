@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import List, Optional
+
+from .shared import ForbidExtraModel
+
+
+class LoopStats(ForbidExtraModel):
+    """
+    Event loop statistics of a worker, computed from the latest lag samples.
+
+    :param lag_p50: median lag (in milliseconds)
+    :param lag_p99: 99th percentile of the lag (in milliseconds)
+    :param lag_max: max lag (in milliseconds)
+    :param slow_callbacks: number of callbacks that blocked the loop for longer
+                           than the threshold since the worker's startup
+    :param profiling: whether the sampling profiler is running
+    """
+
+    lag_p50: float
+    lag_p99: float
+    lag_max: float
+    slow_callbacks: int
+    profiling: bool
+
+
+class SlowCallbackReport(ForbidExtraModel):
+    """
+    :param started: approximate time the loop got blocked at
+    :param duration: how long the loop was blocked (in milliseconds),
+                     `None` if it still is
+    :param stack: stack of the loop's thread while it was blocked, innermost last
+    """
+
+    started: datetime
+    duration: Optional[float]
+    stack: List[str]
+
+
+class LoopReport(ForbidExtraModel):
+    """
+    :param stats: the loop's statistics
+    :param slow: the latest slow callbacks, the most recent last
+    :param profile_samples: number of samples collected by the profiler
+    """
+
+    stats: LoopStats
+    slow: List[SlowCallbackReport]
+    profile_samples: int
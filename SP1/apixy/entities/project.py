@@ -1,13 +1,18 @@
 import asyncio
 import logging
+from functools import partial
 from typing import Any, Dict, List, Optional, Type, Union, cast
 
 from pydantic import BaseModel, Field
 
+from apixy.cache import CacheBatch
+from apixy.entities.shared import DataSourceFetchError
+
 from .datasource import (
-    DataSourceFetchError,
+    FileDataSource,
     HTTPDataSource,
     MongoDBDataSource,
+    S3DataSource,
     SQLDataSource,
 )
 from .fetch_logger import FetchLogger
@@ -39,16 +44,32 @@ class Project(ForbidExtraModel):
 
 
 class ProjectWithDataSources(Project):
-    datasources: List[Union[HTTPDataSource, MongoDBDataSource, SQLDataSource]]
+    datasources: List[
+        Union[
+            HTTPDataSource,
+            MongoDBDataSource,
+            SQLDataSource,
+            FileDataSource,
+            S3DataSource,
+        ]
+    ]
+
+    class Config:
+        # instances are shared between requests by the project cache
+        allow_mutation = False
 
     async def fetch_data(self, fetch_logger: FetchLogger) -> ProxyResponse:
 
         fetched, errors = [], []
+        # one redis round-trip for all cached datasources instead of one for each
+        batch = CacheBatch()
+        await batch.load(self.datasources)
         fetch = (
-            fetch_logger.fetch_timer(datasource.fetch_data)
+            fetch_logger.fetch_timer(partial(datasource.fetch_data, batch=batch))
             for datasource in self.datasources
         )
         gathered = await asyncio.gather(*fetch, return_exceptions=True)
+        await batch.flush()
         for index, (result, nanoseconds) in enumerate(gathered):
             if not isinstance(result, Exception):
                 fetched.append(result)
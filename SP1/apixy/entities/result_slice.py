@@ -0,0 +1,104 @@
+from functools import lru_cache
+from itertools import islice
+from typing import Any, FrozenSet, Optional, Tuple
+
+import jmespath
+from pydantic import Field, validator
+
+from .proxy_response import ProxyResponse
+from .shared import ForbidExtraModel
+
+
+@lru_cache(maxsize=256)
+def compile_filter(expression: str) -> jmespath.parser.ParsedResult:
+    """Compiled JMESPath expressions, clients tend to repeat the same ones."""
+    return jmespath.compile(expression)
+
+
+class ResultSlice(ForbidExtraModel):
+    """
+    Selects a part of a project's merged data, in this order:
+
+    :param filter: JMESPath (https://jmespath.org/) expression applied to the data
+    :param offset: number of items (list elements or object members) to skip
+    :param limit: max number of items to return
+    :param fields: keys to keep in objects within the items, others are dropped
+    """
+
+    filter: Optional[str] = None
+    offset: int = Field(0, ge=0)
+    limit: Optional[int] = Field(None, ge=1)
+    fields: Optional[FrozenSet[str]] = None
+
+    @validator("filter")
+    @classmethod
+    def validate_filter(cls, value: Optional[str]) -> Optional[str]:
+        """Validator for jmespath strings"""
+        if value is not None:
+            try:
+                compile_filter(value)
+            except jmespath.exceptions.ParseError as exception:
+                raise ValueError("Invalid JMESPath filter") from exception
+        return value
+
+    @property
+    def is_noop(self) -> bool:
+        return (
+            self.filter is None
+            and self.offset == 0
+            and self.limit is None
+            and self.fields is None
+        )
+
+    def apply(self, response: ProxyResponse) -> Tuple[ProxyResponse, int]:
+        """
+        Creates a new response, the passed one may be shared and isn't modified.
+
+        :raises ValueError: when the filter cannot be evaluated on the data
+        :return: the response with the selected data and number of items
+                 matching the filter (before `offset` and `limit`)
+        """
+        data = response.result.data
+        if self.filter is not None:
+            try:
+                data = compile_filter(self.filter).search(data)
+            except jmespath.exceptions.JMESPathError as exception:
+                raise ValueError(str(exception)) from exception
+
+        total = _size(data)
+        stop = None if self.limit is None else self.offset + self.limit
+        if isinstance(data, list):
+            data = data[self.offset : stop]
+        elif isinstance(data, dict) and (self.offset or stop is not None):
+            data = dict(islice(data.items(), self.offset, stop))
+
+        if self.fields is not None:
+            data = _project(data, self.fields)
+
+        return (
+            ProxyResponse.construct(
+                result=ProxyResponse.Container.construct(size=_size(data), data=data),
+                errors=response.errors,
+            ),
+            total,
+        )
+
+
+def _size(data: Any) -> int:
+    if isinstance(data, (list, dict)):
+        return len(data)
+    return 0 if data is None else 1
+
+
+def _project(data: Any, fields: FrozenSet[str], depth: int = 0) -> Any:
+    """
+    Keep only `fields` in objects within the items of `data`,
+    the items themselves (members of a top-level object) are kept.
+    """
+    if isinstance(data, list):
+        return [_project(item, fields, depth + 1) for item in data]
+    if isinstance(data, dict):
+        if depth == 0:
+            return {key: _project(item, fields, 1) for key, item in data.items()}
+        return {key: value for key, value in data.items() if key in fields}
+    return data
@@ -3,6 +3,13 @@ from typing import Any, Dict, Iterable, Type
 from pydantic import BaseConfig, BaseModel, Extra
 
 
+class DataSourceFetchError(Exception):
+    """
+    Unified exception for datasource fetch method to raise in case of fetching failure.
+    To be caught by Project.fetch_data()
+    """
+
+
 class ForbidExtraModel(BaseModel):
     """
     A base class to enforce DRY.
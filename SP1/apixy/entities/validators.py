@@ -1,4 +1,4 @@
-from typing import Optional, Sized
+from typing import Any, Dict, Optional, Sized
 
 
 def validate_nonzero_length(value: Optional[Sized]) -> Optional[Sized]:
@@ -9,3 +9,30 @@ def validate_nonzero_length(value: Optional[Sized]) -> Optional[Sized]:
     if value is not None and len(value) == 0:
         raise ValueError("Must be either null or not empty.")
     return value
+
+
+def validate_primary_key(value: Optional[str], values: Dict[str, Any]) -> Optional[str]:
+    """
+    A primary key only makes sense for incrementally fetched datasources.
+    """
+    if value is not None and values.get("watermark") is None:
+        raise ValueError("Can be set only along with watermark.")
+    return value
+
+
+def validate_select_query(query: str) -> str:
+    """
+    A query must be a single SELECT statement.
+    sqlparse is imported on the first validation, like the SQL drivers.
+    """
+    import sqlparse  # pylint: disable=import-outside-toplevel
+
+    statements = sqlparse.parse(query)
+
+    if len(statements) != 1:
+        raise ValueError("Query must contain only one statement")
+
+    if statements[0].get_type() != "SELECT":
+        raise ValueError("Query can be only SELECT statement")
+
+    return query
@@ -0,0 +1,140 @@
+"""
+Module for invalidating the in-process caches of all workers through redis pub/sub
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Final, Optional
+
+import aioredis
+
+from apixy import cache
+from apixy.cache_warmer import CACHE_WARMER
+from apixy.project_cache import PROJECT_PLANS
+from apixy.workers import worker_id
+
+logger = logging.getLogger(__name__)
+
+REDIS_INVALIDATION_CHANNEL: Final[str] = "apixy:invalidate"
+# seconds between attempts to renew a lost subscription, doubled after each failure
+RECONNECT_MIN_DELAY: Final[float] = 0.5
+RECONNECT_MAX_DELAY: Final[float] = 30.0
+
+
+def _invalidate_locally(kind: str, object_id: int) -> None:
+    if kind == "project":
+        PROJECT_PLANS.invalidate_project(object_id)
+    elif kind == "datasource":
+        PROJECT_PLANS.invalidate_datasource(object_id)
+        CACHE_WARMER.forget(object_id)
+
+
+async def _publish(kind: str, object_id: int) -> None:
+    if cache.REDIS is None:
+        return
+    try:
+        await cache.REDIS.publish_json(
+            REDIS_INVALIDATION_CHANNEL,
+            {"sender": worker_id(), "kind": kind, "id": object_id},
+        )
+    except (aioredis.RedisError, OSError) as error:
+        logger.exception(error)
+
+
+async def invalidate_project(project_id: int) -> None:
+    """Drop a project from the in-process caches of this and all other workers."""
+    _invalidate_locally("project", project_id)
+    await _publish("project", project_id)
+
+
+async def invalidate_datasource(datasource_id: int) -> None:
+    """
+    Drop projects with the datasource from the in-process caches
+    of this and all other workers.
+    """
+    _invalidate_locally("datasource", datasource_id)
+    await _publish("datasource", datasource_id)
+
+
+class InvalidationListener:
+    """
+    Applies invalidations published by other workers.
+
+    If the subscription is lost, it's renewed with exponential backoff.
+    Invalidations published in the meantime are missed, so the project plans
+    are dropped both when the subscription is lost and when it's renewed.
+    """
+
+    def __init__(self) -> None:
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._subscribed = False
+        self._stopping = False
+        self.received = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done() and self._subscribed
+
+    async def start(self) -> None:
+        if cache.REDIS is None or self.running:
+            return
+        self._stopping = False
+        channel = await self._subscribe()
+        self._task = asyncio.create_task(self._run(channel))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopping = True
+        if cache.REDIS is not None and not cache.REDIS.closed:
+            try:
+                await cache.REDIS.unsubscribe(REDIS_INVALIDATION_CHANNEL)
+            except (aioredis.RedisError, OSError) as error:
+                logger.exception(error)
+        try:
+            await asyncio.wait_for(self._task, timeout=1)
+        except asyncio.TimeoutError:
+            pass
+        self._task = None
+        self._subscribed = False
+
+    async def _subscribe(self) -> Any:
+        if cache.REDIS is None:
+            raise aioredis.PoolClosedError("Redis is not initialized")
+        (channel,) = await cache.REDIS.subscribe(REDIS_INVALIDATION_CHANNEL)
+        self._subscribed = True
+        return channel
+
+    async def _run(self, channel: Any) -> None:
+        while True:
+            await self._listen(channel)
+            self._subscribed = False
+            if self._stopping:
+                return
+            logger.warning("Lost the subscription to cache invalidations")
+            PROJECT_PLANS.clear()
+            channel = await self._resubscribe()
+            PROJECT_PLANS.clear()
+
+    async def _resubscribe(self) -> Any:
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                return await self._subscribe()
+            except (aioredis.RedisError, OSError) as error:
+                logger.warning("Cannot subscribe to cache invalidations: %s", error)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def _listen(self, channel: Any) -> None:
+        while await channel.wait_message():
+            try:
+                message = await channel.get_json()
+                if message["sender"] != worker_id():
+                    _invalidate_locally(message["kind"], int(message["id"]))
+                    self.received += 1
+            except (json.JSONDecodeError, KeyError, TypeError, ValueError) as error:
+                logger.exception(error)
+
+
+INVALIDATION_LISTENER = InvalidationListener()
@@ -0,0 +1,237 @@
+"""Module for monitoring the event loop's lag, blocking callbacks and profiling it"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime
+from types import FrameType
+from typing import Deque, Final, List, Optional
+
+from apixy.config import SETTINGS
+from apixy.entities.loop import LoopReport, LoopStats, SlowCallbackReport
+
+logger = logging.getLogger(__name__)
+
+# number of the latest lag samples the statistics are computed from
+LAG_SAMPLES: Final[int] = 1000
+# number of the latest slow callbacks kept
+SLOW_CALLBACKS: Final[int] = 20
+# max number of distinct stacks counted by the profiler, others are counted together
+PROFILE_MAX_STACKS: Final[int] = 10000
+PROFILE_OTHER_STACKS: Final[str] = "[other]"
+
+
+class SlowCallback:
+    """
+    A callback that blocked the event loop for longer than the threshold.
+
+    :param started: wall-clock timestamp of when the loop got blocked
+    :param stack: formatted stack of the loop's thread while it was blocked
+    """
+
+    def __init__(self, started: float, stack: List[str]) -> None:
+        self.started = started
+        self.stack = stack
+        # in seconds, set once the loop isn't blocked anymore
+        self.duration: Optional[float] = None
+
+
+def _percentile(ordered: List[float], percent: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def _folded(frame: FrameType) -> str:
+    """:return: the stack in the folded format of flame graph tools, outermost first"""
+    names = []
+    current: Optional[FrameType] = frame
+    while current is not None:
+        code = current.f_code
+        names.append(f"{code.co_name} ({code.co_filename}:{current.f_lineno})")
+        current = current.f_back
+    return ";".join(reversed(names))
+
+
+# the state is shared by the sampling task and the watchdog thread under one lock,
+# splitting it into more objects would only spread the locking over them
+class LoopMonitor:  # pylint: disable=too-many-instance-attributes
+    """
+    Measures the lag of the event loop by a task waking up every `interval` seconds.
+
+    A watchdog thread checks the task wakes up in time. When it doesn't for more
+    than `threshold` seconds, a callback is blocking the loop and the watchdog
+    captures the stack of the loop's thread, pointing at the blocking code
+    (for e.g. a synchronous DNS lookup or decoding of a large JSON).
+    When the profiler is enabled, the watchdog also samples the stack
+    every `profiler_interval` seconds.
+    """
+
+    def __init__(
+        self, interval: float, threshold: float, profiler_interval: float
+    ) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.profiler_interval = profiler_interval
+        self.lags: Deque[float] = deque(maxlen=LAG_SAMPLES)
+        self.slow_callbacks: Deque[SlowCallback] = deque(maxlen=SLOW_CALLBACKS)
+        self.slow_callbacks_total = 0
+        # folded stack -> number of samples
+        self.profile: "Counter[str]" = Counter()
+        self._profile_until: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._last_tick = 0.0
+        self._stalled: Optional[SlowCallback] = None
+        self._loop_thread_id = 0
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return (
+            self._task is not None
+            and not self._task.done()
+            and not self._task.get_loop().is_closed()
+        )
+
+    @property
+    def profiling(self) -> bool:
+        until = self._profile_until
+        return until is not None and time.monotonic() < until
+
+    def start(self) -> None:
+        """Start monitoring the running event loop."""
+        if self.running:
+            return
+        # left over from a closed loop
+        self._stop_watchdog()
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._sample())
+        self._thread = threading.Thread(
+            target=self._watch,
+            args=(asyncio.get_running_loop(),),
+            name="apixy-loop-watchdog",
+            daemon=True,
+        )
+        self._thread.start()
+
+    async def stop(self) -> None:
+        if self.running:
+            assert self._task is not None  # nosec
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._stop_watchdog()
+
+    def _stop_watchdog(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            # wakes up right away, the stop event is set
+            self._thread.join()
+            self._thread = None
+
+    def start_profiler(self, duration: float) -> None:
+        """Collect stacks for `duration` seconds, the previous profile is dropped."""
+        with self._lock:
+            self.profile.clear()
+            self._profile_until = time.monotonic() + duration
+
+    def stop_profiler(self) -> None:
+        self._profile_until = None
+
+    def folded_profile(self) -> str:
+        """:return: the profile in the folded format, for e.g. for flamegraph.pl"""
+        with self._lock:
+            return "".join(
+                f"{stack} {count}\n" for stack, count in self.profile.most_common()
+            )
+
+    def stats(self) -> LoopStats:
+        ordered = sorted(self.lags)
+        return LoopStats(
+            lag_p50=_percentile(ordered, 50) * 1e3,
+            lag_p99=_percentile(ordered, 99) * 1e3,
+            lag_max=max(ordered, default=0.0) * 1e3,
+            slow_callbacks=self.slow_callbacks_total,
+            profiling=self.profiling,
+        )
+
+    def report(self) -> LoopReport:
+        with self._lock:
+            slow = [
+                SlowCallbackReport(
+                    started=datetime.fromtimestamp(callback.started),
+                    duration=None
+                    if callback.duration is None
+                    else callback.duration * 1e3,
+                    stack=callback.stack,
+                )
+                for callback in self.slow_callbacks
+            ]
+            samples = sum(self.profile.values())
+        return LoopReport(stats=self.stats(), slow=slow, profile_samples=samples)
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.lags.append(lag)
+            with self._lock:
+                self._last_tick = time.monotonic()
+                if self._stalled is not None:
+                    self._stalled.duration = lag
+                    self._stalled = None
+
+    def _watch(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Runs in the watchdog thread, until stopped or the loop gets closed."""
+        while not self._stop.wait(self._watch_interval()) and not loop.is_closed():
+            # pylint: disable=protected-access
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            now = time.monotonic()
+            with self._lock:
+                if self.profiling:
+                    self._add_sample(frame)
+                blocked = now - self._last_tick - self.interval
+                if blocked >= self.threshold and self._stalled is None:
+                    self._stalled = SlowCallback(
+                        time.time() - blocked, traceback.format_stack(frame)
+                    )
+                    self.slow_callbacks.append(self._stalled)
+                    self.slow_callbacks_total += 1
+                    logger.warning(
+                        "Event loop blocked for over %.3fs at:\n%s",
+                        self.threshold,
+                        "".join(self._stalled.stack[-5:]),
+                    )
+
+    def _watch_interval(self) -> float:
+        interval = min(self.interval, self.threshold / 2)
+        if self.profiling:
+            interval = min(interval, self.profiler_interval)
+        return interval
+
+    def _add_sample(self, frame: FrameType) -> None:
+        stack = _folded(frame)
+        if stack not in self.profile and len(self.profile) >= PROFILE_MAX_STACKS:
+            stack = PROFILE_OTHER_STACKS
+        self.profile[stack] += 1
+
+
+LOOP_MONITOR = LoopMonitor(
+    interval=SETTINGS.LOOP_MONITOR_INTERVAL,
+    threshold=SETTINGS.LOOP_SLOW_CALLBACK_THRESHOLD,
+    profiler_interval=SETTINGS.PROFILER_INTERVAL,
+)
@@ -0,0 +1,8 @@
+-- upgrade --
+CREATE INDEX "idx_project_name_4d952a" ON "project" ("name" varchar_pattern_ops);
+CREATE INDEX "idx_datasource_name_4726cf" ON "datasource" ("name" varchar_pattern_ops);
+CREATE INDEX "idx_datasource_type_06b7cd" ON "datasource" ("type", "id");
+-- downgrade --
+DROP INDEX "idx_project_name_4d952a";
+DROP INDEX "idx_datasource_name_4726cf";
+DROP INDEX "idx_datasource_type_06b7cd";
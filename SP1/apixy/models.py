@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 from abc import abstractmethod
-from typing import Generic, Type, TypeVar
+from typing import Any, Dict, Generic, List, Type, TypeVar
 
-from pydantic import BaseModel
+from pydantic import BaseModel, SecretStr
 from tortoise import fields
 from tortoise.models import Model
 
@@ -18,6 +18,14 @@ from apixy.entities.project import (
 Entity = TypeVar("Entity", bound=BaseModel)
 
 
+def reveal_secrets(entity_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """:return: the dict with secrets (for e.g. S3 keys) in plain text, for storing"""
+    return {
+        key: value.get_secret_value() if isinstance(value, SecretStr) else value
+        for key, value in entity_dict.items()
+    }
+
+
 class ORMModel(Generic[Entity]):
     @abstractmethod
     def to_pydantic(self) -> Entity:
@@ -35,7 +43,8 @@ class Project(ORMModel[ProjectEntity], Model):
     id = fields.IntField(pk=True)
     # slug is globally unique for now - this might need to be changed in the future
     slug = fields.CharField(128, unique=True)
-    name = fields.CharField(64)
+    # indexed with varchar_pattern_ops (see migrations) for name prefix filtering
+    name = fields.CharField(64, index=True)
     merge_strategy = fields.CharField(32)
     description = fields.CharField(512, null=True)
     sources: fields.ManyToManyRelation["DataSourceModel"] = fields.ManyToManyField(
@@ -47,9 +56,11 @@ class Project(ORMModel[ProjectEntity], Model):
 
     async def to_pydantic_with_datasources(self) -> ProjectWithDataSourcesEntity:
         project = ProjectEntity.from_orm(self)
-        return ProjectWithDataSourcesEntity(
-            **project.dict(),
-            datasources=[ds.to_pydantic() async for ds in self.sources.all()]
+        datasources: List[Any] = [ds.to_pydantic() async for ds in self.sources.all()]
+        # both the project and its data sources are validated at this point,
+        # construct() avoids validating the data sources union once again
+        return ProjectWithDataSourcesEntity.construct(
+            **project.dict(), datasources=datasources
         )
 
     @classmethod
@@ -62,7 +73,8 @@ class DataSource(ORMModel[DataSourceEntity], Model):
 
     projects: fields.ManyToManyRelation[ProjectModel]
     id = fields.IntField(pk=True)
-    name = fields.CharField(64)
+    # indexed with varchar_pattern_ops (see migrations) for name prefix filtering
+    name = fields.CharField(64, index=True)
     url = fields.CharField(max_length=1024)
     type = fields.CharField(max_length=32)
     jsonpath = fields.CharField(max_length=128)
@@ -70,6 +82,10 @@ class DataSource(ORMModel[DataSourceEntity], Model):
     cache_expire = fields.IntField(null=True)
     data = fields.JSONField()
 
+    class Meta:
+        # keyset pagination filtered by type
+        indexes = (("type", "id"),)
+
     def to_pydantic(self) -> DataSourceEntity:
         """
         :raises KeyError: on wrong datasource name in `type`
@@ -87,8 +103,12 @@ class DataSource(ORMModel[DataSourceEntity], Model):
         )
 
     @classmethod
-    def from_pydantic(cls, entity: DataSourceEntity) -> DataSourceModel:
-        entity_dict = entity.dict(exclude={"id"})
+    def from_pydantic(cls, entity: DataSourceEntity, **kwargs: Any) -> DataSourceModel:
+        """
+        :param entity: the entity to take attributes from
+        :param kwargs: extra model attributes, for e.g. a reserved `id`
+        """
+        entity_dict = reveal_secrets(entity.dict(exclude={"id"}))
         return cls(
             name=entity_dict.pop("name"),
             url=str(entity_dict.pop("url")),
@@ -97,6 +117,7 @@ class DataSource(ORMModel[DataSourceEntity], Model):
             timeout=entity_dict.pop("timeout"),
             cache_expire=entity_dict.pop("cache_expire"),
             data=entity_dict,
+            **kwargs
         )
 
     def apply_update(self, entity: DataSourceEntity) -> None:
@@ -109,7 +130,7 @@ class DataSource(ORMModel[DataSourceEntity], Model):
         """
         if self.type != entity.type:
             raise ValueError("Cannot change type.")
-        entity_dict = entity.dict(exclude={"id", "type"})
+        entity_dict = reveal_secrets(entity.dict(exclude={"id", "type"}))
         self.url = entity_dict.pop("url")
         self.name = entity_dict.pop("name")
         self.timeout = entity_dict.pop("timeout")
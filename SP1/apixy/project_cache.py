@@ -0,0 +1,90 @@
+"""Module for the in-process cache of validated projects (fetch plans)"""
+import time
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from apixy.config import SETTINGS
+from apixy.entities.project import ProjectWithDataSources
+
+
+class ProjectPlanCache:
+    """
+    Keeps validated projects with their data sources in memory,
+    so they don't have to be loaded from the DB and validated on every fetch.
+
+    Entries are invalidated on project/datasource writes
+    and expire after `ttl` seconds as a safety net.
+    Every invalidation starts a new `generation`, plans loaded
+    in an older one are not stored, they may predate the write.
+    """
+
+    def __init__(self, ttl: int) -> None:
+        self.ttl = ttl
+        # project id -> (expiration timestamp, plan)
+        self._plans: Dict[int, Tuple[float, ProjectWithDataSources]] = {}
+        self._slugs: Dict[str, int] = {}
+        self.generation = 0
+
+    def get(
+        self, project_id: Optional[int] = None, slug: Optional[str] = None
+    ) -> Optional[ProjectWithDataSources]:
+        """
+        Look a plan up by project id or slug.
+
+        :return: the cached plan, `None` if missing or expired
+        """
+        if project_id is None and slug is not None:
+            project_id = self._slugs.get(slug)
+        if project_id is None or (entry := self._plans.get(project_id)) is None:
+            return None
+        expires, plan = entry
+        if expires <= time.monotonic():
+            self._drop(project_id)
+            return None
+        return plan
+
+    def put(
+        self, plan: ProjectWithDataSources, generation: Optional[int] = None
+    ) -> None:
+        """
+        :param generation: `generation` read before the plan was loaded,
+                           the plan is not stored if it has changed since
+        """
+        if self.ttl <= 0 or plan.id is None:
+            return
+        if generation is not None and generation != self.generation:
+            return
+        self._plans[plan.id] = (time.monotonic() + self.ttl, plan)
+        self._slugs[plan.slug] = plan.id
+
+    def invalidate_project(self, project_id: int) -> None:
+        self.generation += 1
+        self._drop(project_id)
+
+    def _drop(self, project_id: int) -> None:
+        if (entry := self._plans.pop(project_id, None)) is not None:
+            self._slugs.pop(entry[1].slug, None)
+
+    def invalidate_datasource(self, datasource_id: int) -> None:
+        """Drop all plans that contain the data source."""
+        # also when no cached plan contains it, a plan being loaded may
+        self.generation += 1
+        for project_id in self.projects_with_datasource(datasource_id):
+            self.invalidate_project(project_id)
+
+    def projects_with_datasource(self, datasource_id: int) -> FrozenSet[int]:
+        return frozenset(
+            project_id
+            for project_id, (_, plan) in self._plans.items()
+            if any(ds.id == datasource_id for ds in plan.datasources)
+        )
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._plans.clear()
+        self._slugs.clear()
+
+
+PROJECT_PLANS = ProjectPlanCache(SETTINGS.PROJECT_CACHE_TTL)
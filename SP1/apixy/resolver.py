@@ -0,0 +1,44 @@
+"""Module for a TTL-cached asynchronous DNS resolver"""
+import asyncio
+import time
+from typing import Final, FrozenSet, OrderedDict, Tuple
+
+from apixy.config import SETTINGS
+
+# the least recently used hosts are forgotten above this count
+MAX_CACHED_HOSTS: Final[int] = 4096
+
+# host -> (expiration timestamp, resolved IP addresses), least recently used first
+_CACHE: OrderedDict[str, Tuple[float, FrozenSet[str]]] = OrderedDict()
+
+
+async def resolve(host: str) -> FrozenSet[str]:
+    """
+    Resolve a hostname to its IP addresses.
+
+    The lookup runs in the event loop's executor, so it never blocks the loop,
+    and successful results are cached for `SETTINGS.DNS_CACHE_TTL` seconds,
+    for at most `MAX_CACHED_HOSTS` hosts.
+
+    :param host: hostname or IP address
+    :raises socket.gaierror: when the hostname cannot be resolved
+    :return: set of resolved IP addresses
+    """
+    now = time.monotonic()
+    cached = _CACHE.get(host)
+    if cached is not None and cached[0] > now:
+        _CACHE.move_to_end(host)
+        return cached[1]
+
+    address_info = await asyncio.get_running_loop().getaddrinfo(host, None)
+    addresses = frozenset(socket_address[0] for *_, socket_address in address_info)
+    _CACHE[host] = (now + SETTINGS.DNS_CACHE_TTL, addresses)
+    _CACHE.move_to_end(host)
+    while len(_CACHE) > MAX_CACHED_HOSTS:
+        _CACHE.popitem(last=False)
+    return addresses
+
+
+def clear_cache() -> None:
+    """Forget all cached lookups."""
+    _CACHE.clear()
@@ -0,0 +1,53 @@
+"""Module for the identity and startup of worker processes"""
+import asyncio
+import os
+import socket
+import time
+from typing import Final, Optional
+
+from apixy.config import SETTINGS
+
+# set by gunicorn.conf.py in every forked worker
+WORKER_INDEX_ENV: Final[str] = "APIXY_WORKER_INDEX"
+
+_STARTED: Optional[float] = None
+
+
+def worker_index() -> Optional[int]:
+    """
+    :return: index of the worker's slot (kept when a worker is restarted),
+             `None` if not running under the multi-worker launcher
+    """
+    index = os.environ.get(WORKER_INDEX_ENV)
+    return None if index is None else int(index)
+
+
+def worker_id() -> str:
+    """
+    Computed on every call, as modules are imported before forking
+    when the app is preloaded.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def is_primary_worker() -> bool:
+    """The first worker (or the only process) runs the background jobs."""
+    return worker_index() in (None, 0)
+
+
+def uptime() -> float:
+    """:return: seconds since the worker's startup"""
+    return 0.0 if _STARTED is None else time.monotonic() - _STARTED
+
+
+async def stagger_startup() -> None:
+    """
+    Delay the worker's startup by `SETTINGS.WORKER_STARTUP_STAGGER` seconds
+    per worker index, so the workers don't open their DB and redis
+    connections all at the same time.
+    """
+    global _STARTED  # pylint: disable=global-statement
+    _STARTED = time.monotonic()
+    index = worker_index()
+    if index:
+        await asyncio.sleep(index * SETTINGS.WORKER_STARTUP_STAGGER)
@@ -0,0 +1,377 @@
+"""
+Benchmark of the /collect/{project_slug} endpoint.
+
+Runs the app in-process against a local stub upstream (aiohttp server),
+fakeredis and an in-memory SQLite database, so results only depend
+on the machine and the code. Every combination of the passed parameters
+is measured and the results are stored as JSON to compare against later runs.
+
+Example:
+    python -m benchmarks.collect --datasources 1 10 30 --compare old.json
+"""
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess  # nosec
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, Final, List, MutableMapping, Optional, Set, Tuple
+
+import aiohttp.web
+import fakeredis.aioredis
+from tortoise import Tortoise
+
+from apixy import cache
+from apixy.app import app
+from apixy.models import DataSourceModel, ProjectModel
+from apixy.project_cache import PROJECT_PLANS
+
+RESULTS_DIR: Final[str] = os.path.join(os.path.dirname(__file__), "results")
+LAG_SAMPLE_INTERVAL: Final[float] = 0.005  # seconds
+# metrics where a higher value is better, lower is better for the rest
+HIGHER_IS_BETTER: Final[Tuple[str, ...]] = ("throughput",)
+# too few samples per scenario to fail a comparison on, only reported
+INFORMATIVE: Final[Tuple[str, ...]] = ("loop_lag_p99_ms", "loop_lag_max_ms")
+
+
+async def stub_upstream(request: aiohttp.web.Request) -> aiohttp.web.Response:
+    """Returns a JSON object with the requested number of items."""
+    size = int(request.match_info["size"])
+    index = request.match_info["index"]
+    return aiohttp.web.json_response(
+        {f"{index}-{i}": {"id": i, "name": f"item {i}"} for i in range(size)}
+    )
+
+
+async def start_upstream() -> Tuple[aiohttp.web.AppRunner, str]:
+    upstream = aiohttp.web.Application()
+    upstream.add_routes((aiohttp.web.get("/{index}/{size}", stub_upstream),))
+    runner = aiohttp.web.AppRunner(upstream, access_log=None)
+    await runner.setup()
+    site = aiohttp.web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def create_project(
+    upstream_url: str,
+    datasources: int,
+    payload_size: int,
+    hit_ratio: float,
+    merge_strategy: str,
+) -> str:
+    """
+    Create a project with its data sources in the DB.
+    The first `hit_ratio` fraction of data sources have caching enabled.
+
+    :return: slug of the project
+    """
+    slug = f"bench-{datasources}-{payload_size}-{int(hit_ratio * 100)}-{merge_strategy}"
+    project = await ProjectModel.create(
+        slug=slug, name=slug[:64], merge_strategy=merge_strategy
+    )
+    cached = math.ceil(datasources * hit_ratio)
+    for index in range(datasources):
+        datasource = await DataSourceModel.create(
+            name=f"bench {index}",
+            url=f"{upstream_url}/{index}/{payload_size}",
+            type="http",
+            jsonpath="@",
+            timeout=10,
+            cache_expire=3600 if index < cached else None,
+            data={"method": "GET", "body": None, "headers": None},
+        )
+        await project.sources.add(datasource)
+    return slug
+
+
+async def call_app(path: str) -> Tuple[int, int]:
+    """
+    Call the ASGI app directly, skipping the HTTP server.
+
+    :return: response status and body length
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"benchmark")],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    response: Dict[str, Any] = {"status": 0, "length": 0}
+
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: MutableMapping[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["length"] += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return response["status"], response["length"]
+
+
+async def sample_loop_lag(lags: List[float], stop: asyncio.Event) -> None:
+    """Measure how late the event loop wakes up a sleeping task."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + LAG_SAMPLE_INTERVAL
+        await asyncio.sleep(LAG_SAMPLE_INTERVAL)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def drain_background_tasks(
+    known: Set["asyncio.Task[Any]"], timeout: float = 5.0
+) -> None:
+    """
+    Wait for tasks spawned by the app (for e.g. fetch logs) to finish.
+
+    :param known: long-running tasks that existed before the scenario started
+    """
+    tasks = asyncio.all_tasks() - known - {asyncio.current_task()}
+    if tasks:
+        await asyncio.wait(tasks, timeout=timeout)
+
+
+def percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+async def measure_peak_alloc(path: str, requests: int) -> int:
+    """:return: peak of memory allocated (in bytes) while serving the requests"""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for _ in range(requests):
+        await call_app(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - before
+
+
+async def run_scenario(
+    path: str, requests: int, concurrency: int, alloc_requests: int
+) -> Dict[str, float]:
+    latencies: List[float] = []
+    lags: List[float] = []
+    queue: "asyncio.Queue[None]" = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker() -> None:
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            status, _ = await call_app(path)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                raise RuntimeError(f"{path} responded with {status}")
+
+    known_tasks = asyncio.all_tasks()
+    # warm-up, fills the redis cache for cached data sources
+    await call_app(path)
+
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_loop_lag(lags, stop))
+    gc.collect()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await sampler
+    await drain_background_tasks(known_tasks)
+
+    # allocations are measured separately, tracemalloc slows everything down
+    peak_alloc = await measure_peak_alloc(path, alloc_requests)
+    await drain_background_tasks(known_tasks)
+
+    return {
+        "throughput": requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1e3,
+        "p99_ms": percentile(latencies, 99) * 1e3,
+        "mean_ms": statistics.fmean(latencies) * 1e3,
+        "loop_lag_p99_ms": percentile(lags, 99) * 1e3,
+        "loop_lag_max_ms": max(lags, default=0.0) * 1e3,
+        "peak_alloc_kib": peak_alloc / 1024,
+    }
+
+
+async def benchmark(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    await Tortoise.init(
+        db_url="sqlite://:memory:", modules={"models": ["apixy.models"]}
+    )
+    await Tortoise.generate_schemas()
+    cache.REDIS = await fakeredis.aioredis.create_redis_pool()
+    runner, upstream_url = await start_upstream()
+
+    results = []
+    try:
+        for datasources, payload_size, hit_ratio, merge_strategy in itertools.product(
+            args.datasources, args.payload_sizes, args.hit_ratios, args.merge_strategies
+        ):
+            params = {
+                "datasources": datasources,
+                "payload_size": payload_size,
+                "hit_ratio": hit_ratio,
+                "merge_strategy": merge_strategy,
+            }
+            slug = await create_project(upstream_url, **params)
+            await cache.REDIS.flushall()
+            PROJECT_PLANS.clear()
+            metrics = await run_scenario(
+                f"/api/v1/collect/{slug}",
+                args.requests,
+                args.concurrency,
+                args.alloc_requests,
+            )
+            results.append({"params": params, "metrics": metrics})
+            print(format_result(params, metrics), file=sys.stderr)
+    finally:
+        await runner.cleanup()
+        cache.REDIS.close()
+        await cache.REDIS.wait_closed()
+        cache.REDIS = None
+        await Tortoise.close_connections()
+    return results
+
+
+def format_result(params: Dict[str, Any], metrics: Dict[str, float]) -> str:
+    return "{} | {}".format(
+        " ".join(f"{key}={value}" for key, value in params.items()),
+        " ".join(f"{key}={value:.2f}" for key, value in metrics.items()),
+    )
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(  # nosec
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(
+    results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float
+) -> bool:
+    """
+    Print relative changes against a baseline run.
+
+    :return: `True` if no metric regressed by more than `threshold` percent
+    """
+    baseline_by_params = {
+        json.dumps(each["params"], sort_keys=True): each["metrics"] for each in baseline
+    }
+    passed = True
+    for result in results:
+        old = baseline_by_params.get(json.dumps(result["params"], sort_keys=True))
+        if old is None:
+            continue
+        changes = []
+        for metric, value in result["metrics"].items():
+            if not old.get(metric):
+                continue
+            change = (value - old[metric]) / old[metric] * 100
+            regressed = metric not in INFORMATIVE and threshold < (
+                -change if metric in HIGHER_IS_BETTER else change
+            )
+            passed &= not regressed
+            changes.append(f"{metric} {change:+.1f}%{' !' if regressed else ''}")
+        print(
+            " ".join(f"{k}={v}" for k, v in result["params"].items()),
+            "|",
+            " ".join(changes),
+        )
+    return passed
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        allow_abbrev=False,
+    )
+    arg_parser.add_argument("--datasources", type=int, nargs="+", default=[1, 10])
+    arg_parser.add_argument("--payload-sizes", type=int, nargs="+", default=[10, 1000])
+    arg_parser.add_argument(
+        "--hit-ratios", type=float, nargs="+", default=[0.0, 0.5, 1.0]
+    )
+    arg_parser.add_argument(
+        "--merge-strategies",
+        nargs="+",
+        default=["concatenation", "recursive"],
+        choices=["concatenation", "recursive"],
+    )
+    arg_parser.add_argument("--requests", type=int, default=200)
+    arg_parser.add_argument("--concurrency", type=int, default=10)
+    arg_parser.add_argument(
+        "--alloc-requests",
+        type=int,
+        default=5,
+        help="number of requests measured with tracemalloc",
+    )
+    arg_parser.add_argument(
+        "--output",
+        help="where to store results, defaults to benchmarks/results/<timestamp>.json",
+    )
+    arg_parser.add_argument("--compare", help="results of a previous run")
+    arg_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="regression threshold for --compare, in percent",
+    )
+    args = arg_parser.parse_args()
+
+    results = asyncio.run(benchmark(args))
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, time.strftime("collect-%Y%m%d-%H%M%S.json")
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f_out:
+        json.dump(
+            {
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "results": results,
+            },
+            f_out,
+            indent=2,
+        )
+    print("Results stored in", output, file=sys.stderr)
+
+    if args.compare is not None:
+        with open(args.compare) as f_in:
+            baseline = json.load(f_in)["results"]
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark of the app's cold start.
+
+Imports the app in fresh interpreters, the way a new worker or container
+starts, and reports the wall time of the import and the modules
+taking the most time to import (from `python -X importtime`).
+
+Example:
+    python -m benchmarks.startup --repeat 10 --top 15
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess  # nosec
+import sys
+import time
+from typing import Dict, Final, List, Tuple
+
+# drivers imported by datasource backends on their first use only
+LAZY_MODULES: Final[Tuple[str, ...]] = (
+    "aiohttp",
+    "aiomysql",
+    "aiosqlite",
+    "asyncpg",
+    "databases",
+    "motor",
+    "pyarrow",
+    "pymongo",
+    "sqlalchemy",
+    "sqlparse",
+)
+IMPORT_TIME_LINE: Final["re.Pattern[str]"] = re.compile(
+    r"^import time:\s+(\d+) \|\s+\d+ \| *(\S+)$"
+)
+ROOT: Final[str] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(code: str, *options: str) -> "subprocess.CompletedProcess[str]":
+    return subprocess.run(  # nosec
+        [sys.executable, *options, "-c", code],
+        capture_output=True,
+        check=True,
+        cwd=ROOT,
+        text=True,
+    )
+
+
+def measure_import(module: str = "apixy.app") -> float:
+    """:return: seconds it takes to import `module` in a fresh interpreter"""
+    start = time.perf_counter()
+    run_python(f"import {module}")
+    return time.perf_counter() - start
+
+
+def imported_modules(module: str = "apixy.app") -> List[str]:
+    """:return: top-level names of all modules imported along with `module`"""
+    process = run_python(
+        f"import sys, {module}\n"
+        "print('\\n'.join(sorted({name.split('.')[0] for name in sys.modules})))"
+    )
+    return process.stdout.split()
+
+
+def slowest_imports(module: str = "apixy.app", top: int = 10) -> Dict[str, float]:
+    """
+    :return: top-level packages by the time spent importing their modules, in ms
+    """
+    process = run_python(f"import {module}", "-X", "importtime")
+    packages: Dict[str, float] = {}
+    for line in process.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match is not None:
+            package = match.group(2).split(".")[0]
+            packages[package] = packages.get(package, 0.0) + int(match.group(1)) / 1e3
+    return dict(sorted(packages.items(), key=lambda item: -item[1])[:top])
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        allow_abbrev=False,
+    )
+    arg_parser.add_argument("--module", default="apixy.app")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--top", type=int, default=10)
+    args = arg_parser.parse_args()
+
+    # the first run also fills the bytecode cache, it isn't measured
+    measure_import(args.module)
+    times = [measure_import(args.module) for _ in range(args.repeat)]
+    print(
+        f"import {args.module}: min={min(times) * 1e3:.1f}ms"
+        f" median={statistics.median(times) * 1e3:.1f}ms"
+    )
+    for name, milliseconds in slowest_imports(args.module, args.top).items():
+        print(f"{milliseconds:10.1f}ms  {name}")
+
+    eager = sorted(set(LAZY_MODULES) & set(imported_modules(args.module)))
+    if eager:
+        print("Imported at startup:", ", ".join(eager), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Gunicorn configuration for running apixy with multiple worker processes.
+Loaded automatically when gunicorn is started from this directory:
+
+    gunicorn apixy.app:app
+
+The app is imported once in the master process and the workers are forked
+with it, so they don't import FastAPI, the DB drivers etc. again.
+Every worker gets a stable index (see `apixy.workers`), used to stagger
+their startups and to run the background jobs in a single worker.
+"""
+import multiprocessing
+import os
+from typing import Any
+
+from apixy.workers import WORKER_INDEX_ENV
+
+# names of the settings and hooks are given by gunicorn
+# pylint: disable=invalid-name
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")  # nosec
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# slow upstreams are limited by the data source timeouts
+timeout = int(os.environ.get("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+# restart workers from time to time, in case something leaks memory
+max_requests = int(os.environ.get("MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+accesslog = "-"
+
+
+def pre_fork(server: Any, worker: Any) -> None:
+    """Assign the lowest free index, a restarted worker takes over its slot."""
+    used = {getattr(other, "apixy_index", None) for other in server.WORKERS.values()}
+    worker.apixy_index = next(
+        index for index in range(workers + 1) if index not in used
+    )
+
+
+def post_fork(_server: Any, worker: Any) -> None:
+    os.environ[WORKER_INDEX_ENV] = str(worker.apixy_index)
@@ -0,0 +1,61 @@
+from typing import Final, Optional
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from apixy import app
+
+client = TestClient(app.app)
+
+ADMIN_URI: Final[str] = "/api/v1/admin/loop"
+
+
+@pytest.mark.parametrize(
+    "configured, token, status_code",
+    (("", None, 404), ("", "", 404), ("secret", None, 403), ("secret", "bad", 403)),
+)
+def test_admin_token(configured: str, token: Optional[str], status_code: int) -> None:
+    headers = {} if token is None else {"X-Admin-Token": token}
+    with mock.patch("apixy.config.SETTINGS.ADMIN_TOKEN", configured):
+        assert client.get(ADMIN_URI, headers=headers).status_code == status_code
+
+
+@mock.patch("apixy.config.SETTINGS.ADMIN_TOKEN", "secret")
+def test_loop_report() -> None:
+    response = client.get(ADMIN_URI, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert isinstance(response.json()["slow"], list)
+    assert set(response.json()["stats"]) == {
+        "lag_p50",
+        "lag_p99",
+        "lag_max",
+        "slow_callbacks",
+        "profiling",
+    }
+
+
+@mock.patch("apixy.config.SETTINGS.ADMIN_TOKEN", "secret")
+def test_profiler() -> None:
+    headers = {"X-Admin-Token": "secret"}
+    profiler_uri = ADMIN_URI + "/profiler"
+    # startup doesn't run without the client's context manager, nothing to profile
+    assert client.post(profiler_uri, headers=headers).status_code == 409
+
+    with mock.patch(
+        "apixy.loop_monitor.LoopMonitor.running",
+        new_callable=mock.PropertyMock,
+        return_value=True,
+    ):
+        assert client.post(profiler_uri + "?duration=0").status_code == 403
+        response = client.post(profiler_uri + "?duration=0", headers=headers)
+        assert response.status_code == 422
+        response = client.post(profiler_uri + "?duration=60", headers=headers)
+        assert response.status_code == 201
+        assert client.get(ADMIN_URI, headers=headers).json()["stats"]["profiling"]
+
+    response = client.get(profiler_uri, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert client.delete(profiler_uri, headers=headers).status_code == 204
+    assert not client.get(ADMIN_URI, headers=headers).json()["stats"]["profiling"]
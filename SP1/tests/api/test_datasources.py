@@ -75,3 +75,33 @@ def test_datasources_get_list(
     assert method == {"GET", None}
     assert len(json) == 2
     assert response.status_code == 200
+
+
+@mock.patch("apixy.api.v1.datasources.DataSourcesDB.get_paginated_datasources")
+def test_datasources_get_list_filters(
+    mocked: mock.AsyncMock, ds_kwargs: Dict[str, Any]
+) -> None:
+    mocked.return_value = [DataSourceModel(**ds_kwargs, data={"method": "GET"})]
+    response = client.get(f"{DS_ROUTER_BASE_URI}?limit=1&type=http&name_prefix=api")
+    assert response.status_code == 200
+    assert "X-Next-Cursor" in response.headers
+    mocked.assert_called_once_with(1, 0, None, "http", "api")
+
+
+@mock.patch("apixy.api.v1.datasources.DataSourcesDB.bulk_save_datasources")
+def test_datasources_create_bulk(
+    mocked: mock.AsyncMock, ds_kwargs: Dict[str, Any]
+) -> None:
+    mocked.return_value = [3]
+    ds_kwargs.pop("id")
+    invalid = dict(ds_kwargs, method="FOO")
+    response = client.post(
+        f"{DS_ROUTER_BASE_URI}bulk", json=[invalid, dict(ds_kwargs, method="GET")]
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (1, 1)
+    assert [item["status"] for item in body["items"]] == [422, 201]
+    assert body["items"][1]["location"] == "/datasources/3"
+    (saved,), _ = mocked.call_args
+    assert len(saved) == 1
@@ -0,0 +1,125 @@
+from typing import Any, Dict, Final
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from apixy import app
+from apixy.api.v1.responses import choose_encoding, etag_matches
+from apixy.entities.proxy_response import ProxyResponse
+
+client = TestClient(app.app)
+
+FETCH_URI: Final[str] = "/api/v1/collect/slug"
+
+
+def mock_project(data: object) -> mock.Mock:
+    project = mock.Mock(id=1, datasources=[])
+    project.fetch_data = mock.AsyncMock(
+        return_value=ProxyResponse(
+            result=ProxyResponse.Container(size=1, data=data), errors=None
+        )
+    )
+    return project
+
+
+@mock.patch("apixy.api.v1.fetch.get_project_with_datasources")
+def test_fetch_small_body_uncompressed(mocked: mock.AsyncMock) -> None:
+    mocked.return_value = mock_project({"a": 1})
+    response = client.get(FETCH_URI, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == {"result": {"size": 1, "data": {"a": 1}}, "errors": None}
+    mocked.assert_called_once_with(slug="slug")
+
+
+@mock.patch("apixy.api.v1.fetch.get_project_with_datasources")
+def test_fetch_gzip(mocked: mock.AsyncMock) -> None:
+    data = [{"id": i, "name": f"item {i}"} for i in range(200)]
+    mocked.return_value = mock_project(data)
+    response = client.get(FETCH_URI, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"].endswith('-gzip"')
+    # requests decodes the body transparently
+    assert response.json()["result"]["data"] == data
+
+
+@mock.patch("apixy.api.v1.fetch.get_project_with_datasources")
+def test_fetch_not_modified(mocked: mock.AsyncMock) -> None:
+    mocked.return_value = mock_project([1, 2, 3])
+    etag = client.get(FETCH_URI).headers["etag"]
+    response = client.get(FETCH_URI, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    mocked.return_value = mock_project([1, 2, 3, 4])
+    response = client.get(FETCH_URI, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+
+@mock.patch("apixy.api.v1.fetch.get_project_with_datasources")
+def test_fetch_every_request_logged(mocked: mock.AsyncMock) -> None:
+    mocked.return_value = project = mock_project([1, 2, 3])
+    for _ in range(2):
+        assert client.get(FETCH_URI, params={"limit": 1}).status_code == 200
+    # merged data isn't reused, the project fetch logs each request
+    assert project.fetch_data.await_count == 2
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("gzip;q=0", None),
+        ("deflate, gzip;q=0.5", "gzip"),
+        ("*", choose_encoding("zstd, br, gzip")),
+        ("*, gzip;q=0", choose_encoding("zstd, br")),
+    ],
+)
+def test_choose_encoding(header: str, expected: str) -> None:
+    assert choose_encoding(header) == expected
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, False),
+        ('"abc"', True),
+        ('W/"abc-gzip"', True),
+        ('"other", "abc-br"', True),
+        ("*", True),
+        ('"abcd"', False),
+    ],
+)
+def test_etag_matches(header: str, expected: bool) -> None:
+    assert etag_matches(header, "abc") is expected
+
+
+@mock.patch("apixy.api.v1.fetch.get_project_with_datasources")
+def test_fetch_slice(mocked: mock.AsyncMock) -> None:
+    mocked.return_value = mock_project([{"id": i, "name": str(i)} for i in range(5)])
+    response = client.get(
+        FETCH_URI, params={"offset": 1, "limit": 2, "fields": "id, other"}
+    )
+    assert response.status_code == 200
+    assert response.headers["x-total-count"] == "5"
+    assert response.json()["result"] == {"size": 2, "data": [{"id": 1}, {"id": 2}]}
+
+    response = client.get(FETCH_URI, params={"filter": "[?id > `2`].name"})
+    assert response.json()["result"] == {"size": 2, "data": ["3", "4"]}
+    assert response.headers["x-total-count"] == "2"
+
+
+@pytest.mark.parametrize(
+    "params", ({"filter": "[?"}, {"limit": 0}, {"offset": -1}, {"filter": "abs(@)"})
+)
+@mock.patch("apixy.api.v1.fetch.get_project_with_datasources")
+def test_fetch_slice_invalid(mocked: mock.AsyncMock, params: Dict[str, Any]) -> None:
+    mocked.return_value = mock_project([1, 2, 3])
+    assert client.get(FETCH_URI, params=params).status_code == 422
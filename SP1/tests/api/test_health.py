@@ -0,0 +1,50 @@
+from typing import Final
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from apixy import app
+
+client = TestClient(app.app)
+
+HEALTH_URI: Final[str] = "/api/v1/health"
+
+
+@pytest.mark.parametrize(
+    "database, redis, listener, status_code",
+    (
+        (True, True, True, 200),
+        (False, True, True, 503),
+        (True, False, True, 503),
+        (True, True, False, 503),
+    ),
+)
+def test_health(database: bool, redis: bool, listener: bool, status_code: int) -> None:
+    with mock.patch(
+        "apixy.api.v1.health.check_database", mock.AsyncMock(return_value=database)
+    ), mock.patch(
+        "apixy.api.v1.health.check_redis", mock.AsyncMock(return_value=redis)
+    ), mock.patch(
+        "apixy.invalidation.InvalidationListener.running",
+        new_callable=mock.PropertyMock,
+        return_value=listener,
+    ), mock.patch.dict(
+        "os.environ", {"APIXY_WORKER_INDEX": "2"}
+    ):
+        response = client.get(HEALTH_URI)
+
+    assert response.status_code == status_code
+    body = response.json()
+    assert body["index"] == 2
+    assert body["database"] is database
+    assert body["redis"] is redis
+    assert body["invalidation_listener"] is listener
+
+
+def test_health_without_services() -> None:
+    # no DB connection and no redis in unit tests
+    response = client.get(HEALTH_URI)
+    assert response.status_code == 503
+    assert response.json()["database"] is False
+    assert response.json()["redis"] is False
@@ -43,7 +43,7 @@ def test_project_get_list(mocked: mock.AsyncMock) -> None:
     response = client.get(f"{PROJECT_ROUTER_BASE_URI}")
     assert response.json() == [result_kwargs]
     assert response.status_code == 200
-    mocked.assert_called_once_with(SETTINGS.DEFAULT_PAGINATION_LIMIT, 0)
+    mocked.assert_called_once_with(SETTINGS.DEFAULT_PAGINATION_LIMIT, 0, None, None)
 
 
 @mock.patch("apixy.api.v1.projects.ProjectsDB.get_paginated_projects")
@@ -55,7 +55,33 @@ def test_project_get_list_pagination(mocked: mock.AsyncMock) -> None:
     response = client.get(f"{PROJECT_ROUTER_BASE_URI}?offset=10&limit=20")
     assert response.json() == [result_kwargs]
     assert response.status_code == 200
-    mocked.assert_called_once_with(20, 10)
+    mocked.assert_called_once_with(20, 10, None, None)
+
+
+@mock.patch("apixy.api.v1.projects.ProjectsDB.get_paginated_projects")
+def test_project_get_list_cursor(mocked: mock.AsyncMock) -> None:
+    result_kwargs = dict(
+        id=5, slug="slug", name="name", description=None, merge_strategy="concatenation"
+    )
+    mocked.return_value = [ProjectModel(**result_kwargs)]
+    response = client.get(f"{PROJECT_ROUTER_BASE_URI}?limit=1&name_prefix=na")
+    assert response.status_code == 200
+    cursor = response.headers["X-Next-Cursor"]
+    mocked.assert_called_once_with(1, 0, None, "na")
+
+    mocked.reset_mock()
+    mocked.return_value = []
+    response = client.get(f"{PROJECT_ROUTER_BASE_URI}?limit=1&cursor={cursor}")
+    assert response.json() == []
+    assert "X-Next-Cursor" not in response.headers
+    mocked.assert_called_once_with(1, 0, 5, None)
+
+
+@mock.patch("apixy.api.v1.projects.ProjectsDB.get_paginated_projects")
+def test_project_get_list_invalid_cursor(mocked: mock.AsyncMock) -> None:
+    response = client.get(f"{PROJECT_ROUTER_BASE_URI}?cursor=foo")
+    assert response.status_code == 422
+    mocked.assert_not_called()
 
 
 @mock.patch("apixy.api.v1.projects.ProjectsDB.get_paginated_projects")
@@ -167,3 +193,106 @@ def test_project_delete_404(project_qs: mock.MagicMock) -> None:
     project_qs.assert_called_once_with(1)
     project_qs.return_value.exists.assert_called_once_with()
     project_qs.return_value.delete.assert_not_called()
+
+
+@mock.patch("apixy.api.v1.projects.ProjectsDB.bulk_save_projects")
+@mock.patch("apixy.api.v1.projects.ProjectsDB.existing_slugs")
+def test_project_create_bulk(
+    existing_slugs: mock.AsyncMock, bulk_save_projects: mock.AsyncMock
+) -> None:
+    existing_slugs.return_value = {"taken"}
+    bulk_save_projects.return_value = [7]
+    projects = [
+        dict(slug="new", name="name", merge_strategy="concatenation"),
+        dict(slug="taken", name="name", merge_strategy="concatenation"),
+        dict(slug="bad slug", name="name", merge_strategy="concatenation"),
+    ]
+    response = client.post(f"{PROJECT_ROUTER_BASE_URI}bulk", json=projects)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (1, 2)
+    assert [item["status"] for item in body["items"]] == [201, 409, 422]
+    assert body["items"][0]["location"] == "/projects/7"
+    (saved,), _ = bulk_save_projects.call_args
+    assert [p.slug for p in saved] == ["new"]
+
+
+@mock.patch("apixy.api.v1.projects.ProjectsDB.bulk_save_projects")
+@mock.patch("apixy.api.v1.projects.ProjectsDB.existing_slugs")
+def test_project_create_bulk_duplicate_slugs(
+    existing_slugs: mock.AsyncMock, bulk_save_projects: mock.AsyncMock
+) -> None:
+    existing_slugs.return_value = set()
+    bulk_save_projects.return_value = []
+    project = dict(slug="same", name="name", merge_strategy="concatenation")
+    response = client.post(f"{PROJECT_ROUTER_BASE_URI}bulk", json=[project, project])
+    assert [item["status"] for item in response.json()["items"]] == [409, 409]
+    bulk_save_projects.assert_called_once_with([])
+
+
+@mock.patch("apixy.api.v1.projects.ProjectsDB.bulk_save_projects")
+def test_project_create_bulk_too_large(bulk_save_projects: mock.AsyncMock) -> None:
+    project = dict(slug="slug", name="name", merge_strategy="concatenation")
+    with mock.patch("apixy.config.SETTINGS.BULK_MAX_SIZE", 1):
+        response = client.post(
+            f"{PROJECT_ROUTER_BASE_URI}bulk", json=[project, project]
+        )
+    assert response.status_code == 422
+    bulk_save_projects.assert_not_called()
+
+
+@mock.patch("apixy.api.v1.projects.invalidate_project")
+@mock.patch("apixy.api.v1.projects.in_transaction")
+@mock.patch("apixy.api.v1.projects.ProjectsDB.linked_datasource_ids")
+@mock.patch("apixy.models.DataSource.filter", new_callable=mock.AsyncMock)
+@mock.patch("apixy.models.Project.get", new_callable=mock.AsyncMock)
+def test_project_add_datasources_bulk(
+    project_get: mock.AsyncMock,
+    datasource_filter: mock.AsyncMock,
+    linked_datasource_ids: mock.AsyncMock,
+    transaction: mock.MagicMock,
+    invalidate_project: mock.AsyncMock,
+) -> None:
+    project = project_get.return_value
+    project.id = 1
+    project.sources.add = mock.AsyncMock()
+    datasources = [mock.MagicMock(id=datasource_id) for datasource_id in (2, 3, 4)]
+    datasource_filter.return_value = datasources
+    linked_datasource_ids.return_value = {3}
+
+    response = client.post(
+        f"{PROJECT_ROUTER_BASE_URI}1/datasources/bulk", json=[2, 3, 5, 4, 2]
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 3)
+    assert [item["status"] for item in body["items"]] == [204, 409, 404, 204, 409]
+    project.sources.add.assert_awaited_once_with(
+        datasources[0],
+        datasources[2],
+        using_db=transaction.return_value.__aenter__.return_value,
+    )
+    invalidate_project.assert_awaited_once_with(1)
+
+
+@mock.patch("apixy.api.v1.projects.invalidate_project")
+@mock.patch("apixy.api.v1.projects.in_transaction")
+@mock.patch("apixy.api.v1.projects.ProjectsDB.linked_datasource_ids")
+@mock.patch("apixy.models.DataSource.filter", new_callable=mock.AsyncMock)
+@mock.patch("apixy.models.Project.get", new_callable=mock.AsyncMock)
+def test_project_add_datasources_bulk_none_added(
+    project_get: mock.AsyncMock,
+    datasource_filter: mock.AsyncMock,
+    linked_datasource_ids: mock.AsyncMock,
+    transaction: mock.MagicMock,
+    invalidate_project: mock.AsyncMock,
+) -> None:
+    project_get.return_value.sources.add = mock.AsyncMock()
+    datasource_filter.return_value = []
+    linked_datasource_ids.return_value = set()
+
+    response = client.post(f"{PROJECT_ROUTER_BASE_URI}1/datasources/bulk", json=[9])
+    assert [item["status"] for item in response.json()["items"]] == [404]
+    project_get.return_value.sources.add.assert_not_called()
+    transaction.assert_not_called()
+    invalidate_project.assert_not_called()
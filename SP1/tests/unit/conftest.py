@@ -0,0 +1,15 @@
+from unittest import mock
+
+import fakeredis.aioredis
+import pytest
+
+
+@pytest.fixture
+async def redis() -> fakeredis.aioredis.FakeConnectionsPool:
+    try:
+        pool = await fakeredis.aioredis.create_redis_pool()
+        with mock.patch("apixy.cache.REDIS", pool):
+            yield pool
+    finally:
+        pool.close()
+        await pool.wait_closed()
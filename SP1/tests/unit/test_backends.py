@@ -0,0 +1,38 @@
+import sys
+from unittest import mock
+
+import pytest
+
+from apixy.backends import BACKENDS, load_backend, preload_backends
+from apixy.entities.datasource import DATA_SOURCES
+from benchmarks.startup import LAZY_MODULES, imported_modules, measure_import
+
+
+def test_every_datasource_type_has_backend() -> None:
+    assert set(BACKENDS) == set(DATA_SOURCES)
+
+
+def test_startup_imports_no_drivers() -> None:
+    assert not set(LAZY_MODULES) & set(imported_modules("apixy.app"))
+
+
+def test_startup_time_measured() -> None:
+    assert measure_import("apixy.config") > 0
+
+
+def test_load_backend_imports_once() -> None:
+    load_backend.cache_clear()
+    with mock.patch("importlib.import_module") as import_mock:
+        assert load_backend("sql") is load_backend("sql")
+        preload_backends(["sql", "mongo"])
+    assert [call.args for call in import_mock.call_args_list] == [
+        ("apixy.backends.sql",),
+        ("apixy.backends.mongo",),
+    ]
+    load_backend.cache_clear()
+
+
+def test_load_unknown_backend() -> None:
+    with pytest.raises(KeyError):
+        load_backend("ftp")
+    assert "apixy.backends.ftp" not in sys.modules
@@ -1,12 +1,19 @@
+import asyncio
 import json
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
+import aiohttp
+import aioredis
 import aioresponses
 import fakeredis.aioredis
 import pytest
 
 from apixy import app, cache
+from apixy.config import SETTINGS
 from apixy.entities.datasource import HTTPDataSource
+from apixy.entities.project import ProjectWithDataSources
+from apixy.entities.shared import DataSourceFetchError
+from tests.unit.test_project import MockLogger
 
 
 @pytest.fixture
@@ -22,16 +29,6 @@ def http_datasource() -> HTTPDataSource:
     )
 
 
-@pytest.fixture
-async def redis() -> fakeredis.aioredis.FakeConnectionsPool:
-    try:
-        pool = await fakeredis.aioredis.create_redis_pool()
-        yield pool
-    finally:
-        pool.close()
-        await pool.wait_closed()
-
-
 @pytest.mark.parametrize(
     "redis_uri",
     (
@@ -91,3 +88,194 @@ async def test_cache_enabled_mock(
 
         key = cache.REDIS_DATASOURCE_CACHE_KEY.format(self=http_datasource)
         assert json.loads(await redis.get(key)) == data
+
+
+@pytest.mark.asyncio
+async def test_negative_cache_fetch_error(
+    http_datasource: HTTPDataSource, redis: fakeredis.aioredis.FakeConnectionsPool
+) -> None:
+    with patch("apixy.cache.REDIS", redis):
+        with aioresponses.aioresponses() as http_mock:
+            http_mock.add(
+                url=http_datasource.url,
+                method=http_datasource.method,
+                exception=aiohttp.ClientError("unreachable"),
+                repeat=True,
+            )
+            for _ in range(3):
+                with pytest.raises(DataSourceFetchError):
+                    await http_datasource.fetch_data()
+            assert sum(len(calls) for calls in http_mock.requests.values()) == 1
+
+        key = cache.REDIS_DATASOURCE_ERROR_KEY.format(self=http_datasource)
+        assert json.loads(await redis.get(key)) == {"timeout": False, "detail": ""}
+        assert 0 < await redis.ttl(key) <= SETTINGS.NEGATIVE_CACHE_ERROR_TTL
+
+
+@pytest.mark.asyncio
+async def test_negative_cache_timeout(
+    http_datasource: HTTPDataSource, redis: fakeredis.aioredis.FakeConnectionsPool
+) -> None:
+    with patch("apixy.cache.REDIS", redis):
+        with aioresponses.aioresponses() as http_mock:
+            http_mock.add(
+                url=http_datasource.url,
+                method=http_datasource.method,
+                exception=asyncio.TimeoutError(),
+            )
+            with pytest.raises(asyncio.TimeoutError):
+                await http_datasource.fetch_data()
+            # cached, the upstream is not called again
+            with pytest.raises(asyncio.TimeoutError):
+                await http_datasource.fetch_data()
+
+            # refresh skips the cached failure and clears it on success
+            http_mock.add(
+                url=http_datasource.url,
+                method=http_datasource.method,
+                status=200,
+                payload=["foo"],
+            )
+            assert await http_datasource.fetch_data(refresh=True) == ["foo"]
+            key = cache.REDIS_DATASOURCE_ERROR_KEY.format(self=http_datasource)
+            assert await redis.get(key) is None
+
+
+@pytest.mark.asyncio
+async def test_negative_cache_disabled(
+    http_datasource: HTTPDataSource, redis: fakeredis.aioredis.FakeConnectionsPool
+) -> None:
+    with patch("apixy.cache.REDIS", redis), patch(
+        "apixy.config.SETTINGS.NEGATIVE_CACHE_ERROR_TTL", 0
+    ), patch("apixy.config.SETTINGS.NEGATIVE_CACHE_TIMEOUT_TTL", 0):
+        with aioresponses.aioresponses() as http_mock:
+            http_mock.add(
+                url=http_datasource.url,
+                method=http_datasource.method,
+                exception=aiohttp.ClientError(),
+            )
+            with pytest.raises(DataSourceFetchError):
+                await http_datasource.fetch_data()
+
+        assert await redis.keys("*") == []
+
+
+@pytest.mark.asyncio
+async def test_negative_cache_without_id(
+    http_datasource: HTTPDataSource, redis: fakeredis.aioredis.FakeConnectionsPool
+) -> None:
+    unsaved = http_datasource.copy(update={"id": None})
+    with patch("apixy.cache.REDIS", redis):
+        with aioresponses.aioresponses() as http_mock:
+            http_mock.add(
+                url=unsaved.url,
+                method=unsaved.method,
+                exception=aiohttp.ClientError(),
+                repeat=True,
+            )
+            for _ in range(2):
+                with pytest.raises(DataSourceFetchError):
+                    await unsaved.fetch_data()
+            # failures of datasources without an id are not shared
+            assert sum(len(calls) for calls in http_mock.requests.values()) == 2
+
+        assert await redis.keys("*") == []
+
+
+@pytest.mark.asyncio
+async def test_project_cache_lookups_batched(
+    redis: fakeredis.aioredis.FakeConnectionsPool,
+) -> None:
+    datasources = [
+        HTTPDataSource(
+            id=index,
+            name=f"http{index}",
+            url=f"http://foo.bar/{index}",
+            method="GET",
+            jsonpath="@",
+            cache_expire=10,
+        )
+        for index in range(1, 4)
+    ]
+    project = ProjectWithDataSources(
+        id=1,
+        slug="batched",
+        name="Batched",
+        merge_strategy="concatenation",
+        datasources=datasources,
+    )
+    await redis.set(
+        cache.REDIS_DATASOURCE_CACHE_KEY.format(self=datasources[0]), '["cached"]'
+    )
+
+    with patch("apixy.cache.REDIS", redis), patch.object(
+        redis, "mget", wraps=redis.mget
+    ) as mget, patch.object(redis, "pipeline", wraps=redis.pipeline) as pipeline:
+        with aioresponses.aioresponses() as http_mock:
+            http_mock.get("http://foo.bar/2", payload=["fetched"])
+            http_mock.get("http://foo.bar/3", exception=aiohttp.ClientError())
+            response = await project.fetch_data(MockLogger())
+
+        assert response.result.data == {"0": ["cached"], "1": ["fetched"]}
+        assert response.errors is not None and response.errors.size == 1
+        mget.assert_called_once()
+        assert len(mget.call_args.args) == 6  # data and error key of each
+        pipeline.assert_called_once()
+
+    assert json.loads(
+        await redis.get(cache.REDIS_DATASOURCE_CACHE_KEY.format(self=datasources[1]))
+    ) == ["fetched"]
+    assert await redis.get(cache.REDIS_DATASOURCE_ERROR_KEY.format(self=datasources[2]))
+    assert (
+        0
+        < await redis.ttl(cache.REDIS_DATASOURCE_CACHE_KEY.format(self=datasources[1]))
+        <= 10
+    )
+
+
+@pytest.mark.asyncio
+async def test_project_fetched_on_redis_failure(
+    http_datasource: HTTPDataSource, redis: fakeredis.aioredis.FakeConnectionsPool
+) -> None:
+    http_datasource.cache_expire = 10
+    project = ProjectWithDataSources(
+        id=1,
+        slug="failing-redis",
+        name="Failing redis",
+        merge_strategy="concatenation",
+        datasources=[http_datasource],
+    )
+    failure = aioredis.RedisError("connection lost")
+    with patch("apixy.cache.REDIS", redis), patch.object(
+        redis, "mget", side_effect=failure
+    ), patch.object(redis, "pipeline") as pipeline:
+        pipeline.return_value.execute = AsyncMock(side_effect=failure)
+        with aioresponses.aioresponses() as http_mock:
+            http_mock.get(http_datasource.url, payload=["fetched"])
+            response = await project.fetch_data(MockLogger())
+
+    assert response.result.data == {"0": ["fetched"]}
+    assert response.errors is None
+    pipeline.return_value.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_refresh_on_redis_failure(
+    http_datasource: HTTPDataSource, redis: fakeredis.aioredis.FakeConnectionsPool
+) -> None:
+    http_datasource.cache_expire = 10
+    failure = aioredis.RedisError("connection lost")
+    with patch("apixy.cache.REDIS", redis), patch.object(
+        redis, "delete", side_effect=failure
+    ) as delete, patch.object(redis, "pipeline") as pipeline:
+        pipeline.return_value.execute = AsyncMock(side_effect=failure)
+        with aioresponses.aioresponses() as http_mock:
+            http_mock.get(http_datasource.url, payload=["fetched"])
+            assert await cache.refresh_cached(http_datasource) == ["fetched"]
+
+    # the cached failure is deleted by the same pipeline the data is stored by
+    delete.assert_not_called()
+    pipeline.return_value.delete.assert_called_once_with(
+        cache.REDIS_DATASOURCE_ERROR_KEY.format(self=http_datasource)
+    )
+    pipeline.return_value.execute.assert_awaited_once()
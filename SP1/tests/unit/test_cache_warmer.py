@@ -0,0 +1,152 @@
+import asyncio
+import json
+import math
+import time
+from typing import Optional
+from unittest import mock
+
+import fakeredis.aioredis
+import pytest
+
+from apixy import cache
+from apixy.cache_warmer import (
+    LEAD_FACTOR,
+    MIN_INTERVAL,
+    RETRY_INTERVAL,
+    CacheWarmer,
+    WarmupEntry,
+)
+from apixy.entities.datasource import HTTPDataSource
+from apixy.entities.shared import DataSourceFetchError
+
+
+def make_datasource(datasource_id: int, cache_expire: int) -> HTTPDataSource:
+    return HTTPDataSource(
+        id=datasource_id,
+        name="http",
+        url="http://foo.bar",
+        method="GET",
+        jsonpath="@",
+        timeout=1,
+        cache_expire=cache_expire,
+    )
+
+
+def test_next_due() -> None:
+    warmer = CacheWarmer(concurrency=1, reload_interval=60, jitter=0.1)
+    entry = WarmupEntry(make_datasource(1, 100), due=0, duration=2)
+    for _ in range(100):
+        due = warmer.next_due(entry, now=1000)
+        assert 1000 + 100 - 2 * LEAD_FACTOR - 10 <= due <= 1000 + 100 - 2 * LEAD_FACTOR
+
+    # never expires
+    assert warmer.next_due(WarmupEntry(make_datasource(1, 0), 0), 1000) == math.inf
+    # shorter than the fetch itself
+    entry = WarmupEntry(make_datasource(1, 1), due=0, duration=5)
+    assert warmer.next_due(entry, now=1000) == 1000 + MIN_INTERVAL
+
+
+@pytest.mark.asyncio
+async def test_refresh_stores_data(
+    redis: fakeredis.aioredis.FakeConnectionsPool,
+) -> None:
+    warmer = CacheWarmer(concurrency=1, reload_interval=60, jitter=0)
+    datasource = make_datasource(1, 100)
+    entry = WarmupEntry(datasource, due=0, duration=1.0)
+    entry.in_flight = True
+    key = cache.REDIS_DATASOURCE_CACHE_KEY.format(self=datasource)
+    await redis.set(key, json.dumps(["old"]))
+
+    with mock.patch.object(
+        HTTPDataSource,
+        "fetch_data",
+        cache.redis_cache(mock.AsyncMock(return_value=["new"])),
+    ):
+        await warmer.refresh(entry)
+
+    assert json.loads(await redis.get(key)) == ["new"]
+    assert 0 < await redis.ttl(key) <= 100
+    assert not entry.in_flight
+    assert entry.duration is not None and entry.duration < 1.0
+    assert time.monotonic() + 90 < entry.due
+
+
+@pytest.mark.asyncio
+async def test_refresh_failure_retries(
+    redis: fakeredis.aioredis.FakeConnectionsPool,
+) -> None:
+    warmer = CacheWarmer(concurrency=1, reload_interval=60, jitter=0)
+    entry = WarmupEntry(make_datasource(1, 100), due=0)
+    entry.in_flight = True
+
+    with mock.patch.object(
+        HTTPDataSource,
+        "fetch_data",
+        cache.redis_cache(mock.AsyncMock(side_effect=DataSourceFetchError)),
+    ):
+        await warmer.refresh(entry)
+
+    assert not entry.in_flight
+    assert entry.duration is None
+    assert entry.due == pytest.approx(time.monotonic() + RETRY_INTERVAL, abs=1)
+
+
+@pytest.mark.asyncio
+async def test_add_uses_remaining_ttl(
+    redis: fakeredis.aioredis.FakeConnectionsPool,
+) -> None:
+    warmer = CacheWarmer(concurrency=1, reload_interval=60, jitter=0)
+    datasources = {i: make_datasource(i, 100) for i in range(1, 4)}
+    await redis.set(
+        cache.REDIS_DATASOURCE_CACHE_KEY.format(self=datasources[2]), "1", expire=50
+    )
+    await redis.set(cache.REDIS_DATASOURCE_CACHE_KEY.format(self=datasources[3]), "1")
+
+    with mock.patch.object(
+        CacheWarmer, "average_durations", mock.AsyncMock(return_value={2: 5.0})
+    ):
+        await warmer._add([1, 2, 3], datasources)
+
+    now = time.monotonic()
+    entries = warmer._entries
+    assert entries[1].due <= now  # not cached, refreshed right away
+    assert entries[2].duration == 5.0
+    assert entries[2].due == pytest.approx(now + 50 - 5.0 * LEAD_FACTOR, abs=1)
+    assert entries[3].due == math.inf  # cached without expiration
+
+
+@pytest.mark.asyncio
+async def test_warmer_refreshes_concurrently(
+    redis: fakeredis.aioredis.FakeConnectionsPool,
+) -> None:
+    warmer = CacheWarmer(concurrency=2, reload_interval=60, jitter=0)
+    running = 0
+    max_running = 0
+
+    async def fetch_data(self: HTTPDataSource) -> Optional[int]:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return self.id
+
+    async def reload() -> None:
+        await warmer._add(
+            list(range(1, 6)), {i: make_datasource(i, 100) for i in range(1, 6)}
+        )
+
+    with mock.patch.object(
+        HTTPDataSource, "fetch_data", cache.redis_cache(fetch_data)
+    ), mock.patch.object(warmer, "reload", reload), mock.patch.object(
+        CacheWarmer, "average_durations", mock.AsyncMock(return_value={})
+    ):
+        warmer.start()
+        await asyncio.sleep(0.1)
+        await warmer.stop()
+
+    assert max_running == 2
+    assert sorted(await redis.keys("datasource:*")) == [
+        f"datasource:{i}".encode() for i in range(1, 6)
+    ]
+    assert not warmer.running
@@ -1,4 +1,5 @@
-from typing import Any, List, Mapping
+import socket
+from typing import Any, FrozenSet, List, Mapping, Set
 from unittest import mock
 
 import aioresponses
@@ -477,6 +478,20 @@ class TestSQLDBDataSource:
                 "jsonpath": "[*]",
                 "query": "",
             },  # empty query
+            {
+                "name": "sql",
+                "url": "postgresql://other@google.com",
+                "jsonpath": "[*]",
+                "query": "SELECT * FROM books",
+                "watermark": "id; DROP TABLE books",
+            },  # watermark isn't an identifier
+            {
+                "name": "sql",
+                "url": "postgresql://other@google.com",
+                "jsonpath": "[*]",
+                "query": "SELECT * FROM books",
+                "primary_key": "id",
+            },  # primary key without watermark
             # {
             #     "name": "sql",
             #     "url": "postgresql://other@localhost",
@@ -589,6 +604,72 @@ class TestSQLDBDataSource:
             instance.fetch_all.assert_awaited_once_with(query=sql_datasource.query)
             assert data == fetched_payload
 
+    @staticmethod
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "target_addresses, valid",
+        (
+            ({"93.184.216.34"}, True),
+            ({"93.184.216.34", "10.0.0.1"}, False),  # resolves to the app's host
+        ),
+    )
+    async def test_sql_datasource_validate_destination(
+        target_addresses: Set[str], valid: bool
+    ) -> None:
+        sql_datasource = SQLDataSource(
+            name="sql",
+            url="postgresql://other@example.org:5000",
+            jsonpath="[*]",
+            query="SELECT * FROM books",
+        )
+
+        async def resolve(host: str) -> FrozenSet[str]:
+            if host == "example.org":
+                return frozenset(target_addresses)
+            return frozenset({"10.0.0.1"})
+
+        with mock.patch("apixy.entities.datasource.resolve", side_effect=resolve):
+            if valid:
+                await sql_datasource.validate_destination()
+            else:
+                with pytest.raises(ValueError):
+                    await sql_datasource.validate_destination()
+
+    @staticmethod
+    @pytest.mark.asyncio
+    async def test_sql_datasource_validate_destination_unresolvable() -> None:
+        sql_datasource = SQLDataSource(
+            name="sql",
+            url="postgresql://other@example.invalid:5000",
+            jsonpath="[*]",
+            query="SELECT * FROM books",
+        )
+        with mock.patch(
+            "apixy.entities.datasource.resolve", side_effect=socket.gaierror
+        ):
+            with pytest.raises(ValueError):
+                await sql_datasource.validate_destination()
+
+    @staticmethod
+    @pytest.mark.asyncio
+    async def test_sql_datasource_validate_destination_without_hostname() -> None:
+        # not validated, the url field itself requires a host
+        sql_datasource = SQLDataSource.construct(
+            name="sql",
+            url=pydantic.AnyUrl(
+                "postgresql:///books?host=/var/run/postgresql",
+                scheme="postgresql",
+                path="/books",
+                query="host=/var/run/postgresql",
+            ),
+            jsonpath="[*]",
+            query="SELECT * FROM books",
+        )
+        with mock.patch("apixy.entities.datasource.resolve") as resolve:
+            with pytest.raises(ValueError):
+                await sql_datasource.validate_destination()
+        resolve.assert_not_called()
+
 
 class TestDataSourceDBModel:
     @staticmethod
@@ -632,6 +713,8 @@ class TestDataSourceDBModel:
             "database": entity.database,
             "query": entity.query,
             "collection": entity.collection,
+            "watermark": None,
+            "primary_key": None,
         }
 
     @staticmethod
@@ -650,6 +733,8 @@ class TestDataSourceDBModel:
         assert model.type == "sql"
         assert model.data == {
             "query": entity.query,
+            "watermark": None,
+            "primary_key": None,
         }
 
     @staticmethod
@@ -0,0 +1,148 @@
+import datetime
+from typing import Any, Dict, List, Optional
+from unittest import mock
+
+import fakeredis.aioredis
+import pytest
+
+from apixy.delta_cache import (
+    decode_watermark,
+    delta_keys,
+    encode_watermark,
+    fetch_incremental,
+)
+from apixy.entities.datasource import SQLDataSource
+
+
+@pytest.fixture
+def sql_datasource() -> SQLDataSource:
+    return SQLDataSource(
+        id=1,
+        name="sql",
+        url="postgresql://other@google.com",
+        jsonpath="[*]",
+        query="SELECT * FROM books",
+        watermark="updated",
+    )
+
+
+def _by_updated(row: Dict[str, Any]) -> Any:
+    """The watermark is an int or a datetime, depending on the test."""
+    return row["updated"]
+
+
+def _by_id(row: Dict[str, Any]) -> int:
+    row_id: int = row["id"]
+    return row_id
+
+
+class FakeTable:
+    """Rows of a table, fetched after a watermark like the datasources do."""
+
+    def __init__(self, rows: List[Dict[str, Any]]) -> None:
+        self.rows = rows
+        self.fetched_after: List[Optional[Any]] = []
+
+    async def fetch_rows(self, after: Optional[Any]) -> List[Dict[str, Any]]:
+        self.fetched_after.append(after)
+        return sorted(
+            (row for row in self.rows if after is None or row["updated"] > after),
+            key=_by_updated,
+        )
+
+
+@pytest.mark.parametrize(
+    "watermark",
+    (1, 1.5, "abc", datetime.datetime(2021, 5, 1, 12, 30), datetime.date(2021, 5, 1)),
+)
+def test_watermark_encoding(watermark: Any) -> None:
+    assert decode_watermark(encode_watermark(watermark).encode()) == watermark
+
+
+def test_delta_keys_change_with_query(sql_datasource: SQLDataSource) -> None:
+    keys = delta_keys(sql_datasource)
+    assert keys == delta_keys(sql_datasource.copy(update={"jsonpath": "[0]"}))
+    assert keys != delta_keys(sql_datasource.copy(update={"query": "SELECT 1"}))
+    assert all(key.startswith("datasource:1:delta:") for key in keys)
+
+
+@pytest.mark.asyncio
+async def test_fetch_incremental_append(
+    sql_datasource: SQLDataSource, redis: fakeredis.aioredis.FakeConnectionsPool
+) -> None:
+    table = FakeTable([{"id": 1, "updated": 1}, {"id": 2, "updated": 2}])
+    rows = await fetch_incremental(sql_datasource, "updated", None, table.fetch_rows)
+    assert rows == table.rows
+
+    table.rows.append({"id": 3, "updated": 3})
+    rows = await fetch_incremental(sql_datasource, "updated", None, table.fetch_rows)
+    assert rows == table.rows
+    # nothing new
+    rows = await fetch_incremental(sql_datasource, "updated", None, table.fetch_rows)
+    assert rows == table.rows
+
+    assert table.fetched_after == [None, 2, 3]
+    watermark_key, rows_key = delta_keys(sql_datasource)
+    assert 0 < await redis.ttl(rows_key) <= 86400
+    assert 0 < await redis.ttl(watermark_key) <= 86400
+
+
+@pytest.mark.asyncio
+async def test_fetch_incremental_primary_key(
+    sql_datasource: SQLDataSource, redis: fakeredis.aioredis.FakeConnectionsPool
+) -> None:
+    table = FakeTable(
+        [
+            {"id": 1, "updated": datetime.datetime(2021, 1, 1)},
+            {"id": 2, "updated": datetime.datetime(2021, 1, 2)},
+        ]
+    )
+    await fetch_incremental(sql_datasource, "updated", "id", table.fetch_rows)
+
+    table.rows[0] = {"id": 1, "updated": datetime.datetime(2021, 1, 3)}
+    rows = await fetch_incremental(sql_datasource, "updated", "id", table.fetch_rows)
+
+    assert table.fetched_after == [None, datetime.datetime(2021, 1, 2)]
+    assert sorted(rows, key=_by_id) == [
+        {"id": 1, "updated": "2021-01-03T00:00:00"},
+        {"id": 2, "updated": "2021-01-02T00:00:00"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_fetch_incremental_concurrent_store(
+    sql_datasource: SQLDataSource, redis: fakeredis.aioredis.FakeConnectionsPool
+) -> None:
+    table = FakeTable([{"id": 1, "updated": 1}])
+    await fetch_incremental(sql_datasource, "updated", None, table.fetch_rows)
+    table.rows.append({"id": 2, "updated": 2})
+
+    async def fetch_rows_raced(after: Optional[Any]) -> List[Dict[str, Any]]:
+        # another fetch stores the same rows in the meantime
+        await fetch_incremental(sql_datasource, "updated", None, table.fetch_rows)
+        return await table.fetch_rows(after)
+
+    rows = await fetch_incremental(sql_datasource, "updated", None, fetch_rows_raced)
+    assert rows == table.rows
+    _, rows_key = delta_keys(sql_datasource)
+    assert await redis.llen(rows_key) == 2
+
+
+@pytest.mark.asyncio
+async def test_sql_datasource_fetch_rows_after_watermark(
+    sql_datasource: SQLDataSource,
+) -> None:
+    with mock.patch("databases.Database", spec_set=True) as database_mock:
+        instance = database_mock.return_value.__aenter__.return_value
+        instance.fetch_all = mock.AsyncMock(return_value=[{"id": 1, "updated": 5}])
+
+        assert await sql_datasource.fetch_rows(4) == [{"id": 1, "updated": 5}]
+
+        call = instance.fetch_all.await_args
+        assert call is not None
+        query = call.kwargs["query"]
+        assert str(query) == (
+            "SELECT * FROM (SELECT * FROM books) AS apixy_delta"
+            " WHERE updated > :watermark ORDER BY updated"
+        )
+        assert query.compile().params == {"watermark": 4}
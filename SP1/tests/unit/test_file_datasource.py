@@ -0,0 +1,235 @@
+import json
+import os
+import pathlib
+from typing import Any, Dict, FrozenSet, Iterator, List, Mapping, Set
+from unittest import mock
+
+import pyarrow
+import pyarrow.csv
+import pyarrow.fs
+import pyarrow.parquet
+import pydantic
+import pytest
+
+from apixy.backends import BACKENDS
+from apixy.config import SETTINGS
+from apixy.entities.datasource import (
+    DATA_SOURCES,
+    DataSourceUnion,
+    FileDataSource,
+    HTTPDataSource,
+    S3DataSource,
+    register_datasource,
+)
+from apixy.entities.shared import DataSourceFetchError
+from apixy.models import DataSourceModel
+
+ROWS: List[Dict[str, Any]] = [
+    {"year": 2019, "country": "CZ", "total": 10},
+    {"year": 2020, "country": "SK", "total": 20},
+    {"year": 2021, "country": "CZ", "total": 30},
+]
+
+
+@pytest.fixture
+def root(tmp_path: pathlib.Path) -> Iterator[pathlib.Path]:
+    table = pyarrow.table({key: [row[key] for row in ROWS] for key in ROWS[0]})
+    pyarrow.csv.write_csv(table, str(tmp_path / "sales.csv"))
+    pyarrow.parquet.write_table(table, str(tmp_path / "sales.parquet"))
+    (tmp_path / "sales.ndjson").write_text("\n".join(map(json.dumps, ROWS)))
+    with mock.patch.object(SETTINGS, "FILE_DATASOURCE_ROOT", str(tmp_path)):
+        yield tmp_path
+
+
+def file_datasource(url: str, **kwargs: Any) -> FileDataSource:
+    return FileDataSource(name="file", url=url, jsonpath="@", **kwargs)
+
+
+@pytest.mark.parametrize(
+    "path, kwargs",
+    (
+        ("/etc/passwd", {"format": "csv"}),  # outside of the root
+        ("{root}/../sales.csv", {}),
+        ("{root}/sales.xlsx", {}),  # unknown extension
+        ("{root}/sales.csv", {"filters": [["year", "in", 2020]]}),
+        ("{root}/sales.csv", {"filters": [["year", "==", [2020]]]}),
+        ("{root}/sales.csv", {"filters": [["year", "like", 2020]]}),
+        ("{root}/sales.csv", {"columns": []}),
+    ),
+)
+def test_invalid_file_datasource(
+    root: pathlib.Path, path: str, kwargs: Mapping[str, Any]
+) -> None:
+    with pytest.raises(pydantic.ValidationError):
+        file_datasource("file://" + path.format(root=root), **kwargs)
+
+
+def test_file_datasources_disabled(root: pathlib.Path) -> None:
+    with mock.patch.object(SETTINGS, "FILE_DATASOURCE_ROOT", ""):
+        with pytest.raises(pydantic.ValidationError):
+            file_datasource(f"file://{root}/sales.csv")
+
+
+@pytest.mark.asyncio
+async def test_file_datasource_symlink_outside_root(root: pathlib.Path) -> None:
+    os.symlink("/etc/passwd", root / "passwd.csv")
+    datasource = file_datasource(f"file://{root}/passwd.csv")
+    with pytest.raises(ValueError):
+        await datasource.validate_destination()
+    with pytest.raises(DataSourceFetchError):
+        await datasource.fetch_data()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("extension", ("csv", "parquet", "ndjson"))
+async def test_file_datasource_fetch(root: pathlib.Path, extension: str) -> None:
+    datasource = file_datasource(f"file://{root}/sales.{extension}")
+    assert datasource.format == extension
+    await datasource.validate_destination()
+    assert await datasource.fetch_data() == ROWS
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("extension", ("csv", "parquet", "ndjson"))
+async def test_file_datasource_fetch_pushdown(
+    root: pathlib.Path, extension: str
+) -> None:
+    datasource = file_datasource(
+        f"file://{root}/sales.{extension}",
+        columns=["year", "total"],
+        filters=[["country", "in", ["CZ"]], ["year", ">", 2019]],
+    )
+    assert await datasource.fetch_data() == [{"year": 2021, "total": 30}]
+
+
+@pytest.mark.asyncio
+async def test_file_datasource_fetch_errors(root: pathlib.Path) -> None:
+    with pytest.raises(DataSourceFetchError):
+        await file_datasource(f"file://{root}/missing.csv").fetch_data()
+    with pytest.raises(DataSourceFetchError):
+        await file_datasource(
+            f"file://{root}/sales.parquet", columns=["missing"]
+        ).fetch_data()
+
+
+@pytest.mark.parametrize(
+    "raw_datasource",
+    (
+        {"url": "https://bucket/sales.csv"},
+        {"url": "s3://bucket/sales.csv", "access_key": "key"},
+        {"url": "s3://bucket/sales.csv", "endpoint": "minio:9000"},
+        {"url": "s3://bucket/sales.csv"},  # the server's credentials
+        {
+            "url": "s3://bucket/sales.csv",
+            "endpoint": "http://localhost:9000",
+            "access_key": "key",
+            "secret_key": "secret",
+        },
+    ),
+)
+def test_invalid_s3_datasource(raw_datasource: Mapping[str, Any]) -> None:
+    with pytest.raises(pydantic.ValidationError):
+        S3DataSource(name="s3", jsonpath="@", **raw_datasource)
+
+
+@pytest.mark.asyncio
+async def test_s3_datasource_fetch(root: pathlib.Path) -> None:
+    (root / "bucket").mkdir()
+    (root / "sales.parquet").rename(root / "bucket" / "sales.parquet")
+    datasource = S3DataSource(
+        name="s3",
+        url="s3://bucket/sales.parquet",
+        jsonpath="[*].total",
+        endpoint="http://minio:9000",
+        access_key="minioadmin",
+        secret_key="minioadmin",
+    )
+    # the bucket is a local directory instead of MinIO
+    local = pyarrow.fs.SubTreeFileSystem(str(root), pyarrow.fs.LocalFileSystem())
+    with mock.patch("pyarrow.fs.S3FileSystem", return_value=local) as s3_mock:
+        assert await datasource.fetch_data() == [10, 20, 30]
+
+    s3_mock.assert_called_once_with(
+        access_key="minioadmin",
+        secret_key="minioadmin",
+        region=None,
+        scheme="http",
+        endpoint_override="minio:9000",
+    )
+
+
+def test_s3_datasource_ambient_credentials() -> None:
+    with mock.patch.object(SETTINGS, "S3_AMBIENT_CREDENTIALS", True):
+        datasource = S3DataSource(name="s3", url="s3://bucket/a.csv", jsonpath="@")
+    assert datasource.access_key is None and datasource.secret_key is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "addresses, valid",
+    (
+        ({"93.184.216.34"}, True),
+        ({"10.0.0.1"}, False),  # the app's host
+        ({"169.254.169.254"}, False),  # instance metadata
+        ({"::1"}, False),
+    ),
+)
+async def test_s3_datasource_validate_destination(
+    addresses: Set[str], valid: bool
+) -> None:
+    datasource = S3DataSource(
+        name="s3",
+        url="s3://bucket/sales.csv",
+        jsonpath="@",
+        endpoint="http://storage.example.org",
+        access_key="key",
+        secret_key="secret",
+    )
+
+    async def resolve(host: str) -> FrozenSet[str]:
+        if host == "storage.example.org":
+            return frozenset(addresses)
+        return frozenset({"10.0.0.1"})
+
+    with mock.patch("apixy.entities.datasource.resolve", side_effect=resolve):
+        if valid:
+            await datasource.validate_destination()
+        else:
+            with pytest.raises(ValueError):
+                await datasource.validate_destination()
+
+
+def test_s3_datasource_secret_key_hidden() -> None:
+    entity = S3DataSource(
+        name="s3",
+        url="s3://bucket/sales.csv",
+        jsonpath="@",
+        access_key="key",
+        secret_key="s3cr3t",
+    )
+    model = DataSourceModel.from_pydantic(entity)
+    assert model.data["secret_key"] == "s3cr3t"
+    assert model.to_pydantic() == entity
+    assert "s3cr3t" not in DataSourceUnion.parse_obj(entity).json()
+
+
+def test_file_datasource_from_pydantic(root: pathlib.Path) -> None:
+    entity = file_datasource(f"file://{root}/sales.csv", columns=["year"])
+    model = DataSourceModel.from_pydantic(entity)
+    assert model.type == "file"
+    assert model.data == {"format": "csv", "columns": ["year"], "filters": None}
+    assert model.to_pydantic() == entity
+
+
+def test_register_datasource() -> None:
+    class FTPDataSource(HTTPDataSource):
+        type: str = "ftp"
+
+    register_datasource(FTPDataSource, "plugins.ftp")
+    try:
+        assert DATA_SOURCES["ftp"] is FTPDataSource
+        assert BACKENDS["ftp"] == "plugins.ftp"
+        with pytest.raises(ValueError):
+            register_datasource(FTPDataSource, "plugins.ftp")
+    finally:
+        del DATA_SOURCES["ftp"], BACKENDS["ftp"]
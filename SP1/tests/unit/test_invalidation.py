@@ -0,0 +1,125 @@
+import asyncio
+from typing import Any, Iterator, List, Tuple
+from unittest import mock
+
+import fakeredis.aioredis
+import pytest
+
+from apixy.entities.datasource import HTTPDataSource
+from apixy.entities.project import ProjectWithDataSources
+from apixy.invalidation import (
+    InvalidationListener,
+    invalidate_datasource,
+    invalidate_project,
+)
+from apixy.project_cache import ProjectPlanCache
+
+
+@pytest.fixture
+def plans() -> Iterator[ProjectPlanCache]:
+    cache = ProjectPlanCache(ttl=60)
+    cache.put(
+        ProjectWithDataSources(
+            id=1,
+            slug="cool-slug",
+            name="New project",
+            merge_strategy="concatenation",
+            datasources=[
+                HTTPDataSource(
+                    id=2, name="http", url="http://foo.bar", method="GET", jsonpath="*"
+                )
+            ],
+        )
+    )
+    with mock.patch("apixy.invalidation.PROJECT_PLANS", plans := cache):
+        yield plans
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "invalidate, object_id", ((invalidate_project, 1), (invalidate_datasource, 2))
+)
+async def test_invalidation_from_other_worker(
+    redis: fakeredis.aioredis.FakeConnectionsPool,
+    plans: ProjectPlanCache,
+    invalidate: mock.AsyncMock,
+    object_id: int,
+) -> None:
+    listener = InvalidationListener()
+    await listener.start()
+    assert listener.running
+
+    with mock.patch("apixy.invalidation.worker_id", return_value="other:1"):
+        with mock.patch.object(plans, "invalidate_project") as local:
+            await invalidate(object_id)
+            # invalidated locally right away, not by the listener
+            assert local.call_count == 1
+
+    await asyncio.sleep(0.05)
+    await listener.stop()
+    assert listener.received == 1
+    assert plans.get(1) is None
+    assert not listener.running
+
+
+@pytest.mark.asyncio
+async def test_own_invalidations_ignored(
+    redis: fakeredis.aioredis.FakeConnectionsPool, plans: ProjectPlanCache
+) -> None:
+    listener = InvalidationListener()
+    await listener.start()
+    await invalidate_project(3)
+    await redis.publish(
+        "apixy:invalidate", b"not json"
+    )  # malformed messages are skipped
+    await asyncio.sleep(0.05)
+    assert listener.running
+    await listener.stop()
+    assert listener.received == 0
+    assert plans.get(1) is not None
+
+
+@pytest.mark.asyncio
+async def test_resubscribed_after_lost_subscription(
+    redis: fakeredis.aioredis.FakeConnectionsPool, plans: ProjectPlanCache
+) -> None:
+    listener = InvalidationListener()
+    await listener.start()
+    subscribe = redis.subscribe
+    attempts: List[Tuple[str, ...]] = []
+
+    async def flaky_subscribe(*channels: str) -> Any:
+        attempts.append(channels)
+        if len(attempts) == 1:
+            raise ConnectionRefusedError()
+        return await subscribe(*channels)
+
+    with mock.patch("apixy.invalidation.RECONNECT_MIN_DELAY", 0.01), mock.patch.object(
+        redis, "subscribe", flaky_subscribe
+    ):
+        # the subscription is lost with the connection
+        connection = redis.connection._pubsub_conn
+        connection.close()
+        await connection.wait_closed()
+        await asyncio.sleep(0.005)
+        assert not listener.running
+        # plans could miss invalidations in the meantime
+        assert plans.get(1) is None
+        await asyncio.sleep(0.1)
+
+    assert len(attempts) == 2
+    assert listener.running
+    await listener.stop()
+    assert not listener.running
+    # the pool doesn't close the new pub/sub connection by itself
+    redis.connection._pubsub_conn.close()
+    await redis.connection._pubsub_conn.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_invalidation_without_redis(plans: ProjectPlanCache) -> None:
+    listener = InvalidationListener()
+    await listener.start()
+    assert not listener.running
+    await invalidate_project(1)
+    assert plans.get(1) is None
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+from typing import AsyncIterator
+
+import pytest
+
+from apixy.loop_monitor import LoopMonitor
+
+
+def busy_wait(seconds: float) -> None:
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+@pytest.fixture
+async def monitor() -> AsyncIterator[LoopMonitor]:
+    loop_monitor = LoopMonitor(interval=0.01, threshold=0.05, profiler_interval=0.002)
+    loop_monitor.start()
+    yield loop_monitor
+    await loop_monitor.stop()
+
+
+@pytest.mark.asyncio
+async def test_lag_sampled(monitor: LoopMonitor) -> None:
+    assert monitor.running
+    await asyncio.sleep(0.05)
+    stats = monitor.stats()
+    assert monitor.lags
+    assert stats.slow_callbacks == 0
+    assert 0 <= stats.lag_p50 <= stats.lag_p99 <= stats.lag_max < 50
+
+
+@pytest.mark.asyncio
+async def test_slow_callback_stack_captured(monitor: LoopMonitor) -> None:
+    await asyncio.sleep(0.02)
+    time.sleep(0.2)  # blocks the loop
+    await asyncio.sleep(0.02)
+
+    report = monitor.report()
+    assert report.stats.slow_callbacks == 1
+    assert report.stats.lag_max >= 100
+    (slow,) = report.slow
+    assert slow.duration is not None and slow.duration >= 100
+    assert "time.sleep(0.2)" in slow.stack[-1]
+
+
+@pytest.mark.asyncio
+async def test_profiler(monitor: LoopMonitor) -> None:
+    assert not monitor.profiling
+    monitor.start_profiler(duration=10)
+    assert monitor.profiling
+    await asyncio.sleep(0.01)
+    busy_wait(0.1)
+    monitor.stop_profiler()
+
+    # the most common stack first, outermost frame first
+    stack, count = monitor.folded_profile().splitlines()[0].rsplit(" ", 1)
+    assert stack.split(";")[-1].startswith("busy_wait (") and int(count) > 0
+    assert monitor.report().profile_samples > 0
+    assert not monitor.stats().profiling
+
+
+def watchdogs() -> int:
+    return sum(thread.name == "apixy-loop-watchdog" for thread in threading.enumerate())
+
+
+@pytest.mark.asyncio
+async def test_stop(monitor: LoopMonitor) -> None:
+    running_watchdogs = watchdogs()
+    await monitor.stop()
+    assert not monitor.running
+    assert watchdogs() == running_watchdogs - 1
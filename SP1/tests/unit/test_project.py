@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Tuple, cast
 from unittest import mock
 
 import pytest
@@ -148,8 +148,6 @@ async def test_project_fetch_data_concatenation(
         ) as mock_data_source:
             data_source = mock_data_source.return_value
 
-        data_source.copy.return_value.fetch_data = mock.AsyncMock(return_value=payload)
-
         fetched_payloads.append(payload)
         data_sources.append(data_source)
 
@@ -159,11 +157,14 @@ async def test_project_fetch_data_concatenation(
         merge_strategy="concatenation",
         datasources=data_sources,
     )
+    # the project holds copies of the datasources (depending on pydantic's version)
+    for data_source, payload in zip(project.datasources, fetched_payloads):
+        data_source.fetch_data = mock.AsyncMock(return_value=payload)
 
     fetched_project_data = await project.fetch_data(MockLogger())
 
-    for data_source in data_sources:
-        data_source.copy.return_value.fetch_data.assert_awaited_once()
+    for data_source in project.datasources:
+        cast(mock.AsyncMock, data_source.fetch_data).assert_awaited_once()
 
     desired_data = {str(i): p for i, p in enumerate(fetched_payloads)}
     assert desired_data == fetched_project_data.result.data
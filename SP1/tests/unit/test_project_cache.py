@@ -0,0 +1,96 @@
+from typing import Any, Dict
+from unittest import mock
+
+import pytest
+
+from apixy.entities.datasource import HTTPDataSource
+from apixy.entities.project import ProjectWithDataSources
+from apixy.project_cache import ProjectPlanCache
+
+
+@pytest.fixture
+def plan() -> ProjectWithDataSources:
+    return ProjectWithDataSources(
+        id=1,
+        slug="cool-slug",
+        name="New project",
+        merge_strategy="concatenation",
+        datasources=[
+            HTTPDataSource(
+                id=2, name="http", url="http://foo.bar", method="GET", jsonpath="*"
+            )
+        ],
+    )
+
+
+def test_get_by_id_and_slug(plan: ProjectWithDataSources) -> None:
+    cache = ProjectPlanCache(ttl=60)
+    assert cache.get(1) is None
+    cache.put(plan)
+    assert cache.get(1) is plan
+    assert cache.get(slug="cool-slug") is plan
+    assert cache.get(slug="other-slug") is None
+
+
+def test_expired(plan: ProjectWithDataSources) -> None:
+    cache = ProjectPlanCache(ttl=60)
+    with mock.patch("time.monotonic", return_value=0):
+        cache.put(plan)
+    with mock.patch("time.monotonic", return_value=61):
+        assert cache.get(1) is None
+    assert cache.get(slug="cool-slug") is None
+
+
+def test_disabled(plan: ProjectWithDataSources) -> None:
+    cache = ProjectPlanCache(ttl=0)
+    cache.put(plan)
+    assert cache.get(1) is None
+
+
+@pytest.mark.parametrize(
+    "invalidate",
+    (
+        {"invalidate_project": 1},
+        {"invalidate_datasource": 2},
+    ),
+)
+def test_invalidate(plan: ProjectWithDataSources, invalidate: Dict[str, Any]) -> None:
+    cache = ProjectPlanCache(ttl=60)
+    cache.put(plan)
+    ((method, arg),) = invalidate.items()
+    getattr(cache, method)(arg)
+    assert cache.get(1) is None
+    assert cache.get(slug="cool-slug") is None
+
+
+def test_invalidate_other_datasource(plan: ProjectWithDataSources) -> None:
+    cache = ProjectPlanCache(ttl=60)
+    cache.put(plan)
+    cache.invalidate_datasource(3)
+    assert cache.get(1) is plan
+
+
+@pytest.mark.parametrize(
+    "invalidate",
+    (
+        {"invalidate_project": 5},
+        {"invalidate_datasource": 2},
+    ),
+)
+def test_invalidated_while_loading(
+    plan: ProjectWithDataSources, invalidate: Dict[str, Any]
+) -> None:
+    cache = ProjectPlanCache(ttl=60)
+    generation = cache.generation
+    ((method, arg),) = invalidate.items()
+    getattr(cache, method)(arg)
+    cache.put(plan, generation)
+    assert cache.get(1) is None
+
+    cache.put(plan, cache.generation)
+    assert cache.get(1) is plan
+
+
+def test_plan_immutable(plan: ProjectWithDataSources) -> None:
+    with pytest.raises(TypeError):
+        plan.slug = "other-slug"  # type: ignore[misc]
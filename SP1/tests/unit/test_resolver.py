@@ -0,0 +1,76 @@
+import socket
+from typing import Iterator
+from unittest import mock
+
+import pytest
+
+from apixy import resolver
+
+ADDRESS_INFO = [
+    (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("93.184.216.34", 0)),
+    (socket.AF_INET, socket.SOCK_DGRAM, 17, "", ("93.184.216.34", 0)),
+]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache() -> Iterator[None]:
+    resolver.clear_cache()
+    yield
+    resolver.clear_cache()
+
+
+@pytest.mark.asyncio
+async def test_resolve_cached() -> None:
+    with mock.patch("asyncio.get_running_loop") as get_loop:
+        getaddrinfo = get_loop.return_value.getaddrinfo = mock.AsyncMock(
+            return_value=ADDRESS_INFO
+        )
+        assert await resolver.resolve("example.org") == {"93.184.216.34"}
+        assert await resolver.resolve("example.org") == {"93.184.216.34"}
+    getaddrinfo.assert_awaited_once_with("example.org", None)
+
+
+@pytest.mark.asyncio
+async def test_resolve_expired() -> None:
+    with mock.patch("asyncio.get_running_loop") as get_loop, mock.patch(
+        "apixy.config.SETTINGS.DNS_CACHE_TTL", 0
+    ):
+        getaddrinfo = get_loop.return_value.getaddrinfo = mock.AsyncMock(
+            return_value=ADDRESS_INFO
+        )
+        await resolver.resolve("example.org")
+        await resolver.resolve("example.org")
+    assert getaddrinfo.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_resolve_failure_not_cached() -> None:
+    with mock.patch("asyncio.get_running_loop") as get_loop:
+        getaddrinfo = get_loop.return_value.getaddrinfo = mock.AsyncMock(
+            side_effect=socket.gaierror
+        )
+        for _ in range(2):
+            with pytest.raises(socket.gaierror):
+                await resolver.resolve("example.invalid")
+    assert getaddrinfo.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_resolve_least_recently_used_evicted() -> None:
+    with mock.patch("asyncio.get_running_loop") as get_loop, mock.patch(
+        "apixy.resolver.MAX_CACHED_HOSTS", 2
+    ):
+        getaddrinfo = get_loop.return_value.getaddrinfo = mock.AsyncMock(
+            return_value=ADDRESS_INFO
+        )
+        await resolver.resolve("a.example.org")
+        await resolver.resolve("b.example.org")
+        await resolver.resolve("a.example.org")
+        await resolver.resolve("c.example.org")
+        assert getaddrinfo.await_count == 3
+
+        # b was the least recently used one
+        await resolver.resolve("a.example.org")
+        assert getaddrinfo.await_count == 3
+        await resolver.resolve("b.example.org")
+        assert getaddrinfo.await_count == 4
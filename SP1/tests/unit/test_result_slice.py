@@ -0,0 +1,69 @@
+from typing import Any, Dict
+
+import pydantic
+import pytest
+
+from apixy.entities.proxy_response import ProxyResponse
+from apixy.entities.result_slice import ResultSlice
+
+ROWS = [{"id": i, "name": f"item {i}", "even": i % 2 == 0} for i in range(10)]
+
+
+def response(data: Any) -> ProxyResponse:
+    return ProxyResponse(
+        result=ProxyResponse.Container(size=len(data), data=data), errors=None
+    )
+
+
+@pytest.mark.parametrize(
+    "params, data, expected, total",
+    (
+        ({}, ROWS, ROWS, 10),
+        ({"offset": 8}, ROWS, ROWS[8:], 10),
+        ({"offset": 2, "limit": 3}, ROWS, ROWS[2:5], 10),
+        ({"offset": 20}, ROWS, [], 10),
+        (
+            {"limit": 2, "fields": {"id"}},
+            ROWS,
+            [{"id": 0}, {"id": 1}],
+            10,
+        ),
+        (
+            {"filter": "[?even].id", "limit": 2},
+            ROWS,
+            [0, 2],
+            5,
+        ),
+        (
+            # concatenation merge strategy output
+            {"filter": "values(@)[]", "offset": 1, "limit": 2, "fields": {"name"}},
+            {"0": ROWS[:2], "1": ROWS[2:4]},
+            [{"name": "item 1"}, {"name": "item 2"}],
+            4,
+        ),
+        (
+            {"offset": 1, "fields": {"id"}},
+            {"0": ROWS[:2], "1": ROWS[2:4]},
+            {"1": [{"id": 2}, {"id": 3}]},
+            2,
+        ),
+        ({"filter": "[0].name"}, ROWS, "item 0", 1),
+        ({"filter": "missing"}, {"a": 1}, None, 0),
+    ),
+)
+def test_apply(params: Dict[str, Any], data: Any, expected: Any, total: int) -> None:
+    original = response(data)
+    result, result_total = ResultSlice(**params).apply(original)
+    assert result.result.data == expected
+    assert result_total == total
+    assert original.result.data == data  # not modified
+
+
+def test_invalid_filter() -> None:
+    with pytest.raises(pydantic.ValidationError):
+        ResultSlice(filter="[?")
+
+
+def test_filter_evaluation_error() -> None:
+    with pytest.raises(ValueError):
+        ResultSlice(filter="abs(@)").apply(response(["a"]))
@@ -0,0 +1,69 @@
+"""
+A module with posting lists (sets of file ids) represented as bitmaps.
+
+Python integers are used as the bitmaps, bit `i` is set if file with id `i`
+is in the set. AND (&), OR (|) and NOT (& ~) are then done over whole
+machine words in C instead of element by element on `set` objects,
+and the bitmap of a dense posting list takes a bit per file instead of
+tens of bytes per id.
+"""
+from typing import Iterable, List
+
+EMPTY = 0
+
+# positions of set bits in each possible byte
+_BYTE_BITS: List[List[int]] = [
+    [bit for bit in range(8) if byte & (1 << bit)] for byte in range(256)
+]
+
+
+def from_ids(file_ids: Iterable[int]) -> int:
+    """
+    Builds the bitmap in a bytearray and converts it at once, ORing bits
+    one by one would copy the whole (growing) integer for each id.
+
+    :param file_ids: non-negative file ids
+    :rtype: int
+    """
+    file_ids = list(file_ids)
+    if len(file_ids) == 0:
+        return EMPTY
+
+    buffer = bytearray(max(file_ids) // 8 + 1)
+    for file_id in file_ids:
+        buffer[file_id >> 3] |= 1 << (file_id & 7)
+
+    return int.from_bytes(buffer, "little")
+
+
+def to_ids(bitmap: int) -> List[int]:
+    """
+    :return: sorted file ids
+    :rtype: List[int]
+    """
+    file_ids: List[int] = []
+
+    for index, byte in enumerate(
+        bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    ):
+        # most of bytes of a sparse bitmap are empty
+        if byte:
+            base = index * 8
+            file_ids.extend(base + bit for bit in _BYTE_BITS[byte])
+
+    return file_ids
+
+
+def count(bitmap: int) -> int:
+    """:return: number of files in the bitmap"""
+    return bin(bitmap).count("1")
+
+
+def to_bytes(bitmap: int) -> bytes:
+    """:return: bitmap serialized for storing, for e.g. in Redis"""
+    return bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+
+
+def from_bytes(data: bytes) -> int:
+    """Reverse of `to_bytes()`."""
+    return int.from_bytes(data, "little")
@@ -0,0 +1,160 @@
+"""
+A module with caches of Boolean model results.
+
+Each cache is an in-process LRU (kept between requests and warm AWS Lambda
+invocations), optionally backed by Redis (BOOLEAN_MODEL_REDIS_URL),
+which is shared by all processes and survives cold starts.
+Redis is only an optimization, when it is not reachable (any error)
+the local cache is used alone.
+"""
+from typing import Any, Callable, Generic, Optional, Tuple, TypeVar
+
+import asyncio
+import collections
+import logging
+import os
+import time
+
+REDIS_URL = os.getenv("BOOLEAN_MODEL_REDIS_URL")
+
+V = TypeVar("V")
+
+# how long (in seconds) to wait before connecting to Redis again
+# after a failed connection, not to slow down every request
+REDIS_RETRY_AFTER = 30.0
+
+# Redis connection pool and the event loop it was created in
+_redis: Optional["asyncio.Future[Any]"] = None
+_redis_loop: Optional[asyncio.AbstractEventLoop] = None
+_redis_failed_at = -REDIS_RETRY_AFTER
+
+
+async def get_redis() -> Optional[Any]:
+    """
+    :return: aioredis connection pool, None if Redis is not configured
+        or cannot be connected to
+    """
+    global _redis, _redis_loop, _redis_failed_at
+
+    if REDIS_URL is None:
+        return None
+
+    loop = asyncio.get_event_loop()
+    if _redis is not None and _redis_loop is loop:
+        pool = _redis
+    else:
+        if time.monotonic() - _redis_failed_at < REDIS_RETRY_AFTER:
+            return None
+
+        # imported only when used, not needed (installed) otherwise
+        import aioredis
+
+        pool = asyncio.ensure_future(aioredis.create_redis_pool(REDIS_URL))
+        _redis = pool
+        _redis_loop = loop
+
+    try:
+        return await asyncio.shield(pool)
+    except Exception as error:
+        logging.warning("Cannot connect to Redis: %s", error)
+        _redis = None
+        _redis_failed_at = time.monotonic()
+        return None
+
+
+class Cache(Generic[V]):
+    """
+    LRU cache with string keys and expiring values.
+
+    :param str name: prefix of the keys in Redis
+    :param int maxsize: max number of values kept in the process
+    :param float ttl: how long (in seconds) are values valid
+    :param encode: converts a value to bytes for Redis,
+        None to keep the values only in the process
+    :param decode: reverse of `encode`
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        ttl: float,
+        encode: Optional[Callable[[V], bytes]] = None,
+        decode: Optional[Callable[[bytes], V]] = None,
+    ) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.encode = encode
+        self.decode = decode
+        # values with their expiration times, from least recently used
+        self._values: "collections.OrderedDict[str, Tuple[float, V]]" = (
+            collections.OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def clear(self) -> None:
+        self._values.clear()
+
+    def _get_local(self, key: str) -> Optional[V]:
+        if key not in self._values:
+            return None
+
+        expires, value = self._values[key]
+        if expires < time.monotonic():
+            del self._values[key]
+            return None
+
+        self._values.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: V) -> None:
+        self._values[key] = (time.monotonic() + self.ttl, value)
+        self._values.move_to_end(key)
+
+        while len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[V]:
+        """:return: cached value, None on cache miss"""
+        value = self._get_local(key)
+        if value is not None or self.decode is None:
+            return value
+
+        redis = await get_redis()
+        if redis is None:
+            return None
+
+        try:
+            encoded = await redis.get(f"{self.name}:{key}")
+        except Exception as error:
+            logging.warning("Cannot get from Redis: %s", error)
+            return None
+
+        if encoded is None:
+            return None
+
+        value = self.decode(encoded)
+        self._set_local(key, value)
+        return value
+
+    async def set(self, key: str, value: V) -> None:
+        self._set_local(key, value)
+
+        if self.encode is None:
+            return
+
+        redis = await get_redis()
+        if redis is None:
+            return
+
+        try:
+            await redis.set(
+                f"{self.name}:{key}",
+                self.encode(value),
+                pexpire=int(self.ttl * 1000),
+            )
+        except Exception as error:
+            logging.warning("Cannot store to Redis: %s", error)
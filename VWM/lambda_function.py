@@ -10,6 +10,12 @@ import logic
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# One event loop for all invocations of a (warm) Lambda container,
+# so AWS clients opened by logic module within it can be reused,
+# asyncio.run() would create and close a new loop each time.
+LOOP = asyncio.new_event_loop()
+asyncio.set_event_loop(LOOP)
+
 
 def lambda_handler(event: Dict[str, Any], _: Any) -> Dict[str, Any]:
 
@@ -21,7 +27,9 @@ def lambda_handler(event: Dict[str, Any], _: Any) -> Dict[str, Any]:
 
     if resource_name == "/dataset_names":
         try:
-            response = json.dumps(asyncio.run(logic.dataset_names()))
+            response = json.dumps(
+                LOOP.run_until_complete(logic.dataset_names())
+            )
         except Exception as exception:
             logging.exception(exception)
             logging.exception(exception)
@@ -31,7 +39,7 @@ def lambda_handler(event: Dict[str, Any], _: Any) -> Dict[str, Any]:
     elif resource_name == "/query/{dataset}/{query}":
         try:
             response = json.dumps(
-                asyncio.run(
+                LOOP.run_until_complete(
                     logic.process_query(
                         dataset=urllib.parse.unquote(
                             event["pathParameters"]["dataset"]
@@ -51,7 +59,7 @@ def lambda_handler(event: Dict[str, Any], _: Any) -> Dict[str, Any]:
     elif resource_name == "/publish_file/{dataset}/{filename}":
         try:
             response = json.dumps(
-                asyncio.run(
+                LOOP.run_until_complete(
                     logic.publish_file_for_5_minutes_and_return_url(
                         dataset=urllib.parse.unquote(
                             event["pathParameters"]["dataset"]
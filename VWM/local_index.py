@@ -0,0 +1,421 @@
+"""
+A module with local (offline) inverted index for Boolean model.
+
+The whole index of a dataset is a single file, which is memory-mapped
+when opened, so only the pages of looked up terms are read from disk:
+
+    header        magic, version, counts and offsets of the sections below
+    terms index   (terms + 1) uint64 offsets into terms blob
+    terms blob    UTF-8 terms sorted by their bytes (binary searched)
+    counts        uint32 number of files of each term
+    postings idx  (terms + 1) uint64 offsets into postings blob
+    postings      file ids of each term, sorted, delta-encoded
+                  and compressed as varints (LEB128)
+    files index   (files + 1) uint64 offsets into files blob
+    files blob    UTF-8 filenames, position is file id
+    words index   (words + 1) uint64 offsets into words blob
+    words blob    UTF-8 indexed words sorted by their bytes
+    stems index   (words + 1) uint64 offsets into stems blob
+    stems blob    UTF-8 stems (terms) of the words
+
+Version 1 files (without the words and stems) can be read as well.
+
+Files removed from a dataset (see incremental processing) keep their ids
+reserved, with empty filename. Metadata of the indexed files (ids,
+modification times, sizes and hashes of contents) are kept next to
+the index in a JSON manifest, so a dataset can be processed again
+incrementally. The manifest holds hash of the index it was written with,
+as they are replaced one after another.
+
+Written by process_and_upload_dataset.py (--index-dir),
+read by logic.py when BOOLEAN_MODEL_BACKEND is "local".
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+MAGIC = b"VWMIDX\0\0"
+VERSION = 2
+EXTENSION = ".vwmidx"
+MANIFEST_EXTENSION = ".files.json"
+
+# magic and version, the same for all versions
+PREFIX = struct.Struct("<8sI")
+# magic, version, number of terms, number of files, number of words
+# and offsets of 11 sections
+HEADER = struct.Struct("<8sIIII11Q")
+# magic, version, number of terms, number of files
+# and offsets of 7 sections
+HEADER_V1 = struct.Struct("<8sIII7Q")
+OFFSET = struct.Struct("<Q")
+COUNT = struct.Struct("<I")
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def index_path(index_dir: str, dataset: str) -> str:
+    return os.path.join(index_dir, dataset + EXTENSION)
+
+
+def manifest_path(index_dir: str, dataset: str) -> str:
+    return os.path.join(index_dir, dataset + MANIFEST_EXTENSION)
+
+
+def index_sha256(path: str) -> str:
+    """:return: hash of contents of the index file"""
+    sha256 = hashlib.sha256()
+
+    with open(path, "rb") as f_in:
+        for chunk in iter(lambda: f_in.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+
+    return sha256.hexdigest()
+
+
+def read_manifest(path: str, index_path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    :param str index_path: the index the manifest should be written with
+    :return: filenames with their metadata ("id", "mtime", "size"
+        and "sha256"), empty if there is no manifest or index, or when
+        the manifest was not written with the index (the processing
+        was interrupted in between), so ids can't be reused
+    """
+    if not (os.path.isfile(path) and os.path.isfile(index_path)):
+        return {}
+
+    with open(path, "r") as f_in:
+        manifest = json.load(f_in)
+
+    if manifest.get("index_sha256") != index_sha256(index_path):
+        return {}
+
+    files: Dict[str, Dict[str, Any]] = manifest["files"]
+    return files
+
+
+def write_manifest(
+    path: str, files: Dict[str, Dict[str, Any]], index_sha256: str
+) -> None:
+    """
+    :param str index_sha256: hash of the index written with the files
+        (as returned by `write_index()`)
+    """
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w") as f_out:
+        json.dump({"index_sha256": index_sha256, "files": files}, f_out)
+
+    os.replace(temporary_path, path)
+
+
+def encode_postings(file_ids: Iterable[int]) -> bytes:
+    """
+    Encodes file ids as gaps between sorted ids, each gap as varint
+    (7 bits per byte, highest bit set on all bytes but the last one),
+    so dense posting lists take about a byte per file.
+    """
+    encoded = bytearray()
+    previous = 0
+
+    for file_id in sorted(file_ids):
+        gap = file_id - previous
+        previous = file_id
+
+        while gap >= 0x80:
+            encoded.append((gap & 0x7F) | 0x80)
+            gap >>= 7
+        encoded.append(gap)
+
+    return bytes(encoded)
+
+
+def decode_postings(encoded: bytes) -> List[int]:
+    """
+    Reverse of `encode_postings()`.
+
+    :return: sorted file ids
+    """
+    file_ids: List[int] = []
+    current = gap = shift = 0
+
+    for byte in encoded:
+        gap |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            current += gap
+            file_ids.append(current)
+            gap = shift = 0
+
+    return file_ids
+
+
+def _blob_with_offsets(values: List[bytes]) -> List[bytes]:
+    """:return: offsets section followed by the blob section"""
+    offsets = [0]
+    for value in values:
+        offsets.append(offsets[-1] + len(value))
+
+    return [
+        b"".join(map(OFFSET.pack, offsets)),
+        b"".join(values),
+    ]
+
+
+def write_index(
+    path: str,
+    file_ids: Dict[str, int],
+    terms: Dict[str, Set[int]],
+    stems: Optional[Dict[str, str]] = None,
+) -> str:
+    """
+    Writes the index of a dataset to a file (atomically, through
+    a temporary file, so a running query never sees half-written index).
+
+    :param str path: where to write the index
+    :param file_ids: filenames and their ids
+    :param terms: terms and ids of files where they can be found
+    :param stems: indexed words and their stems (terms)
+    :return: hash of contents of the index file, see `index_sha256()`
+    """
+    stems = stems or {}
+    # ids are positions in the files table, missing ones stay empty
+    filenames = [b""] * (max(file_ids.values(), default=-1) + 1)
+    for filename, file_id in file_ids.items():
+        filenames[file_id] = filename.encode()
+
+    sorted_terms = sorted(terms, key=str.encode)
+    sorted_words = sorted(stems, key=str.encode)
+
+    sections = [
+        *_blob_with_offsets([term.encode() for term in sorted_terms]),
+        b"".join(COUNT.pack(len(terms[term])) for term in sorted_terms),
+        *_blob_with_offsets(
+            [encode_postings(terms[term]) for term in sorted_terms]
+        ),
+        *_blob_with_offsets(filenames),
+        *_blob_with_offsets([word.encode() for word in sorted_words]),
+        *_blob_with_offsets([stems[word].encode() for word in sorted_words]),
+    ]
+
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        offsets.append(position)
+        position += len(section)
+
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        len(sorted_terms),
+        len(filenames),
+        len(sorted_words),
+        *offsets,
+    )
+    sha256 = hashlib.sha256(header)
+
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as f_out:
+        f_out.write(header)
+        for section in sections:
+            f_out.write(section)
+            sha256.update(section)
+
+    os.replace(temporary_path, path)
+    return sha256.hexdigest()
+
+
+class LocalIndex:
+    """
+    Read-only, memory-mapped index of a dataset written by `write_index()`.
+
+    :raises ValueError: if the file is not an index (of this version)
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f_in:
+            self._mmap = mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap.size() < PREFIX.size:
+            raise ValueError(f"{path} is not an index file")
+
+        magic, version = PREFIX.unpack_from(self._mmap)
+        if magic != MAGIC or version not in (1, VERSION):
+            raise ValueError(f"{path} is not an index file")
+
+        # version 1 has no words and stems
+        self.words_count = 0
+        self._words_index = self._words_blob = 0
+        self._stems_index = self._stems_blob = 0
+
+        if version == 1:
+            (
+                _,
+                _,
+                self.terms_count,
+                self.files_count,
+                *sections,
+            ) = HEADER_V1.unpack_from(self._mmap)
+        else:
+            (
+                _,
+                _,
+                self.terms_count,
+                self.files_count,
+                self.words_count,
+                *sections,
+            ) = HEADER.unpack_from(self._mmap)
+
+            (
+                self._words_index,
+                self._words_blob,
+                self._stems_index,
+                self._stems_blob,
+            ) = sections[7:]
+
+        (
+            self._terms_index,
+            self._terms_blob,
+            self._counts,
+            self._postings_index,
+            self._postings_blob,
+            self._files_index,
+            self._files_blob,
+        ) = sections[:7]
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def _offsets(self, index_offset: int, position: int) -> List[int]:
+        """:return: start and end offset of the value at `position`"""
+        start, end = struct.unpack_from(
+            "<2Q", self._mmap, index_offset + position * OFFSET.size
+        )
+        return [start, end]
+
+    def _value(
+        self, index_offset: int, blob_offset: int, position: int
+    ) -> bytes:
+        start, end = self._offsets(index_offset, position)
+        return self._mmap[blob_offset + start : blob_offset + end]
+
+    def _search(
+        self, index_offset: int, blob_offset: int, count: int, key: str
+    ) -> Optional[int]:
+        """
+        Binary search in sorted values of a section.
+
+        :return: position of the key, None if it is not in the section
+        """
+        encoded = key.encode()
+        low, high = 0, count
+
+        while low < high:
+            middle = (low + high) // 2
+            if self._value(index_offset, blob_offset, middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+
+        if (
+            low < count
+            and self._value(index_offset, blob_offset, low) == encoded
+        ):
+            return low
+
+        return None
+
+    def find(self, term: str) -> Optional[int]:
+        """
+        :return: position of the term, None if it is not in the index
+        """
+        return self._search(
+            self._terms_index, self._terms_blob, self.terms_count, term
+        )
+
+    def count(self, term: str) -> int:
+        """:return: number of files the term can be found in"""
+        position = self.find(term)
+        if position is None:
+            return 0
+
+        (count,) = COUNT.unpack_from(
+            self._mmap, self._counts + position * COUNT.size
+        )
+        return int(count)
+
+    def postings(self, term: str) -> List[int]:
+        """:return: sorted ids of files where the term can be found"""
+        position = self.find(term)
+        if position is None:
+            return []
+
+        return decode_postings(
+            self._value(self._postings_index, self._postings_blob, position)
+        )
+
+    def all_postings(self) -> Iterator[Tuple[str, List[int]]]:
+        """:return: all terms with their postings, sorted by the terms"""
+        for position in range(self.terms_count):
+            yield (
+                self._value(
+                    self._terms_index, self._terms_blob, position
+                ).decode(),
+                decode_postings(
+                    self._value(
+                        self._postings_index, self._postings_blob, position
+                    )
+                ),
+            )
+
+    def all_stems(self) -> Iterator[Tuple[str, str]]:
+        """:return: all indexed words with their stems"""
+        for position in range(self.words_count):
+            yield (
+                self._value(
+                    self._words_index, self._words_blob, position
+                ).decode(),
+                self._value(
+                    self._stems_index, self._stems_blob, position
+                ).decode(),
+            )
+
+    def file_ids(self) -> List[int]:
+        """:return: ids of all files (without removed ones)"""
+        file_ids: List[int] = []
+
+        for file_id in range(self.files_count):
+            # removed files have empty names
+            start, end = self._offsets(self._files_index, file_id)
+            if end > start:
+                file_ids.append(file_id)
+
+        return file_ids
+
+    def filename(self, file_id: int) -> str:
+        """
+        :raises IndexError: on not existing file id
+        """
+        if not 0 <= file_id < self.files_count:
+            raise IndexError(file_id)
+
+        return self._value(
+            self._files_index, self._files_blob, file_id
+        ).decode()
+
+    def stem(self, word: str) -> Optional[str]:
+        """
+        :return: stem of the word the dataset was indexed with,
+            None if the word is not in any file of the dataset
+        """
+        position = self._search(
+            self._words_index, self._words_blob, self.words_count, word
+        )
+        if position is None:
+            return None
+
+        return self._value(
+            self._stems_index, self._stems_blob, position
+        ).decode()
@@ -61,6 +61,13 @@ async def get_file_exposed_url(
     raise aiohttp.web.HTTPBadRequest(text=error_text)
 
 
+async def close_clients(_: aiohttp.web.Application) -> None:
+    """
+    Closes AWS clients kept open by logic module between requests
+    """
+    await logic.close_clients()
+
+
 def main() -> None:
     """
     Local server for frontend.
@@ -80,6 +87,8 @@ def main() -> None:
         )
     )
 
+    app.on_cleanup.append(close_clients)
+
     # Configure default CORS settings.
     cors = aiohttp_cors.setup(
         app,
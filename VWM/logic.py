@@ -5,10 +5,24 @@ process_query() function.
 dataset_names() and publish_file_for_5_minutes_and_return_url()
 are aux function for smooth runnning.
 """
-from typing import Dict, List, Set, Union
-
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+import asyncio
+import functools
+import json
 import logging
 import os
+import random
 import re
 import time
 
@@ -16,35 +30,657 @@ import aiobotocore
 import nltk
 import pyeda.boolalg.expr
 
+import bitmaps
+import cache
+import local_index
+
 
 S3_BUCKET = os.getenv("BOOLEAN_MODEL_S3_BUCKET") or "boolean-model"
 
+# where are the indexes of datasets: "dynamodb" (tables on AWS DynamoDB)
+# or "local" (memory-mapped files written by process_and_upload_dataset.py)
+BACKEND = os.getenv("BOOLEAN_MODEL_BACKEND") or "dynamodb"
+# directory with local index files (for "local" backend)
+INDEX_DIR = os.getenv("BOOLEAN_MODEL_INDEX_DIR") or "indexes"
+
+# DynamoDB BatchGetItem accepts at most 100 keys per request
+BATCH_GET_MAX_KEYS = 100
+# how many BatchGetItem requests can be in flight at the same time
+BATCH_GET_CONCURRENCY = int(
+    os.getenv("BOOLEAN_MODEL_BATCH_GET_CONCURRENCY") or 8
+)
+# how many times unprocessed keys (throttling) are requested again
+BATCH_GET_MAX_RETRIES = 8
+# backoff (in seconds) before the first retry, doubled with each next one
+BATCH_GET_BACKOFF = 0.05
+
+# how long (in seconds) are dataset names cached
+DATASET_NAMES_TTL = float(os.getenv("BOOLEAN_MODEL_DATASET_NAMES_TTL") or 60)
+
+# how long (in seconds) are versions of datasets in DynamoDB cached,
+# an updated dataset is searched by its old version at most that long
+DATASET_VERSION_TTL = float(
+    os.getenv("BOOLEAN_MODEL_DATASET_VERSION_TTL") or 10
+)
+
+# how long (in seconds) are cached posting lists and query results valid
+CACHE_TTL = float(os.getenv("BOOLEAN_MODEL_CACHE_TTL") or 300)
+
+# key of the item with version of a dataset in its DynamoDB terms table,
+# "*" cannot be a term
+VERSION_TERM = "*"
+
+# posting lists of (stemmed) terms
+TERMS_CACHE: cache.Cache[int] = cache.Cache(
+    "vwm:terms",
+    maxsize=int(os.getenv("BOOLEAN_MODEL_TERMS_CACHE_SIZE") or 1024),
+    ttl=CACHE_TTL,
+    encode=bitmaps.to_bytes,
+    decode=bitmaps.from_bytes,
+)
+
+# sorted filenames of query results
+RESULTS_CACHE: cache.Cache[List[str]] = cache.Cache(
+    "vwm:results",
+    maxsize=int(os.getenv("BOOLEAN_MODEL_RESULTS_CACHE_SIZE") or 256),
+    ttl=CACHE_TTL,
+    encode=lambda filenames: json.dumps(filenames).encode(),
+    decode=json.loads,
+)
+
+# presigned URLs are cached for 4 of their 5 minutes, so the user
+# has always at least a minute to download the file
+URLS_CACHE: cache.Cache[str] = cache.Cache(
+    "vwm:urls", maxsize=1024, ttl=240, encode=str.encode, decode=bytes.decode,
+)
+
+# stemmer of query words, see stem()
+_stemmer = nltk.stem.PorterStemmer()
+
+# opened local indexes with modification times of their files
+_local_indexes: Dict[str, Tuple[int, local_index.LocalIndex]] = {}
+
+# AWS clients (by service name) shared by all requests handled within
+# an event loop, with the loop they were created in
+_clients: Dict[str, "asyncio.Future[Any]"] = {}
+_clients_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# time when dataset names were fetched and the names
+_dataset_names: Optional[Tuple[float, List[str]]] = None
+
+# times when versions of datasets were fetched and the versions
+_dataset_versions: Dict[str, Tuple[float, int]] = {}
+
+
+async def get_client(service: str) -> Any:
+    """
+    Creating an aiobotocore client (credentials, endpoint resolving,
+    connection pool) takes longer than a simple DynamoDB request,
+    so the clients are created once and kept open between requests
+    (and warm AWS Lambda invocations, see lambda_function.py).
+
+    Clients are bound to the event loop they were created in,
+    new ones are created when called from other loop.
+
+    :param str service: AWS service name, for e.g. "dynamodb" or "s3"
+    :return: aiobotocore client of the service
+    """
+    global _clients_loop
+
+    loop = asyncio.get_event_loop()
+    if loop is not _clients_loop:
+        # the previous loop is closed or not running, its clients
+        # cannot be closed gracefully anymore
+        _clients.clear()
+        _clients_loop = loop
+
+    if service not in _clients:
+        # concurrent requests wait for the same client
+        _clients[service] = asyncio.ensure_future(
+            aiobotocore.get_session().create_client(service).__aenter__()
+        )
+
+    try:
+        return await asyncio.shield(_clients[service])
+    except Exception:
+        # next call will try again
+        _clients.pop(service, None)
+        raise
+
+
+async def close_clients() -> None:
+    """
+    Closes clients created by `get_client()` in the current event loop.
+    """
+    clients = list(_clients.values())
+    _clients.clear()
+
+    for client in clients:
+        if client.done() and client.exception() is None:
+            await client.result().__aexit__(None, None, None)
+
 
 async def dataset_names() -> List[str]:
     """
-    Returns available dataset (collection of texts) names.
+    Returns available dataset (collection of texts) names,
+    cached for `DATASET_NAMES_TTL` seconds.
 
     Each has a folder with files on AWS S3 and 2 tables on AWS DynamoDB,
     one for mapping files to ids and other mapping
-    terms/words to ids of files where they can be found.
+    terms/words to ids of files where they can be found
+    (and a third one with terms of each file, used only when
+    the dataset is processed again).
+
+    With "local" backend each has an index file in `INDEX_DIR` instead.
 
     :return: list of dataset names
     :rtype: List[str]
     """
-    session = aiobotocore.get_session()
+    global _dataset_names
+
+    if (
+        _dataset_names is not None
+        and time.monotonic() - _dataset_names[0] < DATASET_NAMES_TTL
+    ):
+        return _dataset_names[1]
+
+    names: List[str] = []
+
+    if BACKEND == "local":
+        if os.path.isdir(INDEX_DIR):
+            names = [
+                filename[: -len(local_index.EXTENSION)]
+                for filename in os.listdir(INDEX_DIR)
+                if filename.endswith(local_index.EXTENSION)
+            ]
+    else:
+        dynamodb_client = await get_client("dynamodb")
+
+        # list_tables returns at most 100 tables at once
+        async for page in dynamodb_client.get_paginator(
+            "list_tables"
+        ).paginate():
+            names.extend(
+                table_name[: -len("_terms")]
+                for table_name in page["TableNames"]
+                if table_name.endswith("_terms")
+            )
 
-    async with session.create_client("dynamodb") as dynamodb_client:
-        tables = await dynamodb_client.list_tables()
+    _dataset_names = (time.monotonic(), names)
+    return names
 
-    table_names: List[str] = tables["TableNames"]
 
-    return list(
-        map(
-            lambda x: x.rstrip("_terms"),
-            filter(lambda x: x.endswith("_terms"), table_names),
+async def batch_get_items(
+    dynamodb_client: Any,
+    table_name: str,
+    keys: List[Dict[str, Any]],
+    projection: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Fetches items by their keys with BatchGetItem instead of one GetItem
+    (one network round-trip) per key.
+
+    Keys are split to chunks of `BATCH_GET_MAX_KEYS`, which are requested
+    concurrently, at most `BATCH_GET_CONCURRENCY` at a time.
+    DynamoDB may return only a part of the items (when throttled),
+    the rest of the keys is requested again after exponential backoff
+    with jitter.
+
+    :param dynamodb_client: aiobotocore DynamoDB client
+    :param str table_name: table to get the items from
+    :param keys: unique keys of the items, for e.g. [{"id": {"N": "1"}}]
+    :param projection: ProjectionExpression of attributes to get,
+        all attributes by default
+    :return: found items in no particular order, missing ones are skipped
+    :rtype: List[Dict[str, Any]]
+
+    :raises RuntimeError: when some keys remain unprocessed after retries
+    :raises: possibly any exception from aiobotocore.
+    """
+    semaphore = asyncio.Semaphore(BATCH_GET_CONCURRENCY)
+
+    async def get_chunk(chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        items: List[Dict[str, Any]] = []
+        request_items: Dict[str, Any] = {table_name: {"Keys": chunk}}
+        if projection is not None:
+            request_items[table_name]["ProjectionExpression"] = projection
+
+        for attempt in range(BATCH_GET_MAX_RETRIES + 1):
+            if attempt > 0:
+                # "full jitter", so retries of chunks don't hit the table
+                # at the same moment again
+                await asyncio.sleep(
+                    random.uniform(0, BATCH_GET_BACKOFF * 2 ** attempt)
+                )
+
+            async with semaphore:
+                response = await dynamodb_client.batch_get_item(
+                    RequestItems=request_items
+                )
+
+            items.extend(response["Responses"].get(table_name, []))
+            request_items = response.get("UnprocessedKeys") or {}
+
+            if len(request_items) == 0:
+                return items
+
+        raise RuntimeError(
+            f"Cannot get items from {table_name}, "
+            "the table is throttling requests"
+        )
+
+    chunks = await asyncio.gather(
+        *(
+            get_chunk(keys[index : index + BATCH_GET_MAX_KEYS])
+            for index in range(0, len(keys), BATCH_GET_MAX_KEYS)
         )
     )
 
+    return [item for chunk in chunks for item in chunk]
+
+
+def open_local_index(dataset: str) -> local_index.LocalIndex:
+    """
+    Index files are memory-mapped once and kept open between queries,
+    a dataset processed again (file replaced) is opened again.
+
+    :param str dataset: dataset/text collection name
+    :rtype: local_index.LocalIndex
+    """
+    path = local_index.index_path(INDEX_DIR, dataset)
+    modified = os.stat(path).st_mtime_ns
+
+    if dataset in _local_indexes:
+        opened_modified, index = _local_indexes[dataset]
+        if opened_modified == modified:
+            return index
+        index.close()
+
+    index = local_index.LocalIndex(path)
+    _local_indexes[dataset] = (modified, index)
+    return index
+
+
+@functools.lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """
+    Using PorterStemmer.
+    Again - lemmatization or some super-duper thing could be used,
+    but for particular project this is more than enough.
+
+    Popular words are searched again and again, so they're stemmed
+    only once per process.
+    """
+    return _stemmer.stem(word)
+
+
+def stem_words(dataset: str, words: Set[str]) -> Dict[str, str]:
+    """
+    Local index contains stems of all words of the dataset, computed
+    during processing (exactly as the data were stemmed), `stem()`
+    is used for words that are not in the index (not in the dataset)
+    and with DynamoDB backend.
+
+    :param str dataset: dataset/text collection name
+    :param words: words of a query
+    :return: the words with their stems
+    :rtype: Dict[str, str]
+    """
+    stems: Dict[str, str] = {}
+
+    if BACKEND == "local":
+        index = open_local_index(dataset)
+        for word in words:
+            indexed_stem = index.stem(word)
+            if indexed_stem is not None:
+                stems[word] = indexed_stem
+
+    stems.update((word, stem(word)) for word in words - stems.keys())
+    return stems
+
+
+async def fetch_dataset_version(dynamodb_client: Any, dataset: str) -> int:
+    """
+    :param dynamodb_client: aiobotocore DynamoDB client
+    :param str dataset: dataset/text collection name
+    :return: version of the dataset in DynamoDB, bumped every time
+        the dataset is processed, 0 if it was never bumped
+    :rtype: int
+    """
+    response = await dynamodb_client.get_item(
+        TableName=f"{dataset}_terms",
+        Key={"term": {"S": VERSION_TERM}},
+        ProjectionExpression="#version",
+        ExpressionAttributeNames={"#version": "version"},
+    )
+    return int(response.get("Item", {}).get("version", {}).get("N", 0))
+
+
+async def cache_namespace(dataset: str) -> str:
+    """
+    :param str dataset: dataset/text collection name
+    :return: prefix of cache keys of the dataset, a dataset processed
+        again gets new one (with new modification time of local index
+        or new version in DynamoDB), so outdated results are not used
+        (versions in DynamoDB are cached, outdated results are used
+        at most `DATASET_VERSION_TTL` seconds after an update)
+    :rtype: str
+    """
+    if BACKEND == "local":
+        open_local_index(dataset)
+        return f"{dataset}@{_local_indexes[dataset][0]}"
+
+    cached = _dataset_versions.get(dataset)
+    if (
+        cached is not None
+        and time.monotonic() - cached[0] < DATASET_VERSION_TTL
+    ):
+        return f"{dataset}@{cached[1]}"
+
+    version = await fetch_dataset_version(
+        await get_client("dynamodb"), dataset
+    )
+    _dataset_versions[dataset] = (time.monotonic(), version)
+    return f"{dataset}@{version}"
+
+
+async def fetch_terms(
+    dataset: str, namespace: str, terms: Set[str]
+) -> Dict[str, int]:
+    """
+    :param str dataset: dataset/text collection name
+    :param str namespace: prefix of cache keys, see `cache_namespace()`
+    :param terms: stemmed terms
+    :return: bitmaps (see bitmaps.py) of files where the terms can be found,
+        if some term (word) is missing in the dataset, its bitmap is empty
+    :rtype: Dict[str, int]
+
+    Bitmaps of recently searched terms are taken from `TERMS_CACHE`.
+    """
+    fetched_terms: Dict[str, int] = {}
+
+    for term, bitmap in zip(
+        terms,
+        await asyncio.gather(
+            *(TERMS_CACHE.get(f"{namespace}:{term}") for term in terms)
+        ),
+    ):
+        if bitmap is not None:
+            fetched_terms[term] = bitmap
+
+    missing = terms - fetched_terms.keys()
+    fetched_terms.update((term, bitmaps.EMPTY) for term in missing)
+
+    if BACKEND == "local":
+        index = open_local_index(dataset)
+        for term in missing:
+            fetched_terms[term] = bitmaps.from_ids(index.postings(term))
+
+    elif len(missing) != 0:
+        for item in await batch_get_items(
+            await get_client("dynamodb"),
+            f"{dataset}_terms",
+            [{"term": {"S": term}} for term in missing],
+        ):
+            # DynamoDB returns numbers in string format, so we need
+            # first to cast it (the set is missing, when the last file
+            # of the term was just removed)
+            fetched_terms[item["term"]["S"]] = bitmaps.from_ids(
+                map(int, item.get("files", {}).get("NS", []))
+            )
+
+    await asyncio.gather(
+        *(
+            TERMS_CACHE.set(f"{namespace}:{term}", fetched_terms[term])
+            for term in missing
+        )
+    )
+
+    return fetched_terms
+
+
+async def fetch_universe(dataset: str, namespace: str) -> int:
+    """
+    :param str dataset: dataset/text collection name
+    :param str namespace: prefix of cache keys, see `cache_namespace()`
+    :return: bitmap of all files in the dataset
+    :rtype: int
+    """
+    # "*" cannot be a term
+    cache_key = f"{namespace}:*"
+    cached = await TERMS_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # ids of removed files are not reused, so there can be gaps
+    if BACKEND == "local":
+        file_ids = open_local_index(dataset).file_ids()
+    else:
+        dynamodb_client = await get_client("dynamodb")
+        file_ids = []
+
+        # only ids are read, the table is scanned page by page (1 MB each)
+        async for page in dynamodb_client.get_paginator("scan").paginate(
+            TableName=f"{dataset}_files", ProjectionExpression="id"
+        ):
+            file_ids.extend(int(item["id"]["N"]) for item in page["Items"])
+
+    universe = bitmaps.from_ids(file_ids)
+    await TERMS_CACHE.set(cache_key, universe)
+    return universe
+
+
+async def fetch_filenames(dataset: str, file_ids: Iterable[int]) -> List[str]:
+    """
+    :param str dataset: dataset/text collection name
+    :param file_ids: ids of files in the dataset
+    :return: names of the files in no particular order
+    :rtype: List[str]
+    """
+    if BACKEND == "local":
+        index = open_local_index(dataset)
+        return [index.filename(file_id) for file_id in file_ids]
+
+    return [
+        item["filename"]["S"]
+        for item in await batch_get_items(
+            await get_client("dynamodb"),
+            f"{dataset}_files",
+            [{"id": {"N": str(file_id)}} for file_id in file_ids],
+            projection="filename",
+        )
+    ]
+
+
+def expression_key(
+    node: pyeda.boolalg.expr.Expression, stem: Callable[[str], str]
+) -> str:
+    """
+    Canonical form of an expression (in Negation Normal Form),
+    the same for the same subexpressions regardless of the order
+    of operands of AND and OR or word forms of the terms,
+    for e.g. "(cats | dog)" and "(dogs | cat)".
+
+    :param node: an expression with literals, AND, OR and constants only
+    :param stem: stemmer of the terms
+    :rtype: str
+    """
+    if isinstance(node, pyeda.boolalg.expr.Complement):
+        return "~" + stem(str(~node))
+
+    if isinstance(node, pyeda.boolalg.expr.Variable):
+        return stem(str(node))
+
+    if isinstance(node, (pyeda.boolalg.expr.AndOp, pyeda.boolalg.expr.OrOp)):
+        operator = "&" if isinstance(node, pyeda.boolalg.expr.AndOp) else "|"
+        operands = {expression_key(operand, stem) for operand in node.xs}
+        return f"{operator}({','.join(sorted(operands))})"
+
+    # constants
+    return str(node)
+
+
+def needs_universe(node: pyeda.boolalg.expr.Expression) -> bool:
+    """
+    :param node: an expression in Negation Normal Form
+    :return: whether evaluation of the expression needs bitmap of all files
+        (NOT that is not a part of AND with some not negated operand)
+    :rtype: bool
+    """
+    if node is pyeda.boolalg.expr.One or isinstance(
+        node, pyeda.boolalg.expr.Complement
+    ):
+        return True
+
+    if isinstance(node, pyeda.boolalg.expr.AndOp):
+        positive = [
+            x
+            for x in node.xs
+            if not isinstance(x, pyeda.boolalg.expr.Complement)
+        ]
+        return len(positive) == 0 or any(map(needs_universe, positive))
+
+    if isinstance(node, pyeda.boolalg.expr.OrOp):
+        return any(map(needs_universe, node.xs))
+
+    return False
+
+
+def evaluate_expression(
+    node: pyeda.boolalg.expr.Expression,
+    fetched_terms: Dict[str, int],
+    stem: Callable[[str], str],
+    universe: int,
+    evaluated: Dict[str, int],
+) -> int:
+    """
+    Evaluates an expression tree over posting lists bitmaps
+    (see bitmaps.py), without converting it to DNF first, which can grow
+    exponentially for ORs nested inside ANDs.
+
+    Operands of AND are intersected from the smallest posting list
+    and the evaluation stops as soon as the result is empty, so not yet
+    evaluated subexpressions are skipped. Negated terms within AND
+    are substracted from the result of the others (for e.g.
+    "and not cats"), other NOTs are difference against `universe`.
+    Results of subexpressions are kept in `evaluated`, so the same
+    subexpression repeated in the query is evaluated only once.
+
+    :param node: an expression in Negation Normal Form
+    :param fetched_terms: bitmaps of stemmed terms
+    :param stem: stemmer of the words of the query
+    :param universe: bitmap of all files in the dataset
+    :param evaluated: results of already evaluated subexpressions
+    :return: bitmap of files satisfying the expression
+    :rtype: int
+    """
+    key = expression_key(node, stem)
+    if key in evaluated:
+        return evaluated[key]
+
+    def evaluate(operand: pyeda.boolalg.expr.Expression) -> int:
+        return evaluate_expression(
+            operand, fetched_terms, stem, universe, evaluated
+        )
+
+    result: int
+    if isinstance(node, pyeda.boolalg.expr.Variable):
+        result = fetched_terms[stem(str(node))]
+
+    elif isinstance(node, pyeda.boolalg.expr.Complement):
+        result = universe & ~fetched_terms[stem(str(~node))]
+
+    elif isinstance(node, pyeda.boolalg.expr.AndOp):
+        terms: List[int] = []
+        subexpressions: List[pyeda.boolalg.expr.Expression] = []
+        negative: List[int] = []
+
+        for operand in node.xs:
+            if isinstance(operand, pyeda.boolalg.expr.Variable):
+                terms.append(evaluate(operand))
+            elif isinstance(operand, pyeda.boolalg.expr.Complement):
+                negative.append(fetched_terms[stem(str(~operand))])
+            else:
+                subexpressions.append(operand)
+
+        # posting lists of terms are already fetched, so they go first
+        # (smallest first), subexpressions are evaluated only if needed
+        terms.sort(key=bitmaps.count)
+        if len(terms) != 0:
+            result = terms.pop(0)
+        elif len(subexpressions) != 0:
+            result = evaluate(subexpressions.pop(0))
+        else:
+            result = universe
+
+        for bitmap in terms:
+            if result == bitmaps.EMPTY:
+                break
+            result &= bitmap
+
+        for subexpression in subexpressions:
+            if result == bitmaps.EMPTY:
+                break
+            result &= evaluate(subexpression)
+
+        for bitmap in negative:
+            if result == bitmaps.EMPTY:
+                break
+            result &= ~bitmap
+
+    elif isinstance(node, pyeda.boolalg.expr.OrOp):
+        result = bitmaps.EMPTY
+        for operand in node.xs:
+            result |= evaluate(operand)
+
+    elif node is pyeda.boolalg.expr.One:
+        result = universe
+
+    else:
+        result = bitmaps.EMPTY
+
+    evaluated[key] = result
+    return result
+
+
+async def evaluate_query(
+    dataset: str,
+    namespace: str,
+    nnf: pyeda.boolalg.expr.Expression,
+    stem: Callable[[str], str],
+) -> List[str]:
+    """
+    :param str dataset: dataset/text collection name
+    :param str namespace: prefix of cache keys, see `cache_namespace()`
+    :param nnf: parsed query in Negation Normal Form
+    :param stem: stemmer of the words of the query
+    :return: sorted names of files satisfying the query
+    :rtype: List[str]
+    """
+    # first fetch all unique terms from the DynamoDB NoSQL database
+    # (or local index) so then set operations can be done without
+    # data fetching and using already prepared data
+    terms = set(map(stem, set(map(str, nnf.inputs))))
+
+    # if some term (word) is missing in the database, the whole
+    # result can be empty set
+    # (if the term was in the global AND chain for example)
+    if needs_universe(nnf):
+        fetched_terms, universe = await asyncio.gather(
+            fetch_terms(dataset, namespace, terms),
+            fetch_universe(dataset, namespace),
+        )
+    else:
+        fetched_terms = await fetch_terms(dataset, namespace, terms)
+        universe = bitmaps.EMPTY
+
+    # Bitmap of file ids (for response), than to be changed to their real
+    # names.
+    file_ids = evaluate_expression(nnf, fetched_terms, stem, universe, {})
+
+    # set names of files, the list was created in no particular order
+    return sorted(await fetch_filenames(dataset, bitmaps.to_ids(file_ids)))
+
 
 async def process_query(
     dataset: str, query: str
@@ -54,8 +690,9 @@ async def process_query(
 
     Gets dataset name and boolean query (in string format).
     Checks if dataset exists (there should be 2 tables for each in
-    the database and preferably raw texts uploaded to AWS S3 bucket),
-    then parses the query with `pyeda` boolean expression parser.
+    the database and preferably raw texts uploaded to AWS S3 bucket,
+    or an index file with "local" backend), then parses the query
+    with `pyeda` boolean expression parser.
     Raises ValueError if query cannot be parsed or continues otherwise.
 
     :param str dataset: dataset/text collection name
@@ -104,108 +741,31 @@ async def process_query(
         logging.exception(error)
         raise ValueError("Cannot parse the query")
 
-    # Using PorterStemmer.
-    # Again - lemmatization or some super-duper thing could be used,
-    # but for particular project this is more than enough.
-    # Moreover, query parts should be processed the same way
-    # as data were preprocessed.
-    stemmer = nltk.stem.PorterStemmer()
-
-    # Disjunctive Normal Form
-    dnf = expr.to_dnf()
-
-    logging.info("DNF: %s", dnf)
+    # Negation Normal Form (NOTs only on terms) with only ANDs and ORs,
+    # unlike DNF it doesn't grow exponentially with ORs nested in ANDs
+    nnf = expr.to_nnf()
 
-    # AWS session
-    session = aiobotocore.get_session()
+    logging.info("NNF: %s", nnf)
 
-    # first fetch all unique terms from the DynamoDB NoSQL database
-    # so then set operations can be done without data fetching and
-    # using already prepared data
-    fetched_terms: Dict[str, Set[int]] = {}
-
-    async with session.create_client("dynamodb") as dynamodb_client:
-
-        for term in map(stemmer.stem, set(map(str, dnf.inputs))):
-            item = await dynamodb_client.get_item(
-                TableName=f"{dataset}_terms", Key={"term": {"S": term}}
-            )
-
-            try:
-                # DynamoDB returns numbers in string format, so we need
-                # first to cast it
-                fetched_terms[term] = set(
-                    map(int, item["Item"]["files"]["NS"])
-                )
-            except KeyError:
-                # if some term (word) is missing in the database, the whole
-                # result can be empty set
-                # (if the term was in the global AND chain for example)
-                fetched_terms[term] = set()
-
-    # Set of file ids (for response), than to be changed to their real names.
-    # The appropriate data structure is of course the set, so we can
-    # perform standard logical operations with it.
-    file_ids: Set[int] = set()
-
-    # Iterate over the list of dists, where terms are keys and values are
-    # either 0s or 1s (satisfiability for DNF). Each element of the list
-    # is a clause in the OR chain, so in order to return at least some
-    # result, there should be one `evaluation` dict with terms that
-    # are presented in the table (therefore in text as well) and evaluation
-    # should produce not empty set.
-    for evaluation in dnf.satisfy_all():
-
-        # Create temporary set for multiple ANDs.
-        # `evaluation` dict with 0s and 1s will be sorted, so firstly
-        # 1s will be added to temp set (with intersection) and then 0s
-        # will be substracted from the set.
-        #
-        # After each `evaluation` pair `temp` set will be added to
-        # `file_ids` set (OR of multiple clauses in DNF).
-        temp: Set[int] = set()
-
-        for symbol, value in reversed(
-            sorted(evaluation.items(), key=lambda item: item[1])
-        ):
+    # query parts should be processed the same way as data were
+    # preprocessed, each word is stemmed only once
+    stems = stem_words(dataset, set(map(str, nnf.inputs)))
 
-            contents = fetched_terms[stemmer.stem(str(symbol))]
+    # equivalent queries (after stemming and simplification)
+    # have the same result, the namespace is looked up once per query
+    namespace = await cache_namespace(dataset)
+    result_key = f"{namespace}:{expression_key(nnf, stems.__getitem__)}"
+    filenames = await RESULTS_CACHE.get(result_key)
 
-            # there is no such term in the table
-            # (therefore in collection as well), so there is no sense to
-            # do ANDs (intersection with update) for `temp` set
-            if len(contents) == 0:
-                break
-
-            # adding to `temp` set
-            if value == 1:
-                if len(temp) != 0:
-                    temp.intersection_update(contents)
-                else:
-                    temp = contents
-            # substracting from `temp` set (for e.g. "and not cats")
-            else:
-                temp -= contents
-
-        # adding it as OR
-        file_ids.update(temp)
-
-    # set names of files
-    response: List[str] = []
-
-    async with session.create_client("dynamodb") as dynamodb_client:
-        for file_id in file_ids:
-            file_item = await dynamodb_client.get_item(
-                TableName=f"{dataset}_files", Key={"id": {"N": str(file_id)}}
-            )
-
-            response.append(file_item["Item"]["filename"]["S"])
+    if filenames is None:
+        filenames = await evaluate_query(
+            dataset, namespace, nnf, stems.__getitem__
+        )
+        await RESULTS_CACHE.set(result_key, filenames)
 
     return {
-        # the set was not sorted,
-        # and the list was created after not sorted set iteration
-        "data": sorted(response),
-        "query": str(dnf),
+        "data": filenames,
+        "query": str(nnf),
         "time": time.time() - begin,
     }
 
@@ -221,6 +781,7 @@ async def publish_file_for_5_minutes_and_return_url(
     The thing is files are located on a private S3 bucket, so there is a need
     to expose them/make them public for some short time. So particular function
     makes files (of datasets) public for a 5 minutes on a request.
+    The same URL is returned (from `URLS_CACHE`) for 4 of these minutes.
 
     :param str dataset: the name of dataset / text collection (as it on S3)
     :param str filename: the name of file in the collection
@@ -230,18 +791,19 @@ async def publish_file_for_5_minutes_and_return_url(
     :raises: possibly some aiobotocore exception. Code that calls this function
       does exceptions handling.
     """
-    session = aiobotocore.get_session()
+    cache_key = f"{dataset}/{filename}"
+    cached = await URLS_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    s3_client = await get_client("s3")
 
     # create shareable url to download the file (valid for 300 seconds)
-    async with session.create_client("s3") as s3_client:
-
-        url: str = await s3_client.generate_presigned_url(
-            "get_object",
-            Params={
-                "Bucket": S3_BUCKET,
-                "Key": f"static/{dataset}/{filename}",
-            },
-            ExpiresIn=300,  # seconds
-        )
+    url: str = await s3_client.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": S3_BUCKET, "Key": f"static/{dataset}/{filename}"},
+        ExpiresIn=300,  # seconds
+    )
 
-        return url
+    await URLS_CACHE.set(cache_key, url)
+    return url
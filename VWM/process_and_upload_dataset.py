@@ -1,18 +1,41 @@
 #!/bin/env python3
 """
 Helper for processing and uploading dataset (text collection).
+
+With --index-dir the dataset is only processed to a local index file
+(for "local" backend of the Boolean model), nothing is uploaded.
+
+With --incremental only files added or changed (by modification time
+and hash of contents) since the last processing are indexed, removed
+files are removed from the index. Files keep their ids.
 """
-from typing import Set, Tuple, List, Dict, Any
+from typing import (
+    Set,
+    Tuple,
+    List,
+    Dict,
+    Any,
+    Awaitable,
+    Callable,
+    Iterable,
+    NamedTuple,
+    Optional,
+)
 
 import argparse
 import asyncio
 import collections
+import functools
+import hashlib
 import itertools
 import json
+import multiprocessing
 import os
+import random
 import re
 import sys
 import time
+import zlib
 
 import aiobotocore
 import aiofiles
@@ -20,6 +43,49 @@ import nltk
 import textract
 import tqdm
 
+import local_index
+import logic
+
+# re looks like the fastest word tokenizer comparing to nltk,
+# spacy or whatever other options
+WORD_REGEX = re.compile(r"\b[^\d\W]+\b")
+
+# how many files a worker process indexes in one task
+FILES_PER_TASK = 32
+
+# DynamoDB BatchWriteItem accepts at most 25 items per request
+BATCH_WRITE_MAX_ITEMS = 25
+# max number of BatchWriteItem requests in flight
+BATCH_WRITE_CONCURRENCY = 16
+# how many times unprocessed items (throttling) are written again,
+# when none of them could be written
+BATCH_WRITE_MAX_RETRIES = 10
+# backoff (in seconds) before the first retry, doubled with each next one
+BATCH_WRITE_BACKOFF = 0.1
+
+# how many items of indexed files are collected before they are written
+FILE_ITEMS_PER_WRITE = BATCH_WRITE_MAX_ITEMS * BATCH_WRITE_CONCURRENCY
+
+# how many files are uploaded to S3 at the same time
+S3_UPLOAD_CONCURRENCY = 8
+# bigger files are uploaded in parts of this size (5 MB at least)
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+# files are hashed in chunks of this size
+HASH_CHUNK_SIZE = 1024 * 1024
+# DynamoDB items are at most 400 KB, terms of a file compressed to more
+# are not stored (posting lists are scanned for the file instead)
+MAX_FILE_TERMS_SIZE = 350 * 1024
+
+# state of an indexing worker process, see init_worker() and stem()
+_stopwords: Set[str] = set()
+# we're fine with PorterStemmer, could be done with lemmatization,
+# but doesn't matter much in particular project
+_stemmer = nltk.stem.PorterStemmer()
+_stems: Dict[str, str] = {}
+# stems computed since the last task of the worker was finished
+_new_stems: Dict[str, str] = {}
+
 
 async def ensure_unique_names_and_create_db_and_bucket(
     session: aiobotocore.session.AioSession, dataset_name: str, s3_bucket: str
@@ -27,8 +93,9 @@ async def ensure_unique_names_and_create_db_and_bucket(
     """
     Gets AWS session and dataset_name. Checks if there are not
     already tables in DynamoDB with same names and bucket contents
-    in S3. If they're not - creates 2 tables (one for filenames->ids map
-    and second for terms->filenames map).
+    in S3. If they're not - creates 3 tables (one for filenames->ids map,
+    second for terms->filenames map and third for terms of each file,
+    see `create_file_terms_table()`).
     """
 
     async with session.create_client("s3") as s3_client:
@@ -43,18 +110,19 @@ async def ensure_unique_names_and_create_db_and_bucket(
 
     files_table = f"{dataset_name}_files"
     terms_table = f"{dataset_name}_terms"
+    file_terms_table = f"{dataset_name}_terms_by_file"
 
     async with session.create_client("dynamodb") as dynamodb_client:
         all_tables = await dynamodb_client.list_tables()
 
         if any(
             name in all_tables["TableNames"]
-            for name in (files_table, terms_table)
+            for name in (files_table, terms_table, file_terms_table)
         ):
             print(
-                f"Either {files_table} or {terms_table} table exists "
-                "in DynamoDB. Rename your dataset folder, if you want "
-                "to process and upload it",
+                f"Either {files_table}, {terms_table} or {file_terms_table} "
+                "table exists in DynamoDB. Rename your dataset folder, "
+                "if you want to process and upload it",
                 file=sys.stderr,
             )
             return False
@@ -94,6 +162,9 @@ async def ensure_unique_names_and_create_db_and_bucket(
             print(f"Table {terms_table} creation did not succeed. Aborting")
             return False
 
+        if not await create_file_terms_table(dynamodb_client, dataset_name):
+            return False
+
         waiter = dynamodb_client.get_waiter("table_exists")
         await waiter.wait(TableName=files_table)
         await waiter.wait(TableName=terms_table)
@@ -101,53 +172,368 @@ async def ensure_unique_names_and_create_db_and_bucket(
     return True
 
 
+async def create_file_terms_table(
+    dynamodb_client: Any, dataset_name: str
+) -> bool:
+    """
+    Creates table for terms found in each file (keys are file ids,
+    values are compressed terms). It's read only when the dataset
+    is processed again, items of the files table read by queries
+    hold only filenames and metadata.
+    """
+    # not ending with "_terms", tables with such names are terms
+    # of datasets (see `logic.dataset_names()`)
+    table_name = f"{dataset_name}_terms_by_file"
+
+    table = await dynamodb_client.create_table(
+        TableName=table_name,
+        KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "N"}],
+        ProvisionedThroughput={
+            "ReadCapacityUnits": 30,
+            "WriteCapacityUnits": 30,
+        },
+    )
+
+    if table["ResponseMetadata"]["HTTPStatusCode"] != 200:
+        print(f"Table {table_name} creation did not succeed. Aborting")
+        return False
+
+    await dynamodb_client.get_waiter("table_exists").wait(TableName=table_name)
+    return True
+
+
+class ProcessedDataset(NamedTuple):
+    """
+    Result of `process_dataset()`
+    """
+
+    # filenames and their ids
+    file_ids: Dict[str, int]
+    # terms with sets of ids of files where they can be found
+    terms: Dict[str, Set[int]]
+    # indexed words with their stems (terms), so queries can be stemmed
+    # the same way
+    stems: Dict[str, str]
+    # indexed files by their ids with "filename", "mtime", "size"
+    # and "sha256"
+    files: Dict[int, Dict[str, Any]]
+
+
+def init_worker(stopwords_set: Set[str]) -> None:
+    """
+    Initializer of indexing worker processes, stopwords are sent
+    to each worker only once (not with every task).
+    """
+    global _stopwords
+
+    _stopwords = stopwords_set
+
+
+def stem(word: str) -> str:
+    """
+    Stemming is the slowest part of indexing and the same words
+    are in most of the files, so each word is stemmed once per worker.
+    """
+    if word not in _stems:
+        _stems[word] = _new_stems[word] = _stemmer.stem(word)
+
+    return _stems[word]
+
+
+def file_metadata(path: str) -> Dict[str, Any]:
+    """
+    :return: "mtime" (in nanoseconds), "size" and "sha256" of contents
+        of the file, so changed files can be found when the dataset
+        is processed again
+    """
+    stat = os.stat(path)
+    sha256 = hashlib.sha256()
+
+    with open(path, "rb") as f_in:
+        for chunk in iter(lambda: f_in.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+
+    return {
+        "mtime": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": sha256.hexdigest(),
+    }
+
+
+def index_files(
+    dataset_dir: str, files: List[Tuple[str, int]]
+) -> Tuple[Dict[int, Dict[str, Any]], Dict[str, str]]:
+    """
+    Map step of indexing, run in worker processes.
+
+    Contents of only one file are in memory at a time.
+
+    :param str dataset_dir: directory with the files
+    :param files: filenames and their ids
+    :return: indexed files by their ids (with "filename", metadata
+        and "terms" found in the file) and words stemmed by the worker
+        for the first time
+    """
+    indexed: Dict[int, Dict[str, Any]] = {}
+
+    for file_, file_id in files:
+        path = os.path.join(dataset_dir, file_)
+        # before reading, so the file is indexed again next time
+        # if it changes in the meantime
+        indexed[file_id] = {"filename": file_, **file_metadata(path)}
+
+        # using textract,
+        # because there could be binary files with some text (pdf, docx etc)
+        file_contents = textract.process(path)
+
+        words = set(WORD_REGEX.findall(file_contents.decode().lower()))
+
+        indexed[file_id]["terms"] = set(map(stem, words - _stopwords))
+
+    new_stems = dict(_new_stems)
+    _new_stems.clear()
+
+    return indexed, new_stems
+
+
 def process_dataset(
-    dataset_dir: str, stopwords_set: Set[str]
-) -> Tuple[Dict[str, int], Dict[str, Set[int]]]:
+    dataset_dir: str,
+    stopwords_set: Set[str],
+    workers: Optional[int] = None,
+    file_ids: Optional[Dict[str, int]] = None,
+    on_indexed: Optional[Callable[[Dict[int, Dict[str, Any]]], None]] = None,
+) -> ProcessedDataset:
+    """
+    Files are indexed in chunks by a pool of worker processes (map)
+    and their partial indexes are merged as they come (reduce).
 
-    # generator from 0 to inf
-    id_generator = iter(itertools.count())
+    Terms found in each file are kept only until its chunk is merged.
 
-    # call listdir only once
-    files = os.listdir(dataset_dir)
+    :param str dataset_dir: directory with the files
+    :param stopwords_set: words not to index
+    :param workers: number of worker processes, all CPUs by default
+    :param file_ids: files to index with their ids, all files
+        of the dataset by default
+    :param on_indexed: called with each chunk of indexed files
+        (as returned by `index_files()`, with their terms)
+        before it is merged
+    """
+
+    if file_ids is None:
+        # generator from 0 to inf
+        id_generator = iter(itertools.count())
 
-    # first table/dictionary with filenames and ids, next table (terms)
-    # will represent map with terms as keys and sets of ids as values
-    file_ids = {file_: next(id_generator) for file_ in files}
+        # first table/dictionary with filenames and ids, next table (terms)
+        # will represent map with terms as keys and sets of ids as values
+        file_ids = {
+            file_: next(id_generator) for file_ in os.listdir(dataset_dir)
+        }
 
     # each term (stemmed word) with set of file ids (instead of filenames
     # in order to save space)
-    terms = collections.defaultdict(set)
-
-    # we're fine with PorterStemmer, could be done with lemmatization,
-    # but doesn't matter much in particular project
-    stemmer = nltk.stem.PorterStemmer()
+    terms: Dict[str, Set[int]] = collections.defaultdict(set)
+    stems: Dict[str, str] = {}
+    files: Dict[int, Dict[str, Any]] = {}
 
     # just measuring time for user
     processing_start = time.time()
 
-    for file_ in tqdm.tqdm(files):
-        # using textract,
-        # because there could be binary files with some text (pdf, docx etc)
-        file_contents = textract.process(os.path.join(dataset_dir, file_))
-
-        for word in (
-            set(
-                # re looks like the fastest word tokenizer comparing to nltk,
-                # spacy or whatever other options
-                re.compile(r"\b[^\d\W]+\b").findall(
-                    file_contents.decode().lower()
-                )
-            )
-            - stopwords_set
+    items = list(file_ids.items())
+    chunks = [
+        items[index : index + FILES_PER_TASK]
+        for index in range(0, len(items), FILES_PER_TASK)
+    ]
+
+    # new processes are spawned instead of forked, as the indexing runs
+    # next to threads of the uploads (forked locks held by them would
+    # stay locked in the workers)
+    with multiprocessing.get_context("spawn").Pool(
+        workers, initializer=init_worker, initargs=(stopwords_set,)
+    ) as pool, tqdm.tqdm(total=len(items)) as progress:
+
+        for indexed, new_stems in pool.imap_unordered(
+            functools.partial(index_files, dataset_dir), chunks
         ):
+            if on_indexed is not None:
+                on_indexed(indexed)
+
             # if term existed, file id will be added to set, otherwise
-            # new key will be created first and then file id will be added
-            # to the empty set
-            terms[stemmer.stem(word)].add(file_ids[file_])
+            # new key will be created first and then file id will be
+            # added to the empty set
+            for file_id, file_ in indexed.items():
+                for term in file_.pop("terms"):
+                    terms[term].add(file_id)
+
+            files.update(indexed)
+            stems.update(new_stems)
+            progress.update(len(indexed))
 
     print("Processing time:", time.time() - processing_start)
-    return file_ids, terms
+    return ProcessedDataset(file_ids, terms, stems, files)
+
+
+def diff_dataset(
+    dataset_dir: str, known: Dict[str, Dict[str, Any]]
+) -> Tuple[Dict[str, int], Dict[str, Dict[str, Any]], Dict[str, int]]:
+    """
+    Compares files of a dataset with the files it was processed from.
+    Contents of a file are hashed only when its modification time
+    or size changed.
+
+    Files keep their ids, new ones get ids after the highest known one,
+    so ids of removed files are not reused.
+
+    :param str dataset_dir: directory with the files
+    :param known: processed files with their metadata (and "id")
+    :return: new and changed files to index with their ids,
+        files touched without change (with new metadata)
+        and removed files with their ids
+    """
+    to_index: Dict[str, int] = {}
+    touched: Dict[str, Dict[str, Any]] = {}
+
+    next_id = max((file_["id"] for file_ in known.values()), default=-1) + 1
+    files = os.listdir(dataset_dir)
+
+    for file_ in files:
+        if file_ not in known:
+            to_index[file_] = next_id
+            next_id += 1
+            continue
+
+        path = os.path.join(dataset_dir, file_)
+        stat = os.stat(path)
+
+        if (
+            known[file_].get("mtime") == stat.st_mtime_ns
+            and known[file_].get("size") == stat.st_size
+        ):
+            continue
+
+        metadata = file_metadata(path)
+        if known[file_].get("sha256") == metadata["sha256"]:
+            touched[file_] = {**known[file_], **metadata}
+        else:
+            to_index[file_] = known[file_]["id"]
+
+    removed = {
+        file_: known[file_]["id"] for file_ in known.keys() - set(files)
+    }
+
+    return to_index, touched, removed
+
+
+def write_local_index(
+    index_dir: str,
+    dataset_dir: str,
+    dataset_name: str,
+    stopwords_set: Set[str],
+    workers: Optional[int],
+    incremental: bool,
+) -> None:
+    """
+    Processes the dataset to a local index file. When `incremental`,
+    only files added or changed since the last processing are indexed
+    and the rest is taken from the existing index.
+    """
+    path = local_index.index_path(index_dir, dataset_name)
+    manifest_path = local_index.manifest_path(index_dir, dataset_name)
+
+    known: Dict[str, Dict[str, Any]] = {}
+    if incremental:
+        # all files are indexed again, if the index was written
+        # without its manifest
+        known = local_index.read_manifest(manifest_path, path)
+
+    to_index, touched, removed = diff_dataset(dataset_dir, known)
+    print(
+        f"Files to index: {len(to_index)}, touched: {len(touched)}, "
+        f"removed: {len(removed)}"
+    )
+
+    dataset = process_dataset(dataset_dir, stopwords_set, workers, to_index)
+    stems = dataset.stems
+
+    if len(known) != 0:
+        # files indexed again or removed
+        stale_ids = {
+            known[file_]["id"] for file_ in to_index if file_ in known
+        } | set(removed.values())
+
+        index = local_index.LocalIndex(path)
+
+        for term, postings in index.all_postings():
+            file_ids = set(postings) - stale_ids
+            if len(file_ids) != 0:
+                dataset.terms[term].update(file_ids)
+
+        # stems of words which are not in the dataset anymore
+        # are kept, they don't match any file
+        stems = {**dict(index.all_stems()), **stems}
+        index.close()
+
+    files = {
+        file_: metadata
+        for file_, metadata in known.items()
+        if file_ not in removed
+    }
+    files.update(touched)
+    files.update(
+        (file_["filename"], manifest_entry(file_id, file_))
+        for file_id, file_ in dataset.files.items()
+    )
+
+    sha256 = local_index.write_index(
+        path,
+        {file_: metadata["id"] for file_, metadata in files.items()},
+        dataset.terms,
+        stems,
+    )
+    local_index.write_manifest(manifest_path, files, sha256)
+
+    print("Index written to", path)
+
+
+def manifest_entry(file_id: int, file_: Dict[str, Any]) -> Dict[str, Any]:
+    """:return: id and metadata of an indexed file"""
+    return {
+        "id": file_id,
+        "mtime": file_["mtime"],
+        "size": file_["size"],
+        "sha256": file_["sha256"],
+    }
+
+
+class AdaptiveLimit:
+    """
+    Limit of concurrent requests adapting to throughput of a table
+    (AIMD, as TCP congestion control): halved when requests are throttled,
+    increased by about one per round of successful requests,
+    up to `maximum`.
+    """
+
+    def __init__(self, maximum: int) -> None:
+        self.maximum = maximum
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def __aexit__(self, *_: Any) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def throttled(self) -> None:
+        self.limit = max(1.0, self.limit / 2)
+
+    def succeeded(self) -> None:
+        self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
 
 
 async def batch_write_to_dynamo(
@@ -155,64 +541,250 @@ async def batch_write_to_dynamo(
     table_name: str,
     data: List[Dict[str, Any]],
 ) -> None:
+    """
+    Writes items with concurrent BatchWriteItem requests
+    (`BATCH_WRITE_MAX_ITEMS` items each). Items not written because
+    of throttling are written again after exponential backoff with jitter
+    and the number of concurrent requests is lowered.
+
+    :raises RuntimeError: when no more items of a batch can be written
+        after `BATCH_WRITE_MAX_RETRIES` retries
+    """
+    limit = AdaptiveLimit(BATCH_WRITE_CONCURRENCY)
 
-    # NOTE: a snippet below is slightly modified, but taken from
-    # https://aiobotocore.readthedocs.io/en/latest/examples.html
     async with session.create_client("dynamodb") as dynamodb_client:
+        progress = tqdm.tqdm(total=len(data))
+        throttling_error = (
+            dynamodb_client.exceptions.ProvisionedThroughputExceededException
+        )
 
-        for slice_index in tqdm.tqdm(range(0, len(data), 25)):
+        async def write_batch(batch: List[Dict[str, Any]]) -> None:
+            request_items = {table_name: batch}
+            # retries since some of the items were written last time
+            attempt = 0
 
-            response = await dynamodb_client.batch_write_item(
-                RequestItems={table_name: data[slice_index : slice_index + 25]}
-            )
+            while True:
+                if attempt > BATCH_WRITE_MAX_RETRIES:
+                    raise RuntimeError(
+                        f"Cannot write items to {table_name}, "
+                        "the table is throttling requests"
+                    )
 
-            if len(response["UnprocessedItems"]) != 0:
+                if attempt > 0:
+                    # "full jitter", so retried batches don't hit the table
+                    # at the same moment again
+                    await asyncio.sleep(
+                        random.uniform(0, BATCH_WRITE_BACKOFF * 2 ** attempt)
+                    )
 
-                # Hit the provisioned write limit
-                await asyncio.sleep(3)
+                try:
+                    async with limit:
+                        response = await dynamodb_client.batch_write_item(
+                            RequestItems=request_items
+                        )
+                except throttling_error:
+                    # none of the items was written
+                    limit.throttled()
+                    attempt += 1
+                    continue
+
+                unprocessed = response.get("UnprocessedItems") or {}
+                written = len(request_items[table_name]) - len(
+                    unprocessed.get(table_name, [])
+                )
+                progress.update(written)
+
+                if len(unprocessed) == 0:
+                    limit.succeeded()
+                    return
 
-                # Items left over that haven't been inserted
-                unprocessed_items = response["UnprocessedItems"]
+                # Hit the provisioned write limit
+                limit.throttled()
+                request_items = unprocessed
+                attempt = 1 if written > 0 else attempt + 1
 
-                print("Resubmitting items")
-                # Loop until unprocessed items are written
-                while len(unprocessed_items) > 0:
-                    response = await dynamodb_client.batch_write_item(
-                        RequestItems=unprocessed_items
+        try:
+            await asyncio.gather(
+                *(
+                    write_batch(
+                        data[slice_index : slice_index + BATCH_WRITE_MAX_ITEMS]
                     )
-                    # If any items are still left over, add them to the
-                    # list to be written
-                    unprocessed_items = response["UnprocessedItems"]
+                    for slice_index in range(
+                        0, len(data), BATCH_WRITE_MAX_ITEMS
+                    )
+                )
+            )
+        finally:
+            progress.close()
+
+
+def file_item(
+    file_id: int, file_: Dict[str, Any], version: int
+) -> Dict[str, Any]:
+    """
+    :param version: version of the dataset the file is indexed for,
+        the item is valid only once the dataset has this version
+        (see `fetch_known_files()`)
+    :return: DynamoDB item of an indexed file with its metadata
+    """
+    return {
+        "id": {"N": str(file_id)},
+        "filename": {"S": file_["filename"]},
+        "mtime": {"N": str(file_["mtime"])},
+        "size": {"N": str(file_["size"])},
+        "sha256": {"S": file_["sha256"]},
+        "version": {"N": str(version)},
+    }
+
 
-                    # If there are items left over, we could do with
-                    # sleeping some more
-                    if len(unprocessed_items) > 0:
-                        print("Backing off for 5 seconds")
-                        await asyncio.sleep(5)
+def file_terms_item(
+    file_id: int, terms: Set[str], version: int
+) -> Dict[str, Any]:
+    """
+    :param version: see `file_item()`
+    :return: DynamoDB item of terms found in an indexed file (compressed),
+        so the posting lists can be updated when the file changes,
+        without the terms if they don't fit in an item
+    """
+    item = {"id": {"N": str(file_id)}, "version": {"N": str(version)}}
 
+    compressed = zlib.compress("\n".join(sorted(terms)).encode())
+    if len(compressed) <= MAX_FILE_TERMS_SIZE:
+        item["terms"] = {"B": compressed}
 
-async def upload_dataset_to_dynamodb(
+    return item
+
+
+async def write_file_items(
     session: aiobotocore.session.AioSession,
     dataset_name: str,
-    file_ids: Dict[str, int],
-    terms: Dict[str, Set[int]],
+    queue: "asyncio.Queue[Optional[Tuple[List[Any], List[Any]]]]",
 ) -> None:
+    """
+    Writes items of files and of their terms put to the queue
+    (`FILE_ITEMS_PER_WRITE` files at a time), until None is put.
+    """
+    file_items: List[Dict[str, Any]] = []
+    file_terms_items: List[Dict[str, Any]] = []
 
-    await batch_write_to_dynamo(
-        session,
-        f"{dataset_name}_files",
-        [
+    while True:
+        chunk = await queue.get()
+        if chunk is not None:
+            file_items.extend(chunk[0])
+            file_terms_items.extend(chunk[1])
+
+        if len(file_items) >= FILE_ITEMS_PER_WRITE or (
+            chunk is None and len(file_items) != 0
+        ):
+            await asyncio.gather(
+                batch_write_to_dynamo(
+                    session, f"{dataset_name}_files", file_items
+                ),
+                batch_write_to_dynamo(
+                    session, f"{dataset_name}_terms_by_file", file_terms_items
+                ),
+            )
+            file_items = []
+            file_terms_items = []
+
+        if chunk is None:
+            return
+
+
+async def index_and_write_files(
+    session: aiobotocore.session.AioSession,
+    dataset_dir: str,
+    dataset_name: str,
+    stopwords_set: Set[str],
+    workers: Optional[int],
+    file_ids: Optional[Dict[str, int]],
+    version: int,
+) -> ProcessedDataset:
+    """
+    Indexes the files (see `process_dataset()`) and writes their items
+    to DynamoDB while they are indexed, so terms of all the files
+    are never in memory at once.
+
+    :param version: version the dataset will have once its posting lists
+        are updated, see `file_item()`
+    """
+    loop = asyncio.get_event_loop()
+    queue: "asyncio.Queue[Optional[Tuple[List[Any], List[Any]]]]" = (
+        asyncio.Queue()
+    )
+
+    def on_indexed(indexed: Dict[int, Dict[str, Any]]) -> None:
+        # called in the thread running process_dataset(), before
+        # the terms are dropped
+        file_items = [
+            {"PutRequest": {"Item": file_item(file_id, file_, version)}}
+            for file_id, file_ in indexed.items()
+        ]
+        file_terms_items = [
             {
                 "PutRequest": {
-                    "Item": {
-                        "id": {"N": str(file_id)},
-                        "filename": {"S": filename},
-                    }
+                    "Item": file_terms_item(file_id, file_["terms"], version)
                 }
             }
-            for filename, file_id in file_ids.items()
-        ],
+            for file_id, file_ in indexed.items()
+        ]
+        loop.call_soon_threadsafe(
+            queue.put_nowait, (file_items, file_terms_items)
+        )
+
+    async def index() -> ProcessedDataset:
+        try:
+            return await loop.run_in_executor(
+                None,
+                process_dataset,
+                dataset_dir,
+                stopwords_set,
+                workers,
+                file_ids,
+                on_indexed,
+            )
+        finally:
+            # the thread scheduled all chunks before finishing, None is last
+            queue.put_nowait(None)
+
+    dataset, _ = await asyncio.gather(
+        index(), write_file_items(session, dataset_name, queue)
     )
+    return dataset
+
+
+async def set_dataset_version(
+    session: aiobotocore.session.AioSession, dataset_name: str, version: int
+) -> None:
+    """
+    Sets version of the dataset (see `logic.fetch_dataset_version()`),
+    which makes items of files indexed for it valid and gives cached
+    results of queries new keys.
+    """
+    async with session.create_client("dynamodb") as dynamodb_client:
+        await send_with_retries(
+            AdaptiveLimit(1),
+            dynamodb_client.exceptions.ProvisionedThroughputExceededException,
+            lambda: dynamodb_client.update_item(
+                TableName=f"{dataset_name}_terms",
+                Key={"term": {"S": logic.VERSION_TERM}},
+                UpdateExpression="SET #version = :version",
+                ExpressionAttributeNames={"#version": "version"},
+                ExpressionAttributeValues={":version": {"N": str(version)}},
+            ),
+        )
+
+
+async def upload_dataset_to_dynamodb(
+    session: aiobotocore.session.AioSession,
+    dataset_name: str,
+    dataset: ProcessedDataset,
+) -> None:
+    """
+    Writes posting lists of the terms, items of the files are written
+    while they are indexed (see `index_and_write_files()`), and sets
+    the first version of the dataset.
+    """
 
     await batch_write_to_dynamo(
         session,
@@ -226,30 +798,488 @@ async def upload_dataset_to_dynamodb(
                     }
                 }
             }
-            for term, files in terms.items()
+            for term, files in dataset.terms.items()
         ],
     )
 
+    await set_dataset_version(session, dataset_name, 1)
+
+
+async def list_dynamodb_tables(
+    session: aiobotocore.session.AioSession,
+) -> Set[str]:
+    async with session.create_client("dynamodb") as dynamodb_client:
+        tables = set()
+        async for page in dynamodb_client.get_paginator(
+            "list_tables"
+        ).paginate():
+            tables.update(page["TableNames"])
+
+    return tables
+
+
+async def dynamodb_tables_exist(
+    session: aiobotocore.session.AioSession, dataset_name: str
+) -> bool:
+    # datasets processed before terms of files were stored don't have
+    # the file terms table, it's created by `update_and_upload_dataset()`
+    return {f"{dataset_name}_files", f"{dataset_name}_terms"} <= (
+        await list_dynamodb_tables(session)
+    )
+
+
+def item_valid(item: Dict[str, Any], version: int) -> bool:
+    """
+    :param version: current version of the dataset
+    :return: whether the file item was written by a processing which
+        finished, items written before versions were stored are valid
+    """
+    return int(item.get("version", {}).get("N", 0)) <= version
+
+
+async def fetch_known_files(
+    session: aiobotocore.session.AioSession, dataset_name: str, version: int
+) -> Dict[str, Dict[str, Any]]:
+    """
+    :param version: current version of the dataset
+    :return: files the dataset was processed from with their id
+        and metadata (files processed before metadata were stored
+        or by a processing which failed have only the id, so they
+        are hashed and indexed again)
+    """
+    known = {}
+
+    async with session.create_client("dynamodb") as dynamodb_client:
+        async for page in dynamodb_client.get_paginator("scan").paginate(
+            TableName=f"{dataset_name}_files",
+            ProjectionExpression=(
+                "#id, filename, mtime, #size, sha256, #version"
+            ),
+            # "size" is a reserved word
+            ExpressionAttributeNames={
+                "#id": "id",
+                "#size": "size",
+                "#version": "version",
+            },
+        ):
+            for item in page["Items"]:
+                file_ = {"id": int(item["id"]["N"])}
+                if "sha256" in item and item_valid(item, version):
+                    file_["mtime"] = int(item["mtime"]["N"])
+                    file_["size"] = int(item["size"]["N"])
+                    file_["sha256"] = item["sha256"]["S"]
+
+                known[item["filename"]["S"]] = file_
+
+    return known
+
+
+async def fetch_file_terms(
+    dynamodb_client: Any, dataset_name: str, file_ids: Set[int], version: int
+) -> Dict[int, Set[str]]:
+    """
+    :param version: current version of the dataset
+    :return: terms whose posting lists contain the files by file ids
+        (terms found in the files when they were processed)
+    """
+    file_terms: Dict[int, Set[str]] = {}
+
+    for item in await logic.batch_get_items(
+        dynamodb_client,
+        f"{dataset_name}_terms_by_file",
+        [{"id": {"N": str(file_id)}} for file_id in file_ids],
+    ):
+        if "terms" in item and item_valid(item, version):
+            file_terms[int(item["id"]["N"])] = set(
+                zlib.decompress(item["terms"]["B"]).decode().split("\n")
+            ) - {""}
+
+    missing = file_ids - file_terms.keys()
+    if len(missing) == 0:
+        return file_terms
+
+    # files processed before their terms were stored, with too many
+    # terms or by a processing which failed (posting lists can be updated
+    # only partially), all posting lists have to be searched for them
+    for file_id in missing:
+        file_terms[file_id] = set()
+
+    async for page in dynamodb_client.get_paginator("scan").paginate(
+        TableName=f"{dataset_name}_terms"
+    ):
+        for item in page["Items"]:
+            files = set(map(int, item.get("files", {}).get("NS", [])))
+            for file_id in files & missing:
+                file_terms[file_id].add(item["term"]["S"])
+
+    return file_terms
+
+
+async def send_with_retries(
+    limit: AdaptiveLimit,
+    throttling_error: Any,
+    send: Callable[[], Awaitable[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    """
+    Sends a request until it is not throttled, with the same backoff
+    as `batch_write_to_dynamo()`.
+
+    :raises RuntimeError: when the request is throttled
+        `BATCH_WRITE_MAX_RETRIES` times in a row
+    """
+    for attempt in range(BATCH_WRITE_MAX_RETRIES + 1):
+        if attempt > 0:
+            await asyncio.sleep(
+                random.uniform(0, BATCH_WRITE_BACKOFF * 2 ** attempt)
+            )
+
+        try:
+            async with limit:
+                response = await send()
+        except throttling_error:
+            limit.throttled()
+            continue
+
+        limit.succeeded()
+        return response
+
+    raise RuntimeError("Cannot send request, the table is throttling them")
+
+
+async def update_dataset_in_dynamodb(
+    session: aiobotocore.session.AioSession,
+    dataset_name: str,
+    dataset: ProcessedDataset,
+    stale_terms: Dict[int, Set[str]],
+    touched: Dict[str, Dict[str, Any]],
+    removed: Dict[str, int],
+    version: int,
+) -> None:
+    """
+    Updates only posting lists of terms of added, changed and removed
+    files, ids are added to and deleted from their sets in place
+    (so concurrent queries see either the old or the new posting list).
+
+    Items of the indexed files and of their terms are already written
+    (with `version`), so every id in the posting lists has a filename.
+    Only when all posting lists are updated, metadata of touched files
+    are updated, items of removed files (and of their terms) are deleted
+    and the dataset gets `version`, so files of a failed update
+    are indexed again next time.
+
+    :param stale_terms: terms of files indexed again or removed
+        (by `fetch_file_terms()`) by file ids
+    """
+    files_table = f"{dataset_name}_files"
+    terms_table = f"{dataset_name}_terms"
+    limit = AdaptiveLimit(BATCH_WRITE_CONCURRENCY)
+
+    async with session.create_client("dynamodb") as dynamodb_client:
+        throttling_error = (
+            dynamodb_client.exceptions.ProvisionedThroughputExceededException
+        )
+        conditional_error = (
+            dynamodb_client.exceptions.ConditionalCheckFailedException
+        )
+
+        # ids to delete from posting lists of terms, which are
+        # not in the files anymore
+        to_delete: Dict[str, Set[int]] = collections.defaultdict(set)
+        for file_id, file_terms in stale_terms.items():
+            for term in file_terms:
+                if file_id not in dataset.terms.get(term, ()):
+                    to_delete[term].add(file_id)
+
+        progress = tqdm.tqdm(total=len(dataset.terms.keys() | to_delete))
+
+        async def update_term(term: str) -> None:
+            key = {"term": {"S": term}}
+
+            # existing files are found in the (re)indexed files
+            # as well, they are already in the set
+            if len(dataset.terms.get(term, ())) != 0:
+                await send_with_retries(
+                    limit,
+                    throttling_error,
+                    lambda: dynamodb_client.update_item(
+                        TableName=terms_table,
+                        Key=key,
+                        UpdateExpression="ADD files :ids",
+                        ExpressionAttributeValues={
+                            ":ids": {"NS": list(map(str, dataset.terms[term]))}
+                        },
+                    ),
+                )
+
+            if len(to_delete.get(term, ())) != 0:
+                response = await send_with_retries(
+                    limit,
+                    throttling_error,
+                    lambda: dynamodb_client.update_item(
+                        TableName=terms_table,
+                        Key=key,
+                        UpdateExpression="DELETE files :ids",
+                        ExpressionAttributeValues={
+                            ":ids": {"NS": list(map(str, to_delete[term]))}
+                        },
+                        ReturnValues="ALL_NEW",
+                    ),
+                )
+
+                # DynamoDB removes empty sets, the term is not found
+                # in any file anymore
+                if "files" not in response.get("Attributes", {}):
+                    try:
+                        await send_with_retries(
+                            limit,
+                            throttling_error,
+                            lambda: dynamodb_client.delete_item(
+                                TableName=terms_table,
+                                Key=key,
+                                ConditionExpression=(
+                                    "attribute_not_exists(files)"
+                                ),
+                            ),
+                        )
+                    except conditional_error:
+                        # found in a file in the meantime
+                        pass
+
+            progress.update(1)
+
+        try:
+            await asyncio.gather(
+                *map(update_term, dataset.terms.keys() | to_delete)
+            )
+        finally:
+            progress.close()
+
+        async def update_mtime(file_: Dict[str, Any]) -> None:
+            await send_with_retries(
+                limit,
+                throttling_error,
+                lambda: dynamodb_client.update_item(
+                    TableName=files_table,
+                    Key={"id": {"N": str(file_["id"])}},
+                    UpdateExpression="SET mtime = :mtime",
+                    ExpressionAttributeValues={
+                        ":mtime": {"N": str(file_["mtime"])}
+                    },
+                ),
+            )
+
+        await asyncio.gather(*map(update_mtime, touched.values()))
+
+    await asyncio.gather(
+        *(
+            batch_write_to_dynamo(
+                session,
+                table_name,
+                [
+                    {"DeleteRequest": {"Key": {"id": {"N": str(file_id)}}}}
+                    for file_id in removed.values()
+                ],
+            )
+            for table_name in (files_table, f"{dataset_name}_terms_by_file")
+        )
+    )
+
+    await set_dataset_version(session, dataset_name, version)
+
+
+async def upload_file_to_s3(
+    s3_client: Any, path: str, s3_bucket: str, key: str
+) -> None:
+    """
+    Files bigger than `MULTIPART_CHUNK_SIZE` are streamed in parts
+    (multipart upload), so they are never read to memory whole.
+    """
+    async with aiofiles.open(path, "rb") as f_in:
+        if os.path.getsize(path) <= MULTIPART_CHUNK_SIZE:
+            await s3_client.put_object(
+                Bucket=s3_bucket, Body=await f_in.read(), Key=key
+            )
+            return
+
+        upload = await s3_client.create_multipart_upload(
+            Bucket=s3_bucket, Key=key
+        )
+        parts: List[Dict[str, Any]] = []
+
+        try:
+            while True:
+                chunk = await f_in.read(MULTIPART_CHUNK_SIZE)
+                if len(chunk) == 0:
+                    break
+
+                part = await s3_client.upload_part(
+                    Bucket=s3_bucket,
+                    Key=key,
+                    PartNumber=len(parts) + 1,
+                    UploadId=upload["UploadId"],
+                    Body=chunk,
+                )
+                parts.append(
+                    {"ETag": part["ETag"], "PartNumber": len(parts) + 1}
+                )
+
+            await s3_client.complete_multipart_upload(
+                Bucket=s3_bucket,
+                Key=key,
+                UploadId=upload["UploadId"],
+                MultipartUpload={"Parts": parts},
+            )
+        except Exception:
+            # uploaded parts would be stored (and paid for) otherwise
+            await s3_client.abort_multipart_upload(
+                Bucket=s3_bucket, Key=key, UploadId=upload["UploadId"]
+            )
+            raise
+
 
 async def upload_files_to_s3(
     session: aiobotocore.session.AioSession,
     dataset_dir: str,
     dataset_name: str,
     s3_bucket: str,
+    files: Optional[Iterable[str]] = None,
 ) -> None:
+    """
+    Uploads files of the dataset (all by default),
+    `S3_UPLOAD_CONCURRENCY` at a time.
+    """
 
     print(f"Uploading {dataset_dir}")
 
+    semaphore = asyncio.Semaphore(S3_UPLOAD_CONCURRENCY)
+
     async with session.create_client("s3") as s3_client:
-        for file_ in tqdm.tqdm(os.listdir(dataset_dir)):
-            async with aiofiles.open(
-                os.path.join(dataset_dir, file_), "rb"
-            ) as f_in:
-                await s3_client.put_object(
-                    Bucket=s3_bucket,
-                    Body=await f_in.read(),
-                    Key=f"static/{dataset_name}/{file_}",
+        files = os.listdir(dataset_dir) if files is None else list(files)
+        progress = tqdm.tqdm(total=len(files), position=1)
+
+        async def upload(file_: str) -> None:
+            async with semaphore:
+                await upload_file_to_s3(
+                    s3_client,
+                    os.path.join(dataset_dir, file_),
+                    s3_bucket,
+                    f"static/{dataset_name}/{file_}",
                 )
+            progress.update(1)
+
+        try:
+            await asyncio.gather(*map(upload, files))
+        finally:
+            progress.close()
+
+
+async def delete_files_from_s3(
+    session: aiobotocore.session.AioSession,
+    dataset_name: str,
+    s3_bucket: str,
+    files: Iterable[str],
+) -> None:
+    keys = [{"Key": f"static/{dataset_name}/{file_}"} for file_ in files]
+
+    async with session.create_client("s3") as s3_client:
+        # at most 1000 keys per request
+        for index in range(0, len(keys), 1000):
+            await s3_client.delete_objects(
+                Bucket=s3_bucket,
+                Delete={"Objects": keys[index : index + 1000], "Quiet": True},
+            )
+
+
+async def process_and_upload_dataset(
+    session: aiobotocore.session.AioSession,
+    dataset_dir: str,
+    dataset_name: str,
+    s3_bucket: str,
+    stopwords_set: Set[str],
+    workers: Optional[int],
+) -> None:
+    """
+    Files are uploaded to S3 while being indexed (in worker processes),
+    the posting lists are uploaded to DynamoDB after.
+    """
+    # DynamoDB backend stems queries by itself, another table
+    # would cost a network round-trip per query
+    dataset, _ = await asyncio.gather(
+        index_and_write_files(
+            session, dataset_dir, dataset_name, stopwords_set, workers, None, 1
+        ),
+        upload_files_to_s3(session, dataset_dir, dataset_name, s3_bucket),
+    )
+
+    await upload_dataset_to_dynamodb(session, dataset_name, dataset)
+
+
+async def update_and_upload_dataset(
+    session: aiobotocore.session.AioSession,
+    dataset_dir: str,
+    dataset_name: str,
+    s3_bucket: str,
+    stopwords_set: Set[str],
+    workers: Optional[int],
+) -> None:
+    """
+    Incremental variant of `process_and_upload_dataset()`, only files
+    added or changed since the last processing are indexed and uploaded.
+    Removed files are deleted from S3 after their ids are removed
+    from the index.
+    """
+    async with session.create_client("dynamodb") as dynamodb_client:
+        tables = await list_dynamodb_tables(session)
+        if f"{dataset_name}_terms_by_file" not in tables:
+            if not await create_file_terms_table(
+                dynamodb_client, dataset_name
+            ):
+                sys.exit(1)
+
+        version = await logic.fetch_dataset_version(
+            dynamodb_client, dataset_name
+        )
+        known = await fetch_known_files(session, dataset_name, version)
+        to_index, touched, removed = diff_dataset(dataset_dir, known)
+        print(
+            f"Files to index: {len(to_index)}, touched: {len(touched)}, "
+            f"removed: {len(removed)}"
+        )
+
+        # fetched before their items are written again
+        stale_terms = await fetch_file_terms(
+            dynamodb_client,
+            dataset_name,
+            {known[file_]["id"] for file_ in to_index if file_ in known}
+            | set(removed.values()),
+            version,
+        )
+
+    dataset, _ = await asyncio.gather(
+        index_and_write_files(
+            session,
+            dataset_dir,
+            dataset_name,
+            stopwords_set,
+            workers,
+            to_index,
+            version + 1,
+        ),
+        upload_files_to_s3(
+            session, dataset_dir, dataset_name, s3_bucket, to_index
+        ),
+    )
+
+    await update_dataset_in_dynamodb(
+        session,
+        dataset_name,
+        dataset,
+        stale_terms,
+        touched,
+        removed,
+        version + 1,
+    )
+    await delete_files_from_s3(session, dataset_name, s3_bucket, removed)
 
 
 def main() -> None:
@@ -272,11 +1302,19 @@ def main() -> None:
 
     arg_parser.add_argument(
         "--s3-bucket",
-        required=True,
+        required=False,
         type=str,
         help="Name of the S3 bucket to upload files to",
     )
 
+    arg_parser.add_argument(
+        "--index-dir",
+        required=False,
+        type=str,
+        help="A path to directory to write local index file to "
+        "instead of uploading to AWS",
+    )
+
     arg_parser.add_argument(
         "--stopwords",
         required=False,
@@ -284,8 +1322,34 @@ def main() -> None:
         help="JSON file with stopwords",
     )
 
+    arg_parser.add_argument(
+        "--workers",
+        required=False,
+        type=int,
+        help="Number of processes indexing the files (all CPUs by default)",
+    )
+
+    arg_parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Index only files added or changed since the dataset "
+        "was processed last time and remove deleted files from the index",
+    )
+
     args = arg_parser.parse_args()
 
+    if args.s3_bucket is None and args.index_dir is None:
+        arg_parser.error("either --s3-bucket or --index-dir is required")
+
+    if args.index_dir is not None and not (
+        os.path.isdir(args.index_dir) and os.access(args.index_dir, os.W_OK)
+    ):
+        print(
+            f'"{args.index_dir}" does not exist or script has no permissions.',
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
     if not (
         os.path.isdir(args.dataset_dir)
         and os.access(args.dataset_dir, os.R_OK)
@@ -318,8 +1382,40 @@ def main() -> None:
     print("Dir to be processed and uploaded:", dataset_dir)
     print("Dataset name:", dataset_name)
 
+    if args.index_dir is not None:
+        write_local_index(
+            args.index_dir,
+            dataset_dir,
+            dataset_name,
+            stopwords_set,
+            args.workers,
+            args.incremental,
+        )
+        return
+
     session = aiobotocore.get_session()
 
+    if args.incremental:
+        if not asyncio.run(dynamodb_tables_exist(session, dataset_name)):
+            print(
+                f'Dataset "{dataset_name}" was not processed yet, '
+                "run without --incremental first.",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+
+        asyncio.run(
+            update_and_upload_dataset(
+                session,
+                dataset_dir,
+                dataset_name,
+                args.s3_bucket,
+                stopwords_set,
+                args.workers,
+            )
+        )
+        return
+
     if not asyncio.run(
         ensure_unique_names_and_create_db_and_bucket(
             session, dataset_name, args.s3_bucket
@@ -327,14 +1423,15 @@ def main() -> None:
     ):
         sys.exit(1)
 
-    file_ids, terms = process_dataset(dataset_dir, stopwords_set)
-
     asyncio.run(
-        upload_dataset_to_dynamodb(session, dataset_name, file_ids, terms)
-    )
-
-    asyncio.run(
-        upload_files_to_s3(session, dataset_dir, dataset_name, args.s3_bucket)
+        process_and_upload_dataset(
+            session,
+            dataset_dir,
+            dataset_name,
+            args.s3_bucket,
+            stopwords_set,
+            args.workers,
+        )
     )
 
 
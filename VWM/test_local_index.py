@@ -0,0 +1,277 @@
+"""
+Tests of the local index and the Boolean model evaluated over it.
+
+Run with `pytest` from this directory (process_and_upload_dataset.py
+needs textract, its tests are skipped without it).
+"""
+from typing import Dict, Iterator, List, Set
+
+import asyncio
+import os
+import pathlib
+
+import pytest
+
+import local_index
+import logic
+
+
+FILE_IDS = {"a.txt": 0, "b.txt": 1, "c.txt": 3}
+TERMS = {"cat": {0, 1}, "dog": {1, 3}, "fish": {3}, "żába": {0}}
+STEMS = {"cats": "cat", "cat": "cat", "dogs": "dog", "fish": "fish"}
+
+
+def write_index_v1(
+    path: str, file_ids: Dict[str, int], terms: Dict[str, Set[int]]
+) -> None:
+    """Writes an index of version 1 (without words and stems)."""
+    filenames = [b""] * (max(file_ids.values()) + 1)
+    for filename, file_id in file_ids.items():
+        filenames[file_id] = filename.encode()
+
+    sorted_terms = sorted(terms, key=str.encode)
+    sections = [
+        *local_index._blob_with_offsets([t.encode() for t in sorted_terms]),
+        b"".join(local_index.COUNT.pack(len(terms[t])) for t in sorted_terms),
+        *local_index._blob_with_offsets(
+            [local_index.encode_postings(terms[t]) for t in sorted_terms]
+        ),
+        *local_index._blob_with_offsets(filenames),
+    ]
+
+    offsets = []
+    position = local_index.HEADER_V1.size
+    for section in sections:
+        offsets.append(position)
+        position += len(section)
+
+    with open(path, "wb") as f_out:
+        f_out.write(
+            local_index.HEADER_V1.pack(
+                local_index.MAGIC,
+                1,
+                len(sorted_terms),
+                len(filenames),
+                *offsets,
+            )
+        )
+        f_out.write(b"".join(sections))
+
+
+@pytest.fixture
+def index_dir(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[pathlib.Path]:
+    """Index directory of the "local" backend of `logic`."""
+    monkeypatch.setattr(logic, "BACKEND", "local")
+    monkeypatch.setattr(logic, "INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(logic, "_dataset_names", None)
+    monkeypatch.setattr(logic, "_local_indexes", {})
+    yield tmp_path
+    for _, index in logic._local_indexes.values():
+        index.close()
+
+
+@pytest.mark.parametrize(
+    "file_ids", ([], [0], [5], [0, 1, 2], [3, 130, 20000, 2 ** 40], [7, 1])
+)
+def test_postings_round_trip(file_ids: List[int]) -> None:
+    encoded = local_index.encode_postings(file_ids)
+    assert local_index.decode_postings(encoded) == sorted(file_ids)
+
+
+def test_dense_postings_take_a_byte_per_file() -> None:
+    assert len(local_index.encode_postings(range(1000))) == 1000
+
+
+@pytest.mark.parametrize("version", (1, local_index.VERSION))
+def test_write_and_read_index(tmp_path: pathlib.Path, version: int) -> None:
+    path = str(tmp_path / "dataset.vwmidx")
+    if version == 1:
+        write_index_v1(path, FILE_IDS, TERMS)
+    else:
+        local_index.write_index(path, FILE_IDS, TERMS, STEMS)
+
+    index = local_index.LocalIndex(path)
+    try:
+        assert index.terms_count == len(TERMS)
+        assert index.postings("dog") == [1, 3]
+        assert index.postings("żába") == [0]
+        assert index.postings("cow") == []
+        assert index.count("cat") == 2
+        assert index.count("cow") == 0
+        assert dict(index.all_postings()) == {
+            term: sorted(file_ids) for term, file_ids in TERMS.items()
+        }
+
+        # id 2 is a removed file
+        assert index.file_ids() == [0, 1, 3]
+        assert index.filename(3) == "c.txt"
+        assert index.filename(2) == ""
+        with pytest.raises(IndexError):
+            index.filename(4)
+
+        if version == 1:
+            assert index.stem("cats") is None
+            assert list(index.all_stems()) == []
+        else:
+            assert index.stem("cats") == "cat"
+            assert index.stem("cows") is None
+            assert dict(index.all_stems()) == STEMS
+    finally:
+        index.close()
+
+
+def test_not_an_index(tmp_path: pathlib.Path) -> None:
+    path = tmp_path / "dataset.vwmidx"
+    path.write_bytes(b"VWMIDX")
+    with pytest.raises(ValueError):
+        local_index.LocalIndex(str(path))
+
+    path.write_bytes(local_index.PREFIX.pack(local_index.MAGIC, 99))
+    with pytest.raises(ValueError):
+        local_index.LocalIndex(str(path))
+
+
+@pytest.mark.parametrize(
+    "query, filenames",
+    (
+        ("cat", ["a.txt", "b.txt"]),
+        ("cats and dogs", ["b.txt"]),
+        ("cat or fish", ["a.txt", "b.txt", "c.txt"]),
+        ("dog and not cat", ["c.txt"]),
+        ("not dog", ["a.txt"]),
+        ("cow or not (cat or dog)", []),
+        ("cat and (dog or fish) and not cow", ["b.txt"]),
+    ),
+)
+def test_process_query(
+    index_dir: pathlib.Path, query: str, filenames: List[str]
+) -> None:
+    local_index.write_index(
+        local_index.index_path(str(index_dir), "animals"),
+        FILE_IDS,
+        TERMS,
+        STEMS,
+    )
+    result = asyncio.run(logic.process_query("animals", query))
+    assert result["data"] == filenames
+
+
+def test_process_query_unknown_dataset(index_dir: pathlib.Path) -> None:
+    with pytest.raises(ValueError):
+        asyncio.run(logic.process_query("missing", "cat"))
+
+
+def test_diff_dataset(tmp_path: pathlib.Path) -> None:
+    pytest.importorskip("textract")
+    import process_and_upload_dataset
+
+    (tmp_path / "same.txt").write_text("cat")
+    (tmp_path / "touched.txt").write_text("dog")
+    (tmp_path / "changed.txt").write_text("fish")
+    known = {
+        file_.name: {
+            "id": file_id,
+            **process_and_upload_dataset.file_metadata(str(file_)),
+        }
+        for file_id, file_ in enumerate(sorted(tmp_path.iterdir()))
+    }
+    known["removed.txt"] = {"id": 7}
+
+    os.utime(tmp_path / "touched.txt", ns=(0, 0))
+    (tmp_path / "changed.txt").write_text("fish and chips")
+    (tmp_path / "new.txt").write_text("cow")
+
+    to_index, touched, removed = process_and_upload_dataset.diff_dataset(
+        str(tmp_path), known
+    )
+
+    # new files get ids after the highest known one
+    assert to_index == {
+        "changed.txt": known["changed.txt"]["id"],
+        "new.txt": 8,
+    }
+    assert touched.keys() == {"touched.txt"}
+    assert touched["touched.txt"]["mtime"] == 0
+    assert removed == {"removed.txt": 7}
+
+
+def test_write_local_index_incremental(tmp_path: pathlib.Path) -> None:
+    pytest.importorskip("textract")
+    import process_and_upload_dataset
+
+    dataset_dir = tmp_path / "docs"
+    dataset_dir.mkdir()
+    for name, text in (
+        ("a.txt", "cats and dogs"),
+        ("b.txt", "dog"),
+        ("c.txt", "fish"),
+    ):
+        (dataset_dir / name).write_text(text)
+
+    def write(incremental: bool) -> Dict[str, Set[str]]:
+        process_and_upload_dataset.write_local_index(
+            str(tmp_path), str(dataset_dir), "docs", {"and"}, 1, incremental
+        )
+        index = local_index.LocalIndex(
+            local_index.index_path(str(tmp_path), "docs")
+        )
+        try:
+            return {
+                term: {index.filename(file_id) for file_id in file_ids}
+                for term, file_ids in index.all_postings()
+            }
+        finally:
+            index.close()
+
+    assert write(False) == {
+        "cat": {"a.txt"},
+        "dog": {"a.txt", "b.txt"},
+        "fish": {"c.txt"},
+    }
+    path = local_index.index_path(str(tmp_path), "docs")
+    manifest_path = local_index.manifest_path(str(tmp_path), "docs")
+    ids = {
+        file_: metadata["id"]
+        for file_, metadata in local_index.read_manifest(
+            manifest_path, path
+        ).items()
+    }
+
+    (dataset_dir / "b.txt").write_text("cow")
+    (dataset_dir / "c.txt").unlink()
+    (dataset_dir / "d.txt").write_text("fish")
+
+    assert write(True) == {
+        "cat": {"a.txt"},
+        "dog": {"a.txt"},
+        "cow": {"b.txt"},
+        "fish": {"d.txt"},
+    }
+    manifest = local_index.read_manifest(manifest_path, path)
+    assert manifest.keys() == {"a.txt", "b.txt", "d.txt"}
+    assert manifest["a.txt"]["id"] == ids["a.txt"]
+    assert manifest["b.txt"]["id"] == ids["b.txt"]
+    assert manifest["d.txt"]["id"] == max(ids.values()) + 1
+
+
+def test_manifest_of_another_index(tmp_path: pathlib.Path) -> None:
+    path = str(tmp_path / "dataset.vwmidx")
+    manifest_path = str(tmp_path / "dataset.files.json")
+    files = {
+        filename: {"id": file_id, "mtime": 0, "size": 0, "sha256": ""}
+        for filename, file_id in FILE_IDS.items()
+    }
+
+    sha256 = local_index.write_index(path, FILE_IDS, TERMS, STEMS)
+    assert sha256 == local_index.index_sha256(path)
+    local_index.write_manifest(manifest_path, files, sha256)
+    assert local_index.read_manifest(manifest_path, path) == files
+
+    # interrupted before the manifest was replaced
+    local_index.write_index(path, {"d.txt": 4, **FILE_IDS}, TERMS, STEMS)
+    assert local_index.read_manifest(manifest_path, path) == {}
+
+    os.remove(path)
+    assert local_index.read_manifest(manifest_path, path) == {}